@@ -5,7 +5,19 @@ Extends Athena Query Generator with complex SQL capabilities
 
 import streamlit as st
 import re
+import os
+import boto3
 from datetime import datetime
+from glue_catalog import load_default_columns, fetch_catalog, empty_catalog, is_catalog_stale
+from query_optimizer import find_table_references
+from cost_estimator import estimate_query_cost, runtime_tier, format_bytes
+from query_history import load_query_history
+
+# Builder catalog is cached per session and refreshed after this many seconds
+CATALOG_TTL_SECONDS = 300
+
+# Fallback projection for pre-built views without a configured default column set
+PREBUILT_VIEW_COLUMNS = ['contract_id', 'contract_name', 'status', 'value', 'end_date', 'department']
 
 def add_sql_explanations(sql_query):
     """Add educational comments to generated SQL"""
@@ -37,7 +49,11 @@ def get_learning_level_sql(question, complexity_level="beginner", available_tabl
 -- Question: {question}
 -- Concept: Basic SELECT with single table
 
-SELECT *                    -- SELECT: Choose which columns to return
+SELECT                      -- SELECT: Choose which columns to return
+    contract_name,          -- Name only the columns you need: on columnar (Parquet)
+    status,                 -- data Athena then reads just these columns instead of
+    value,                  -- every column, as SELECT * would
+    end_date
 FROM executive_dashboard_detailed  -- FROM: Specify the source table
 WHERE status = 'Active'     -- WHERE: Filter for only active contracts
 LIMIT 10;                   -- LIMIT: Restrict number of results
@@ -221,11 +237,19 @@ def suggest_prebuilt_views(question, available_tables):
     
     suggested_view = suggestions[0] if suggestions else "executive_dashboard_detailed"
     
+    # Project the view's configured default columns instead of SELECT *
+    columns = load_default_columns().get(suggested_view, PREBUILT_VIEW_COLUMNS)
+    for required in ('contract_name', 'status'):
+        if required not in columns:
+            columns = columns + [required]
+    
     return f"""-- BUSINESS USER RECOMMENDATION
 -- Question: {question}
 -- Suggested approach: Use pre-built view
+-- Projection: {len(columns)} named columns instead of SELECT * (reads less data on columnar storage)
 
-SELECT *
+SELECT
+    {f",{chr(10)}    ".join(columns)}
 FROM {suggested_view}
 WHERE status = 'Active'  -- Modify this condition as needed
 ORDER BY contract_name
@@ -239,7 +263,7 @@ LIMIT 100;
 -- "Compare performance by contract type"
 -- "Analyze renewal trends over time" """
 
-def render_advanced_query_ui():
+def render_advanced_query_ui(catalog=None):
     """Render advanced query builder UI"""
     
     st.markdown("### 🚀 Advanced Query Builder")
@@ -338,18 +362,19 @@ def render_advanced_query_ui():
         
         with col4:
             if st.button("📊 Explain Query"):
-                show_query_explanation(st.session_state.advanced_sql)
+                show_query_explanation(st.session_state.advanced_sql, catalog)
 
-def show_query_explanation(sql_query):
+def show_query_explanation(sql_query, catalog=None):
     """Show detailed explanation of the SQL query"""
     
     st.markdown("#### 🔍 Query Explanation")
     
     # Analyze query components
+    references = find_table_references(sql_query)
     components = {
-        'Tables Used': len(re.findall(r'FROM|JOIN', sql_query, re.IGNORECASE)),
-        'Joins': len(re.findall(r'JOIN', sql_query, re.IGNORECASE)),
-        'Filters': len(re.findall(r'WHERE|HAVING', sql_query, re.IGNORECASE)),
+        'Tables Used': len({ref['name'].lower() for ref in references}),
+        'Joins': len(re.findall(r'\bJOIN\b', sql_query, re.IGNORECASE)),
+        'Filters': len(re.findall(r'\b(?:WHERE|HAVING)\b', sql_query, re.IGNORECASE)),
         'Aggregations': len(re.findall(r'GROUP BY|COUNT|SUM|AVG', sql_query, re.IGNORECASE)),
         'Calculations': len(re.findall(r'CASE WHEN', sql_query, re.IGNORECASE))
     }
@@ -368,20 +393,56 @@ def show_query_explanation(sql_query):
         for key, value in list(components.items())[4:]:
             st.metric(key, value)
     
-    # Performance estimate
-    complexity_score = sum(components.values())
-    
-    if complexity_score <= 3:
-        performance = "⚡ Fast (< 5 seconds)"
-        color = "green"
-    elif complexity_score <= 7:
-        performance = "⏳ Moderate (5-30 seconds)"
-        color = "orange"
-    else:
-        performance = "🐌 Complex (30+ seconds)"
-        color = "red"
+    # Performance estimate from table statistics, calibrated on past executions
+    estimate = estimate_query_cost(sql_query, catalog, load_query_history())
+    performance, color = runtime_tier(estimate['seconds'])
     
-    st.markdown(f"**Performance Estimate:** :{color}[{performance}]")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Estimated Data Scanned", format_bytes(estimate['bytes']))
+    with col2:
+        st.metric("Predicted Runtime", f"{estimate['seconds']:.1f}s")
+    with col3:
+        st.metric("Estimated Cost", f"${estimate['cost_usd']:.4f}")
+    
+    st.markdown(f"**Performance Estimate:** :{color}[{performance}] (confidence: {estimate['confidence']})")
+    
+    if estimate['tables']:
+        st.table([
+            {
+                'Table': scan['table'] + (f" (via {scan['via']})" if scan['via'] else ''),
+                'Format': scan['format'],
+                'Table Size': format_bytes(scan['size_bytes']) if scan['size_bytes'] is not None else 'unknown',
+                'Files': scan['files'],
+                'Partitions Read': f"{scan['partition_fraction']:.0%}",
+                'Columns Read': f"{scan['column_fraction']:.0%}",
+                'Est. Scan': format_bytes(scan['bytes']) if scan['bytes'] is not None else 'unknown'
+            }
+            for scan in estimate['tables']
+        ])
+    if estimate['unresolved']:
+        st.caption(f"Not found in the Glue catalog: {', '.join(estimate['unresolved'])}")
+    if estimate['missing_sizes']:
+        st.caption(f"No size statistics for: {', '.join(estimate['missing_sizes'])} (run a crawler or ANALYZE to improve the estimate)")
+    if estimate['similar_runs']:
+        st.caption(f"Runtime from {estimate['similar_runs']} earlier runs of this query shape")
+    elif estimate['calibration_points']:
+        st.caption(f"Runtime model calibrated on {estimate['calibration_points']} executed queries")
+
+def load_builder_catalog():
+    """Glue catalog for the builder's database (from environment settings), cached per session"""
+    database = os.getenv('GLUE_DATABASE', 'business_analytics')
+    catalog = st.session_state.get('builder_catalog')
+    
+    if is_catalog_stale(catalog, CATALOG_TTL_SECONDS):
+        try:
+            glue_client = boto3.client('glue', region_name=os.getenv('AWS_REGION', 'us-east-1'))
+            catalog = fetch_catalog(glue_client, database)
+        except Exception:
+            catalog = empty_catalog(database)
+        st.session_state.builder_catalog = catalog
+    
+    return catalog
 
 def main():
     """Main function for the Advanced Query Builder app"""
@@ -421,7 +482,7 @@ def main():
         """)
     
     # Main interface
-    render_advanced_query_ui()
+    render_advanced_query_ui(load_builder_catalog())
     
     # Edit mode
     if st.session_state.get('edit_advanced_mode', False):
@@ -1,11 +1,38 @@
 import streamlit as st
-import boto3
 import pandas as pd
 import time
 from datetime import datetime
 import os
 from dotenv import load_dotenv
-from quicksight_export import render_quicksight_export_ui, render_quicksight_tips_sidebar, add_query_results_location_to_sidebar
+from quicksight_export import render_quicksight_export_ui, render_quicksight_tips_sidebar, add_query_results_location_to_sidebar, QuickSightExporter
+from glue_catalog import load_default_columns, save_default_columns
+from query_optimizer import apply_partition_pruning, apply_projection_pruning, parse_time_window, FULL_SCAN_MARKER
+from cost_estimator import estimate_query_cost, format_bytes
+from query_history import load_query_history, record_execution, distinct_queries, latency_by_fingerprint, entry_fingerprints
+from sql_validator import validate_sql, explain_query, statement_type
+from sql_fingerprint import fingerprint, dedupe_by_fingerprint
+from unload_export import (
+    export_location, build_unload_sql, list_part_files, download_url, export_columns,
+    register_export_table, export_table_name, quicksight_columns
+)
+from result_store import fetch_query_result, get_result_store
+from result_viewer import render_result_pages, render_result_profile
+from pushdown_analytics import render_pushdown_analytics, result_fields
+from materialized_views import (
+    load_materialized_state, update_materialized_state, materialized_scope, check_freshness, refresh_materialized_views,
+    route_to_materialized, materialized_status, unknown_materialized_tables,
+    CHECK_INTERVAL_SECONDS as MATERIALIZED_CHECK_INTERVAL_SECONDS
+)
+from subquery_cache import load_subquery_cache, rewrite_with_cache, update_cache
+from source_prediction import source_index, predict_source, question_changed, best_match
+from query_templates import make_template, upgrade_template, render_sql, execution_parameters, render_parameter_inputs, start_template_execution
+from query_coalescer import join_or_start, finish_flight, follow_flight
+from shared_services import get_client, get_shared_catalog, render_service_stats
+from fan_out import render_fan_out_selector, fan_out_accounts, fan_out, fan_out_timings, store_fan_out_result, ACCOUNT_COLUMN
+from nl_backends import generate_sql, selected_backend, render_backend_selector
+from query_retrieval import get_retrieval_index, find_similar_question
+from approximate_query import render_fast_mode_controls, fast_mode_sql, exact_query_for, is_approximate, start_exact_refinement, render_exact_refinement
+from cost_guard import load_budgets, resolve_budget, is_budget_admin, daily_usage, check_budget, downgrade_query, apply_workgroup_cutoff, BUDGET_MARKER
 
 # Load environment variables
 load_dotenv()
@@ -32,6 +59,10 @@ ACCOUNT_CONFIGS = {
     }
 }
 
+# Glue catalog is cached per session and refreshed after this many seconds
+CATALOG_TTL_SECONDS = 300
+RECENT_QUERIES_SHOWN = 5
+
 # Override with Streamlit secrets if available (for cloud deployment)
 try:
     if 'config' in st.secrets:
@@ -167,6 +198,10 @@ def main():
             
             current_config = all_accounts[selected_account]
             st.session_state.current_config = current_config
+            st.session_state.all_accounts = all_accounts
+            
+            # Run the same SQL in several accounts at once
+            render_fan_out_selector(all_accounts, selected_account)
             
             # Connection test
             if st.button("🔍 Test Connection", use_container_width=True):
@@ -184,6 +219,30 @@ def main():
             # Saved Queries section
             render_saved_queries_sidebar()
             
+            # Recently run queries, deduplicated by fingerprint
+            render_recent_queries_sidebar()
+            
+            # Default columns used instead of SELECT *
+            render_default_columns_sidebar(current_config)
+            
+            # Scan budgets and workgroup cutoff
+            render_cost_budget_sidebar(current_config)
+            
+            # Parquet copies of the quick-action views
+            render_materialized_views_sidebar(current_config)
+            
+            # Plan-check queries with EXPLAIN before running them
+            st.checkbox("🧪 Pre-flight EXPLAIN before running", value=True, key="preflight_explain")
+            
+            # Sampled, approximate answers for exploratory questions
+            render_fast_mode_controls()
+            
+            # Model-based SQL generation, when a local or remote model is configured
+            render_backend_selector()
+            
+            # Catalogs, results and clients held for all sessions
+            render_service_stats()
+            
             # Account Management
             render_account_management()
             
@@ -247,11 +306,12 @@ def show_main_interface(config):
             key="question_input"
         )
         
-        # Data source selector
-        available_tables = get_available_tables(config)
+        # Data source selector (a stale catalog is not refetched on the rerun that edited the question)
+        index = source_index(get_table_catalog(config, allow_stale=question_changed(user_question)))
+        available_tables = index['names']
         if available_tables:
             # Predict what table/view would be auto-selected
-            auto_selected = predict_data_source(user_question, available_tables) if user_question else "Auto-select based on question"
+            auto_selected = predict_source(predict_data_source, SOURCE_KEYWORDS, user_question, index) if user_question else "Auto-select based on question"
             
             data_source_options = ["🤖 Auto-select"] + available_tables
             selected_data_source = st.selectbox(
@@ -325,7 +385,9 @@ def show_main_interface(config):
             current_question = user_question
             if current_question and current_question.strip():
                 with st.spinner("🤖 Processing your question..."):
-                    generated_sql = generate_enterprise_sql(current_question, config)
+                    if 'saved_queries' not in st.session_state:
+                        st.session_state.saved_queries = load_saved_queries()
+                    generated_sql = generate_enterprise_sql(current_question, config, st.session_state.saved_queries)
                     st.session_state.current_sql = generated_sql
                     st.session_state.current_question = current_question
                     # Store for QuickSight export
@@ -337,7 +399,10 @@ def show_main_interface(config):
     
     with col2:
         if st.button("▶️ Execute Query", type="secondary", use_container_width=True):
-            if 'current_sql' in st.session_state:
+            fan_out_configs = fan_out_accounts(st.session_state.get('all_accounts', {}))
+            if 'current_sql' in st.session_state and fan_out_configs and statement_type(st.session_state.current_sql) in ('SELECT', 'WITH'):
+                execute_fan_out_query(st.session_state.current_sql, fan_out_configs)
+            elif 'current_sql' in st.session_state:
                 execute_enterprise_query(st.session_state.current_sql, config)
             else:
                 st.warning("Please generate a query first.")
@@ -347,6 +412,9 @@ def show_main_interface(config):
         st.markdown("### 📝 Generated SQL Query")
         st.code(st.session_state.current_sql, language="sql")
         
+        if FULL_SCAN_MARKER in st.session_state.current_sql:
+            st.warning("⚠️ This query scans every partition of at least one table. Add a date range (e.g. \"last quarter\") or other filter to reduce cost.")
+        
         # Query actions
         col1, col2, col3, col4 = st.columns(4)
         
@@ -358,7 +426,7 @@ def show_main_interface(config):
             # Always show save button when there's a query, regardless of execution status
             if 'current_sql' in st.session_state and 'current_question' in st.session_state:
                 if st.button("💾 Save Query", use_container_width=True):
-                    save_query_template(st.session_state.current_question, st.session_state.current_sql)
+                    save_query_template(st.session_state.current_question, st.session_state.current_sql, config)
             else:
                 st.button("💾 Save Query", disabled=True, help="Generate query first", use_container_width=True)
         
@@ -380,7 +448,7 @@ def show_main_interface(config):
             """, unsafe_allow_html=True)
         
         with col4:
-            if 'query_results' in st.session_state:
+            if 'query_result' in st.session_state:
                 quicksight_datasets_url = "https://us-east-1.quicksight.aws.amazon.com/sn/start/data-sets"
                 st.markdown(f"""
                 <a href="{quicksight_datasets_url}" target="_blank" style="
@@ -398,6 +466,10 @@ def show_main_interface(config):
                 """, unsafe_allow_html=True)
             else:
                 st.button("📊 QuickSight", disabled=True, help="Execute query first", use_container_width=True)
+        
+        if st.button("📦 Export to Parquet (UNLOAD)", help="For large results: write Parquet files to S3 instead of loading rows here"):
+            unload_enterprise_query(st.session_state.current_sql, config)
+        render_unload_export(config)
     
     # Edit mode
     if st.session_state.get('edit_mode', False):
@@ -421,22 +493,35 @@ def show_main_interface(config):
                 st.rerun()
     
     # Results Section
-    if 'query_results' in st.session_state:
+    if 'exact_refinement' in st.session_state:
+        try:
+            clients = get_aws_clients(config)
+            render_exact_refinement(clients['athena'], clients.get('s3'))
+        except Exception as e:
+            st.warning(f"⚠️ Could not check the exact refinement: {str(e)}")
+    
+    if 'query_result' in st.session_state:
         st.markdown("### 📊 Query Results")
         
-        df = st.session_state.query_results
+        handle = st.session_state.query_result
         
         # Results summary
         col1, col2, col3 = st.columns(3)
         with col1:
-            st.metric("Total Rows", len(df))
+            st.metric("Total Rows", f"{handle['num_rows']:,}")
         with col2:
-            st.metric("Columns", len(df.columns))
+            st.metric("Columns", len(handle['columns']))
         with col3:
             st.metric("Status", "Success ✅")
         
-        # Data display
-        st.dataframe(df, use_container_width=True, height=400)
+        # Data display (one page at a time from the on-disk result)
+        render_result_pages(handle)
+        
+        with st.expander("📈 Column Profile"):
+            render_result_profile(handle)
+        
+        with st.expander("🧮 Summarize in Athena"):
+            render_result_summary(config)
         
         # Auto-export to QuickSight
         render_quicksight_export_ui(
@@ -452,20 +537,22 @@ def show_main_interface(config):
         
         for i, template in enumerate(reversed(st.session_state.saved_queries[-3:])):  # Show last 3
             with st.expander(f"📝 {template.get('name', template.get('question', 'Unnamed Template'))} - {template['timestamp']}"):
-                st.code(template['sql'], language="sql")
+                values = render_parameter_inputs(template, key=f"template_{i}")
+                rendered_sql = render_sql(template, values)
+                st.code(rendered_sql, language="sql")
                 
                 col1, col2, col3 = st.columns(3)
                 with col1:
                     if st.button("🔄 Load Query", key=f"load_{i}", use_container_width=True):
-                        st.session_state.current_sql = template['sql']
+                        st.session_state.current_sql = rendered_sql
                         st.session_state.current_question = template.get('name', template.get('question', 'Loaded Template'))
                         st.success(f"✅ Loaded: {template.get('name', template.get('question', 'Template'))}")
                         
                 with col2:
                     if st.button("▶️ Execute Now", key=f"exec_{i}", use_container_width=True):
-                        st.session_state.current_sql = template['sql']
+                        st.session_state.current_sql = rendered_sql
                         st.session_state.current_question = template.get('name', template.get('question', 'Loaded Template'))
-                        execute_enterprise_query(template['sql'], config)
+                        execute_template(template, values, config)
                         
                 with col3:
                     if st.button("🗑️ Delete", key=f"delete_{i}", use_container_width=True):
@@ -474,65 +561,68 @@ def show_main_interface(config):
                         st.rerun()
 
 # All the helper functions from the working version
-def predict_data_source(question, available_tables):
-    """Predict which data source would be auto-selected for a question"""
-    if not question:
-        return "No question entered"
-    
-    question_lower = question.lower()
-    views = [t for t in available_tables if 'view' in t.lower() or '_detailed' in t.lower()]
-    tables = [t for t in available_tables if t not in views]
+# Substrings of the question that predict_data_source routes on
+SOURCE_KEYWORDS = (
+    'executive', 'dashboard', 'renewal', 'expiring', 'high risk', 'risk', 'high', 'compliance',
+    'status', 'distribution', 'performance', 'score', 'department', 'all', 'contract'
+)
+
+def predict_data_source(present, index):
+    """Predict which data source would be auto-selected, from the SOURCE_KEYWORDS in the question"""
+    views = index['view_set']
+    tables = index['tables']
     
     # Same logic as generate_enterprise_sql but just return the table name
-    if ("executive" in question_lower and "dashboard" in question_lower) or "executive dashboard overview" in question_lower:
+    if "executive" in present and "dashboard" in present:
         return "executive_dashboard_detailed" if "executive_dashboard_detailed" in views else "First available view"
     
-    if "renewal" in question_lower or "expiring" in question_lower:
+    if "renewal" in present or "expiring" in present:
         return "renewals_contracts_detailed" if "renewals_contracts_detailed" in views else "First available view"
     
-    if "high risk" in question_lower or ("risk" in question_lower and "high" in question_lower):
+    if "high risk" in present or ("risk" in present and "high" in present):
         return "compliance_contracts_detailed" if "compliance_contracts_detailed" in views else "First available view"
     
-    if "compliance" in question_lower:
+    if "compliance" in present:
         return "compliance_contracts_detailed" if "compliance_contracts_detailed" in views else "First available view"
     
-    if "status" in question_lower or "distribution" in question_lower:
+    if "status" in present or "distribution" in present:
         return "compliance_contracts_detailed" if "compliance_contracts_detailed" in views else "First available view"
     
-    if "performance" in question_lower or "score" in question_lower:
+    if "performance" in present or "score" in present:
         return "compliance_contracts_detailed" if "compliance_contracts_detailed" in views else "First available view"
     
-    if "department" in question_lower:
+    if "department" in present:
         return "executive_dashboard_detailed" if "executive_dashboard_detailed" in views else "First available view"
     
-    if "all" in question_lower and "contract" in question_lower:
+    if "all" in present and "contract" in present:
         return tables[0] if tables else "First available table"
     
-    # Generic fallback
-    if "contract" in question_lower and tables:
-        for table in tables:
-            if "contract" in table.lower():
-                return table
-    
-    return tables[0] if tables else (views[0] if views else "No tables available")
+    # Generic fallback: the table index ranks tables against the whole question
+    return None
 
 def get_aws_clients(config):
-    """Get AWS clients - works for both localhost and Streamlit Cloud"""
+    """Get AWS clients (pooled across sessions) - works for both localhost and Streamlit Cloud"""
     try:
         # Check if user provided credentials in config
         if 'aws_access_key_id' in config and 'aws_secret_access_key' in config:
             return {
-                'athena': boto3.client(
+                'athena': get_client(
                     'athena', 
                     region_name=config['aws_region'],
                     aws_access_key_id=config['aws_access_key_id'],
                     aws_secret_access_key=config['aws_secret_access_key']
                 ),
-                'glue': boto3.client(
+                'glue': get_client(
                     'glue', 
                     region_name=config['aws_region'],
                     aws_access_key_id=config['aws_access_key_id'],
                     aws_secret_access_key=config['aws_secret_access_key']
+                ),
+                's3': get_client(
+                    's3', 
+                    region_name=config['aws_region'],
+                    aws_access_key_id=config['aws_access_key_id'],
+                    aws_secret_access_key=config['aws_secret_access_key']
                 )
             }
         
@@ -542,19 +632,26 @@ def get_aws_clients(config):
             session_token = st.secrets['aws'].get('AWS_SESSION_TOKEN', None)
             
             return {
-                'athena': boto3.client(
+                'athena': get_client(
                     'athena', 
                     region_name=config['aws_region'],
                     aws_access_key_id=st.secrets['aws']['AWS_ACCESS_KEY_ID'],
                     aws_secret_access_key=st.secrets['aws']['AWS_SECRET_ACCESS_KEY'],
                     aws_session_token=session_token
                 ),
-                'glue': boto3.client(
+                'glue': get_client(
                     'glue', 
                     region_name=config['aws_region'],
                     aws_access_key_id=st.secrets['aws']['AWS_ACCESS_KEY_ID'],
                     aws_secret_access_key=st.secrets['aws']['AWS_SECRET_ACCESS_KEY'],
                     aws_session_token=session_token
+                ),
+                's3': get_client(
+                    's3', 
+                    region_name=config['aws_region'],
+                    aws_access_key_id=st.secrets['aws']['AWS_ACCESS_KEY_ID'],
+                    aws_secret_access_key=st.secrets['aws']['AWS_SECRET_ACCESS_KEY'],
+                    aws_session_token=session_token
                 )
             }
     
@@ -567,30 +664,33 @@ def get_aws_clients(config):
         if os.path.exists(os.path.expanduser('~/.aws/credentials')):
             # For Account 2, use the brew-demo profile (localhost only)
             if config['aws_account_id'] == '476169753480':
-                session = boto3.Session(profile_name='brew-demo')
                 return {
-                    'athena': session.client('athena', region_name=config['aws_region']),
-                    'glue': session.client('glue', region_name=config['aws_region'])
+                    'athena': get_client('athena', region_name=config['aws_region'], profile_name='brew-demo'),
+                    'glue': get_client('glue', region_name=config['aws_region'], profile_name='brew-demo'),
+                    's3': get_client('s3', region_name=config['aws_region'], profile_name='brew-demo')
                 }
             else:
                 # For Account 1, use default credentials
                 return {
-                    'athena': boto3.client('athena', region_name=config['aws_region']),
-                    'glue': boto3.client('glue', region_name=config['aws_region'])
+                    'athena': get_client('athena', region_name=config['aws_region']),
+                    'glue': get_client('glue', region_name=config['aws_region']),
+                    's3': get_client('s3', region_name=config['aws_region'])
                 }
         else:
             # Streamlit Cloud - use default credentials (environment variables)
             return {
-                'athena': boto3.client('athena', region_name=config['aws_region']),
-                'glue': boto3.client('glue', region_name=config['aws_region'])
+                'athena': get_client('athena', region_name=config['aws_region']),
+                'glue': get_client('glue', region_name=config['aws_region']),
+                's3': get_client('s3', region_name=config['aws_region'])
             }
     except Exception as e:
         st.error(f"AWS client creation error: {str(e)}")
         st.info("💡 For localhost: Ensure AWS profiles are configured. For Streamlit Cloud: Check secrets configuration.")
         # Return basic clients as fallback
         return {
-            'athena': boto3.client('athena', region_name=config['aws_region']),
-            'glue': boto3.client('glue', region_name=config['aws_region'])
+            'athena': get_client('athena', region_name=config['aws_region']),
+            'glue': get_client('glue', region_name=config['aws_region']),
+            's3': get_client('s3', region_name=config['aws_region'])
         }
 def test_connection_status(config):
     """Test connection and show status"""
@@ -678,19 +778,81 @@ def show_available_tables(config):
     except Exception as e:
         st.error(f"Error: {str(e)}")
 
+def get_table_catalog(config, force_refresh=False, allow_stale=False):
+    """Get the Glue catalog (tables, columns, partition keys) for the selected database, shared by all sessions"""
+    return get_shared_catalog(
+        config['aws_account_id'], config['glue_database'], lambda: get_aws_clients(config)['glue'],
+        CATALOG_TTL_SECONDS, force_refresh=force_refresh, allow_stale=allow_stale
+    )
+
 def get_available_tables(config):
-    """Get list of available tables"""
-    try:
-        clients = get_aws_clients(config)
-        glue_client = clients['glue']
-        response = glue_client.get_tables(DatabaseName=config['glue_database'])
-        return [table['Name'] for table in response['TableList']]
-    except:
-        return []
+    """Get list of available tables (materialized copies are routed to, never picked directly)"""
+    return source_index(get_table_catalog(config))['names']
 
-def generate_enterprise_sql(question, config):
+def reuse_similar_question(question, account_id, database, saved_queries):
+    """SQL of a near-identical earlier question in this account and database, or None to generate.
+    Questions with a relative time window ('last quarter') are always generated: pruning baked
+    the window's dates into the earlier SQL"""
+    if parse_time_window(question):
+        return None
+    history = [
+        entry for entry in load_query_history()
+        # Approximate and budget-downgraded (sampled, row-capped) runs are not answers to reuse
+        if entry.get('account_id') == account_id and entry.get('database') == database
+        and not is_approximate(entry.get('sql')) and BUDGET_MARKER not in (entry.get('sql') or '')
+    ]
+    templates = [item for item in saved_queries if item.get('account_id') == account_id and item.get('database') == database]
+    match = find_similar_question(get_retrieval_index(templates, history), question)
+    if not match:
+        return None
+    st.info(f"♻️ Reused the SQL of a similar earlier question from the {match['source']} ({match['similarity']:.0%} similar): \"{match['question']}\"")
+    return match['sql']
+
+def generate_enterprise_sql(question, config, saved_queries=None):
+    """SQL for the question: reused from a near-identical earlier question (when saved_queries is given) or generated,
+    then pruned, routed to fresh materialized copies and validated the same way"""
+    catalog = get_table_catalog(config)
+    sql = reuse_similar_question(question, config['aws_account_id'], config['glue_database'], saved_queries) if saved_queries is not None else None
+    reused = sql is not None
+    if not reused:
+        sql = generate_model_sql(question, catalog, get_available_tables(config), lambda q: generate_base_sql(q, config))
+        sql = apply_partition_pruning(sql, question, catalog)
+        sql = apply_projection_pruning(sql, question, catalog, load_default_columns())
+    state = load_materialized_state()
+    if unknown_materialized_tables(state, catalog, config['aws_account_id']):
+        # Copies built after the shared catalog was loaded: reload it so validation knows them
+        catalog = get_table_catalog(config, force_refresh=True)
+    sql = fast_mode_sql(route_to_materialized(sql, state, catalog, config['aws_account_id']), question)
+    if not reused:
+        return sql
+    
+    if not validate_sql(sql, catalog)['valid']:
+        # e.g. it read a materialized copy that has since been replaced
+        st.caption("♻️ The earlier SQL no longer matches the catalog; generating new SQL instead")
+        return generate_enterprise_sql(question, config)
+    cached = get_result_store().lookup(fingerprint(sql, config['aws_account_id'], config['glue_database']))
+    if cached:
+        st.session_state.query_result = cached
+        st.session_state.query_result_sql = sql
+        st.session_state.query_execution_id = cached['result_id']
+        st.success(f"⚡ Its result from {(time.time() - cached['created_at']) / 60:.0f} min ago is still fresh ({cached['num_rows']:,} rows, nothing scanned)")
+    return sql
+
+def generate_model_sql(question, catalog, table_names, rules):
+    """SQL from the selected model backend (the rule engine when none is selected, a data source was picked, or the model is slow)"""
+    backend = None if st.session_state.get('manual_data_source') else selected_backend()
+    sql, source = generate_sql(question, catalog, backend, rules, names=table_names)
+    if source == 'rules':
+        return sql
+    st.caption(f"🧠 SQL generator: {source}")
+    if source.startswith('rules'):
+        return sql
+    return f'-- Generated from: "{question}"\n-- Generated by: {source}\n{sql}'
+
+def generate_base_sql(question, config):
     """Generate SQL for enterprise database using actual table names and views"""
-    available_tables = get_available_tables(config)
+    index = source_index(get_table_catalog(config))
+    available_tables = index['names']
     
     if not available_tables:
         return f"""-- Error: No tables found in database
@@ -715,8 +877,8 @@ FROM {database_name}.{manual_source}
 {limit_clause};"""
     
     # Continue with auto-selection logic
-    views = [t for t in available_tables if 'view' in t.lower() or '_detailed' in t.lower()]
-    tables = [t for t in available_tables if t not in views]
+    views = index['view_set']
+    tables = index['tables']
     question_lower = question.lower()
     
     # Executive Dashboard queries - HIGHEST PRIORITY
@@ -996,19 +1158,13 @@ FROM {database_name}.{first_table}
 {limit_clause};"""
     
     # Generic fallback - ALWAYS RETURN SOMETHING
-    # For contract-related questions, prefer contract tables
-    if "contract" in question_lower and tables:
-        contract_table = None
-        for table in tables:
-            if "contract" in table.lower():
-                contract_table = table
-                break
-        
-        if contract_table:
-            return f"""-- Generated from: "{question}"
--- Using contract table for general query
+    # Rank tables by how well their names, columns and comments match the question
+    best_table = best_match(index, question, index['table_set'])
+    if best_table:
+        return f"""-- Generated from: "{question}"
+-- Best-matching table for the question: {best_table}
 SELECT *
-FROM {database_name}.{contract_table}
+FROM {database_name}.{best_table}
 {limit_clause};"""
     
     # Final fallback - use first available item
@@ -1019,8 +1175,8 @@ FROM {database_name}.{contract_table}
 SELECT *
 FROM {database_name}.{first_table}
 {limit_clause};"""
-    elif views:
-        first_view = views[0]
+    elif index['views']:
+        first_view = index['views'][0]
         return f"""-- Generated from: "{question}"
 -- Using view: {first_view}
 SELECT *
@@ -1035,25 +1191,44 @@ def execute_enterprise_query(sql_query, config):
     """Execute query on enterprise Athena infrastructure"""
     try:
         clients = get_aws_clients(config)
-        athena_client = clients['athena']
+        exact_sql = exact_query_for(sql_query)
         
-        response = athena_client.start_query_execution(
-            QueryString=sql_query,
-            QueryExecutionContext={
-                'Database': config['glue_database']
-            },
-            WorkGroup=config['athena_workgroup'],
-            ResultConfiguration={
-                'OutputLocation': f"s3://{config['s3_results_bucket']}/"
-            }
-        )
+        # An identical query ran moments ago: show its stored result instead of scanning again
+        if statement_type(sql_query) in ('SELECT', 'WITH'):
+            cached = get_result_store().lookup(fingerprint(sql_query, config['aws_account_id'], config['glue_database']))
+            if cached:
+                st.session_state.query_result = cached
+                st.session_state.query_result_sql = sql_query
+                st.session_state.query_execution_id = cached['result_id']
+                minutes = (time.time() - cached['created_at']) / 60
+                st.success(f"⚡ Reused the result of an identical query from {minutes:.0f} min ago ({cached['num_rows']:,} rows, nothing scanned)")
+                return
         
-        query_execution_id = response['QueryExecutionId']
-        st.success(f"✅ Query submitted successfully! Execution ID: {query_execution_id}")
+        sql_query, estimate = guard_query(sql_query, config, clients)
+        if not sql_query:
+            return
+        run_guarded_query(sql_query, estimate, config, clients, exact_sql)
         
-        # Monitor query execution
-        with st.spinner("⏳ Executing query..."):
-            status = monitor_query_execution(athena_client, query_execution_id)
+    except Exception as e:
+        st.error(f"❌ Query execution error: {str(e)}")
+
+def run_guarded_query(sql_query, estimate, config, clients, exact_sql=None):
+    """Submit a query that already passed guard_query (sharing an identical in-flight run) and show its results"""
+    athena_client = clients['athena']
+    flight = None
+    try:
+        result_key = fingerprint(sql_query, config['aws_account_id'], config['glue_database'])
+        if statement_type(sql_query) in ('SELECT', 'WITH'):
+            # Another session is running the same query right now: share its execution
+            flight, leader = join_or_start(result_key)
+            if not leader:
+                follow_flight(flight, sql_query)
+                flight = None
+                return
+        
+        query_execution_id, status = submit_and_wait(athena_client, sql_query, sql_query, config, estimate, "⏳ Executing query...", flight=flight)
+        if flight:
+            flight.status = status
         
         if status == 'SUCCEEDED':
             # Check if this is a DDL statement (CREATE, DROP, ALTER)
@@ -1062,12 +1237,377 @@ def execute_enterprise_query(sql_query, config):
                 if sql_query.strip().upper().startswith('CREATE VIEW'):
                     st.info("📋 View created. You can now query it with SELECT statements.")
             else:
-                display_query_results(athena_client, query_execution_id)
+                handle = display_query_results(athena_client, query_execution_id, clients.get('s3'), sql_query, result_key)
+                if flight:
+                    flight.handle = handle
+                    finish_flight(flight)
+                    flight = None
+                if exact_sql and st.session_state.get('refine_exact', True):
+                    refine_in_background(exact_sql, config, clients)
         elif status == 'FAILED':
             st.error("❌ Query execution failed. Please check your SQL and try again.")
+    finally:
+        # Release sessions waiting on this execution, even when it failed
+        if flight:
+            finish_flight(flight)
+
+def execute_fan_out_query(sql_query, accounts):
+    """Run a query in every fan-out account concurrently; per-account status streams in, then the merged result is stored"""
+    try:
+        targets = []
+        sql_queries = {}
+        estimates = {}
+        for name, config in accounts.items():
+            st.markdown(f"**🌐 {name}**")
+            clients = get_aws_clients(config)
+            guarded_sql, estimate = guard_query(sql_query, config, clients)
+            if guarded_sql:
+                targets.append((name, config, clients))
+                sql_queries[name] = guarded_sql
+                estimates[name] = estimate
+        if not targets:
+            return
+        
+        st.success(f"✅ Query submitted to {len(targets)} account(s)")
+        clients_by_name = {name: clients for name, _, clients in targets}
+        progress_bar = st.progress(0)
+        status_table = st.empty()
+        outcomes = []
+        for outcome in fan_out(targets, sql_queries):
+            outcomes.append(outcome)
+            progress_bar.progress(len(outcomes) / len(targets))
+            status_table.dataframe(pd.DataFrame(fan_out_timings(outcomes)), use_container_width=True)
+            # Timed-out and cancelled runs scanned (and billed) too, so every submitted run counts towards the budgets
+            if outcome['execution_id']:
+                try:
+                    record_execution(
+                        clients_by_name[outcome['account']]['athena'], outcome['execution_id'], outcome['sql'],
+                        outcome['account_id'], estimates[outcome['account']],
+                        st.session_state.get('budget_user', ''), st.session_state.get('current_question', ''),
+                        accounts[outcome['account']]['glue_database']
+                    )
+                except Exception:
+                    pass
         
+        failed = [outcome['account'] for outcome in outcomes if outcome['batches'] is None]
+        if failed:
+            st.warning(f"⚠️ No results from: {', '.join(failed)}")
+        with st.spinner("📥 Merging results..."):
+            handle = store_fan_out_result(sql_query, outcomes)
+        # Row counts are known once each account's result has been streamed into the store
+        status_table.dataframe(pd.DataFrame(fan_out_timings(outcomes)), use_container_width=True)
+        if handle['num_rows']:
+            st.session_state.query_result = handle
+            st.session_state.query_result_sql = sql_query
+            st.session_state.query_execution_id = handle['result_id']
+            st.success(f"✅ Fan-out completed! {handle['num_rows']:,} rows from {len(outcomes) - len(failed)} account(s), tagged in the '{ACCOUNT_COLUMN}' column.")
+        else:
+            get_result_store().discard(handle)
+            st.info("Query executed successfully but returned no results.")
+    
     except Exception as e:
-        st.error(f"❌ Query execution error: {str(e)}")
+        st.error(f"❌ Fan-out error: {str(e)}")
+
+def execute_template(template, values, config):
+    """Run a saved template through its Athena prepared statement with the given parameter values"""
+    if not template['parameters'] or statement_type(template['sql']) not in ('SELECT', 'WITH'):
+        execute_enterprise_query(template['sql'], config)
+        return
+    
+    try:
+        clients = get_aws_clients(config)
+        sql_query = render_sql(template, values)
+        # Keyed by the statement and its parameter values, so no SQL is re-parsed for the lookup
+        result_key = fingerprint(template['statement'], config['aws_account_id'], config['glue_database'], *execution_parameters(template, values))
+        cached = get_result_store().lookup(result_key)
+        if cached:
+            st.session_state.query_result = cached
+            st.session_state.query_result_sql = sql_query
+            st.session_state.query_execution_id = cached['result_id']
+            st.success(f"⚡ Reused the result of this template run ({cached['num_rows']:,} rows, nothing scanned)")
+            return
+        
+        guarded_sql, estimate = guard_query(sql_query, config, clients)
+        if not guarded_sql:
+            return
+        if guarded_sql != sql_query:
+            # Downgraded by the budget guard: the prepared statement no longer applies, the guarded SQL runs as-is
+            run_guarded_query(guarded_sql, estimate, config, clients)
+            return
+        
+        query_execution_id, status = submit_and_wait(
+            clients['athena'], sql_query, sql_query, config, estimate, "⏳ Executing template...", template=template, values=values
+        )
+        if status == 'SUCCEEDED':
+            display_query_results(clients['athena'], query_execution_id, clients.get('s3'), sql_query, result_key)
+        elif status == 'FAILED':
+            st.error("❌ Template execution failed. Please check its parameters and try again.")
+    
+    except Exception as e:
+        st.error(f"❌ Template execution error: {str(e)}")
+
+def unload_enterprise_query(sql_query, config):
+    """Export query results to S3 as Parquet with UNLOAD; rows never pass through the app"""
+    try:
+        clients = get_aws_clients(config)
+        athena_client = clients['athena']
+        
+        sql_query, estimate = guard_query(sql_query, config, clients)
+        if not sql_query:
+            return
+        
+        target = export_location(config['s3_results_bucket'])
+        query_execution_id, status = submit_and_wait(
+            athena_client, build_unload_sql(sql_query, target), sql_query, config, estimate, "📦 Exporting results to Parquet..."
+        )
+        
+        if status == 'SUCCEEDED':
+            parts = list_part_files(clients['s3'], target)
+            st.session_state.unload_export = {
+                'target': target,
+                'parts': parts,
+                'sql': sql_query,
+                'question': st.session_state.get('current_question', ''),
+                'execution_id': query_execution_id
+            }
+            st.success(f"✅ Exported {len(parts)} Parquet file(s) to {target}")
+        elif status == 'FAILED':
+            st.error("❌ Export failed. Please check your SQL and try again.")
+    
+    except Exception as e:
+        st.error(f"❌ Export error: {str(e)}")
+
+def render_unload_export(config):
+    """List the Parquet files of the last UNLOAD export with download links and a QuickSight hand-off"""
+    export = st.session_state.get('unload_export')
+    if not export:
+        return
+    
+    st.markdown("### 📦 Parquet Export")
+    parts = export['parts']
+    known_rows = [part['rows'] for part in parts if part['rows'] is not None]
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Files", len(parts))
+    with col2:
+        st.metric("Total Size", format_bytes(sum(part['size'] for part in parts)))
+    with col3:
+        st.metric("Rows", f"{sum(known_rows):,}" if known_rows else "–")
+    
+    st.caption(f"Location: `{export['target']}` (download links expire in 1 hour)")
+    clients = get_aws_clients(config)
+    for part in parts:
+        file_name = part['key'].rsplit('/', 1)[-1]
+        rows = f" · {part['rows']:,} rows" if part['rows'] is not None else ""
+        st.markdown(f"[⬇️ {file_name}]({download_url(clients['s3'], part)}) · {format_bytes(part['size'])}{rows}")
+    
+    if not parts:
+        st.info("The query returned no rows, so no files were written.")
+        return
+    
+    table_name = st.text_input("Glue table name for QuickSight:", value=export_table_name(export['question']), key="unload_table_name")
+    if st.button("🚀 Register Table & Export to QuickSight", key="unload_quicksight"):
+        try:
+            with st.spinner("🔄 Registering export and creating QuickSight dataset..."):
+                columns = export_columns(clients['s3'], parts)
+                register_export_table(clients['glue'], config['glue_database'], table_name, export['target'], columns, parts)
+                export['table_name'] = table_name
+                get_table_catalog(config, force_refresh=True)
+                result = QuickSightExporter(config).export_to_quicksight(
+                    export['sql'], export['question'], custom_name=table_name,
+                    table_name=table_name, input_columns=quicksight_columns(columns)
+                )
+            if result['success']:
+                st.success(f"✅ {result['message']}")
+                st.markdown(f"[🗂️ View Dataset]({result['urls']['dataset']}) · [📈 Create Analysis]({result['urls']['create_analysis']})")
+            else:
+                st.error(f"❌ {result['message']}")
+        except Exception as e:
+            st.error(f"❌ QuickSight hand-off failed: {str(e)}")
+
+def submit_and_wait(athena_client, query_string, sql_query, config, estimate, spinner_text, template=None, values=None, flight=None):
+    """Submit a statement (or EXECUTE a template's prepared statement), wait for it and record it in the query history; returns (execution ID, status)"""
+    catalog = get_table_catalog(config)
+    query_context = {
+        'QueryExecutionContext': {
+            'Database': config['glue_database']
+        },
+        'ResultConfiguration': {
+            'OutputLocation': f"s3://{config['s3_results_bucket']}/"
+        }
+    }
+    
+    if template:
+        query_execution_id = start_template_execution(
+            athena_client, template, values, config['athena_workgroup'], query_context, config['aws_account_id']
+        )
+    else:
+        cached_query_string = rewrite_with_cache(query_string, load_subquery_cache(), catalog, config['aws_account_id'])
+        if cached_query_string != query_string:
+            st.caption("♻️ Reusing cached results for repeated subqueries")
+            query_string = cached_query_string
+        
+        response = athena_client.start_query_execution(
+            QueryString=query_string,
+            WorkGroup=config['athena_workgroup'],
+            **query_context
+        )
+        query_execution_id = response['QueryExecutionId']
+    
+    if flight:
+        # Sessions joining from now on can show which execution they share
+        flight.execution_id = query_execution_id
+    st.success(f"✅ Query submitted successfully! Execution ID: {query_execution_id}")
+    
+    # Monitor query execution
+    with st.spinner(spinner_text):
+        status = monitor_query_execution(athena_client, query_execution_id)
+    
+    if status in ('SUCCEEDED', 'FAILED'):
+        try:
+            record_execution(
+                athena_client, query_execution_id, sql_query, config['aws_account_id'],
+                estimate, st.session_state.get('budget_user', ''), st.session_state.get('current_question', ''),
+                config['glue_database']
+            )
+        except Exception:
+            pass
+    
+    if status == 'SUCCEEDED':
+        maintain_subquery_cache(config, catalog)
+    
+    return query_execution_id, status
+
+def maintain_subquery_cache(config, catalog):
+    """Promote/expire cached subqueries and start CTAS for newly hot ones (never fails the query)"""
+    try:
+        clients = get_aws_clients(config)
+        update_cache(
+            clients['athena'], clients['s3'], catalog, load_query_history(),
+            config['athena_workgroup'], config['s3_results_bucket'], glue_client=clients['glue'],
+            budget=resolve_budget(load_budgets(), config['aws_account_id'], st.session_state.get('budget_user', '')),
+            account_id=config['aws_account_id'], user=st.session_state.get('budget_user', '')
+        )
+    except Exception:
+        pass
+
+def refine_in_background(exact_sql, config, clients):
+    """Start the exact query behind an approximate result, unless the budget would cut it down"""
+    guarded_sql, _ = guard_query(exact_sql, config, clients)
+    if guarded_sql != exact_sql:
+        st.info("🎯 Exact refinement skipped: the full query does not fit the scan budget.")
+        return
+    start_exact_refinement(
+        clients['athena'], exact_sql,
+        {
+            'QueryExecutionContext': {'Database': config['glue_database']},
+            'WorkGroup': config['athena_workgroup'],
+            'ResultConfiguration': {'OutputLocation': f"s3://{config['s3_results_bucket']}/"}
+        },
+        config['aws_account_id'], st.session_state.get('budget_user', '')
+    )
+
+def run_summary_query(sql_query, config):
+    """Run a push-down aggregate query and return its stored result handle"""
+    flight = None
+    try:
+        clients = get_aws_clients(config)
+        cached = get_result_store().lookup(fingerprint(sql_query, config['aws_account_id'], config['glue_database']))
+        if cached:
+            return cached
+        
+        sql_query, estimate = guard_query(sql_query, config, clients)
+        if not sql_query:
+            return None
+        
+        result_key = fingerprint(sql_query, config['aws_account_id'], config['glue_database'])
+        flight, leader = join_or_start(result_key)
+        if not leader:
+            handle = follow_flight(flight, sql_query, summary=True)
+            flight = None
+            return handle
+        
+        query_execution_id, status = submit_and_wait(clients['athena'], sql_query, sql_query, config, estimate, "🧮 Aggregating in Athena...", flight=flight)
+        flight.status = status
+        if status == 'SUCCEEDED':
+            flight.handle = fetch_query_result(clients['athena'], clients.get('s3'), query_execution_id, result_key)
+            return flight.handle
+        if status == 'FAILED':
+            st.error("❌ Summary query failed.")
+    except Exception as e:
+        st.error(f"❌ Summary query error: {str(e)}")
+    finally:
+        if flight:
+            finish_flight(flight)
+    return None
+
+def render_result_summary(config):
+    """Push-down breakdowns of the current result (or of its Parquet export, when registered)"""
+    handle = st.session_state.query_result
+    base_sql = st.session_state.get('query_result_sql') or st.session_state.get('last_query', '')
+    export = st.session_state.get('unload_export') or {}
+    source_table = export.get('table_name') if export.get('sql') == base_sql else None
+    if source_table:
+        st.caption(f"Aggregating the Parquet export `{source_table}` instead of re-running the query.")
+    render_pushdown_analytics(
+        base_sql, result_fields(handle), lambda sql: run_summary_query(sql, config),
+        key="summary", source_table=source_table
+    )
+
+def guard_query(sql_query, config, clients):
+    """Validate, estimate and budget-check a query; returns the (possibly downgraded) SQL and its estimate"""
+    if not preflight_check(sql_query, config, clients['athena']):
+        return None, None
+    
+    catalog = get_table_catalog(config)
+    history = load_query_history()
+    estimate = estimate_query_cost(sql_query, catalog, history, s3_client=clients['s3'], glue_client=clients['glue'])
+    
+    # Budget guardrails: refuse, or sample + LIMIT, queries that would overspend
+    user = st.session_state.get('budget_user', '')
+    budget = resolve_budget(load_budgets(), config['aws_account_id'], user)
+    guard = check_budget(estimate, budget, daily_usage(history, config['aws_account_id'], user))
+    if guard['decision'] == 'downgrade':
+        downgraded = downgrade_query(sql_query, estimate, guard['allowed_bytes'], catalog, budget['max_rows_on_downgrade'])
+        if downgraded:
+            st.warning(f"💰 Query downgraded because {guard['reason']} ({format_bytes(estimate['bytes'])} estimated, {format_bytes(guard['allowed_bytes'])} allowed)")
+            st.code(downgraded, language="sql")
+            sql_query = downgraded
+            estimate = estimate_query_cost(sql_query, catalog, history, s3_client=clients['s3'], glue_client=clients['glue'])
+        else:
+            guard['decision'] = 'refuse'
+    if guard['decision'] == 'refuse':
+        st.error(f"💰 Query refused because {guard['reason']} ({format_bytes(estimate['bytes'])} estimated, {format_bytes(guard['allowed_bytes'])} allowed)")
+        st.info("💡 Add filters (dates, regions) or select fewer columns to reduce the scan.")
+        return None, None
+    
+    similar = f" (median of {estimate['similar_runs']} similar runs)" if estimate['similar_runs'] else ""
+    st.caption(f"📏 Estimated scan: {format_bytes(estimate['bytes'])} · ~{estimate['seconds']:.1f}s{similar} · ${estimate['cost_usd']:.4f}")
+    return sql_query, estimate
+
+def preflight_check(sql_query, config, athena_client):
+    """Validate SQL against the cached catalog (and optionally EXPLAIN) before submitting it"""
+    validation = validate_sql(sql_query, get_table_catalog(config))
+    for warning in validation['warnings']:
+        st.warning(f"⚠️ {warning}")
+    if not validation['valid']:
+        for error in validation['errors']:
+            st.error(f"❌ {error}")
+        st.info("💡 Fix the SQL with ✏️ Edit SQL and run it again. Nothing was submitted to Athena.")
+        return False
+    
+    if st.session_state.get('preflight_explain', True):
+        with st.spinner("🧪 Checking query plan..."):
+            ok, message = explain_query(
+                athena_client, sql_query, config['glue_database'], config['athena_workgroup'],
+                f"s3://{config['s3_results_bucket']}/"
+            )
+        if not ok:
+            st.error(f"❌ Athena rejected the query: {message}")
+            return False
+    
+    return True
 
 def monitor_query_execution(athena_client, query_execution_id):
     """Monitor Athena query execution status"""
@@ -1104,28 +1644,23 @@ def monitor_query_execution(athena_client, query_execution_id):
     
     return 'TIMEOUT'
 
-def display_query_results(athena_client, query_execution_id):
-    """Display query results in Streamlit"""
+def display_query_results(athena_client, query_execution_id, s3_client=None, sql_query=None, result_key=None):
+    """Spill query results to the result store; session state keeps only the handle (returned; None when empty)"""
     try:
-        results = athena_client.get_query_results(QueryExecutionId=query_execution_id)
+        handle = fetch_query_result(athena_client, s3_client, query_execution_id, result_key)
         
-        columns = [col['Label'] for col in results['ResultSet']['ResultSetMetadata']['ColumnInfo']]
-        rows = []
-        
-        for row in results['ResultSet']['Rows'][1:]:  # Skip header row
-            row_data = [field.get('VarCharValue', '') for field in row['Data']]
-            rows.append(row_data)
-        
-        if rows:
-            df = pd.DataFrame(rows, columns=columns)
-            st.session_state.query_results = df
+        if handle['num_rows']:
+            st.session_state.query_result = handle
+            st.session_state.query_result_sql = sql_query
             st.session_state.query_execution_id = query_execution_id
-            st.success(f"✅ Query completed! {len(df)} rows returned.")
-        else:
-            st.info("Query executed successfully but returned no results.")
+            st.success(f"✅ Query completed! {handle['num_rows']:,} rows returned.")
+            return handle
+        get_result_store().discard(handle)
+        st.info("Query executed successfully but returned no results.")
             
     except Exception as e:
         st.error(f"Error displaying results: {str(e)}")
+    return None
 
 def load_user_accounts():
     """Load user-added accounts from file"""
@@ -1194,7 +1729,7 @@ def render_account_management():
             else:
                 st.error("Please fill required fields")
 
-def save_query_template(question, sql):
+def save_query_template(question, sql, config):
     """Save query as reusable template with file persistence"""
     import json
     
@@ -1202,19 +1737,25 @@ def save_query_template(question, sql):
     if 'saved_queries' not in st.session_state:
         st.session_state.saved_queries = load_saved_queries()
     
-    template = {
-        'question': question,
-        'sql': sql,
-        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    }
+    # Literals in filters become typed parameters; the SQL is parsed here and never again
+    template = make_template(sql, question)
+    template['timestamp'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    # Reused for similar questions only in the account and database it was written for
+    template['account_id'] = config['aws_account_id']
+    template['database'] = config['glue_database']
     
-    st.session_state.saved_queries.append(template)
+    # The same statement (modulo comments, formatting, case and parameter values) replaces its older copy
+    count_before = len(st.session_state.saved_queries)
+    st.session_state.saved_queries = dedupe_by_fingerprint(st.session_state.saved_queries + [template], sql_key='statement')
     
     # Save to file
     try:
         with open('saved_queries.json', 'w') as f:
             json.dump(st.session_state.saved_queries, f, indent=2)
-        st.success("✅ Query saved as template!")
+        if len(st.session_state.saved_queries) == count_before:
+            st.success("✅ Template already saved; updated it to this version")
+        else:
+            st.success("✅ Query saved as template!")
     except Exception as e:
         st.error(f"Failed to save query: {str(e)}")
 
@@ -1223,7 +1764,7 @@ def load_saved_queries():
     import json
     try:
         with open('saved_queries.json', 'r') as f:
-            return json.load(f)
+            return dedupe_by_fingerprint([upgrade_template(item) for item in json.load(f)], sql_key='statement')
     except FileNotFoundError:
         return []
     except Exception:
@@ -1260,5 +1801,133 @@ def render_saved_queries_sidebar():
                     st.session_state.current_question = query.get('name', query.get('question', 'Loaded Template'))
                     st.rerun()
 
+def render_recent_queries_sidebar():
+    """Distinct recently run queries (one per fingerprint) with run counts and median runtime"""
+    history = load_query_history()
+    if not history:
+        return
+    
+    with st.sidebar.expander("🕘 Recent Queries"):
+        latency = latency_by_fingerprint(history, by='fingerprint')
+        for i, entry in enumerate(distinct_queries(history)[:RECENT_QUERIES_SHOWN]):
+            stats = latency.get(entry_fingerprints(entry)[0])
+            timing = f" · median {stats['p50_ms'] / 1000:.1f}s" if stats else ""
+            st.caption(f"{entry['timestamp']} · {entry['runs']} run(s){timing} · {format_bytes(entry.get('data_scanned_bytes') or 0)}")
+            st.code(entry['sql'][:150] + "..." if len(entry['sql']) > 150 else entry['sql'], language='sql')
+            if st.button("Load", key=f"recent_query_{i}"):
+                st.session_state.current_sql = entry['sql']
+                st.rerun()
+
+def render_default_columns_sidebar(config):
+    """Let users choose the default column set per table/view used instead of SELECT *"""
+    catalog = get_table_catalog(config)
+    if not catalog['table_names']:
+        return
+    
+    with st.sidebar.expander("🧩 Default Columns"):
+        st.caption("Generated queries select these columns (plus the ones your question needs) instead of SELECT *")
+        
+        table_name = st.selectbox("Table/View:", catalog['table_names'], key="default_columns_table")
+        table_info = catalog['tables'][table_name]
+        column_names = [c['name'] for c in table_info['columns'] + table_info['partition_keys']]
+        
+        default_columns = load_default_columns()
+        current = [c for c in default_columns.get(table_name, []) if c in column_names]
+        selected = st.multiselect("Columns:", column_names, default=current, key=f"default_columns_{table_name}")
+        
+        if st.button("Save Columns", key="save_default_columns"):
+            if selected:
+                default_columns[table_name] = selected
+            else:
+                default_columns.pop(table_name, None)
+            
+            if save_default_columns(default_columns):
+                st.success("✅ Default columns saved!")
+            else:
+                st.error("❌ Failed to save default columns")
+
+def signed_in_user():
+    """Email of the user signed in through Streamlit authentication, or '' when the app has none"""
+    user = getattr(st, 'user', None) or getattr(st, 'experimental_user', None)
+    try:
+        if user is None or not user.get('is_logged_in', True):
+            return ''
+        return user.get('email') or ''
+    except Exception:
+        return ''
+
+def render_cost_budget_sidebar(config):
+    """Show today's scan usage against the account/user budgets and enforce the per-query cutoff"""
+    with st.sidebar.expander("💰 Cost Budget"):
+        user = signed_in_user()
+        if user:
+            st.caption(f"Signed in as **{user}**")
+        else:
+            user = st.text_input("Your name:", key="budget_user_name", help="Daily budgets are tracked per user")
+            st.caption("⚠️ No sign-in configured: per-user budgets are advisory only, since anyone can enter another name.")
+        st.session_state.budget_user = user
+        budgets = load_budgets()
+        budget = resolve_budget(budgets, config['aws_account_id'], user)
+        usage = daily_usage(load_query_history(), config['aws_account_id'], user)
+        
+        st.write(f"**Per-query limit:** {format_bytes(budget['per_query_bytes'])}")
+        st.progress(min(usage['account_bytes'] / budget['account_daily_bytes'], 1.0))
+        st.caption(f"Account today: {format_bytes(usage['account_bytes'])} of {format_bytes(budget['account_daily_bytes'])}")
+        if budget['user_daily_bytes']:
+            st.progress(min(usage['user_bytes'] / budget['user_daily_bytes'], 1.0))
+            st.caption(f"You today: {format_bytes(usage['user_bytes'])} of {format_bytes(budget['user_daily_bytes'])}")
+        
+        # The workgroup is shared by every user of the account: only admins set it, from the account's limit
+        if is_budget_admin(budgets, signed_in_user()) and st.button("Apply account limit to workgroup", key="apply_workgroup_cutoff"):
+            try:
+                athena_client = get_aws_clients(config)['athena']
+                account_limit = resolve_budget(budgets, config['aws_account_id'])['per_query_bytes']
+                cutoff = apply_workgroup_cutoff(athena_client, config['athena_workgroup'], account_limit)
+                st.success(f"✅ {config['athena_workgroup']} now cancels queries scanning over {format_bytes(cutoff)}")
+            except Exception as e:
+                st.error(f"❌ Could not update workgroup: {str(e)}")
+
+def render_materialized_views_sidebar(config):
+    """Freshness of the materialized quick-action views, with a periodic change check and rebuild buttons"""
+    with st.sidebar.expander("🧱 Materialized Views"):
+        catalog = get_table_catalog(config)
+        account_id = config['aws_account_id']
+        state = load_materialized_state()
+        
+        if time.time() - materialized_scope(state, account_id, catalog['database'])['checked_at'] > MATERIALIZED_CHECK_INTERVAL_SECONDS:
+            try:
+                s3_client = get_aws_clients(config)['s3']
+                update_materialized_state(lambda latest: check_freshness(latest, catalog, account_id, s3_client))
+                state = load_materialized_state()
+            except Exception:
+                pass
+        
+        for row in materialized_status(state, catalog, account_id):
+            st.caption(f"**{row['View']}**: {row['Status']} · built {row['Built']}")
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            rebuild_stale = st.button("Rebuild stale", key="mv_rebuild_stale")
+        with col2:
+            rebuild_all = st.button("Rebuild all", key="mv_rebuild_all")
+        
+        if rebuild_stale or rebuild_all:
+            try:
+                clients = get_aws_clients(config)
+                with st.spinner("🧱 Building Parquet copies with CTAS..."):
+                    messages = refresh_materialized_views(
+                        clients['athena'], clients['s3'], catalog, config['athena_workgroup'],
+                        config['s3_results_bucket'], force=rebuild_all,
+                        budget=resolve_budget(load_budgets(), config['aws_account_id'], st.session_state.get('budget_user', '')),
+                        account_id=config['aws_account_id'], user=st.session_state.get('budget_user', '')
+                    )
+                for view_name, message in messages.items():
+                    st.write(f"• {view_name}: {message}")
+                if not messages:
+                    st.success("✅ All materialized views are fresh")
+                get_table_catalog(config, force_refresh=True)
+            except Exception as e:
+                st.error(f"❌ Rebuild failed: {str(e)}")
+
 if __name__ == "__main__":
     main()
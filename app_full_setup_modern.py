@@ -1,10 +1,35 @@
 import streamlit as st
-import boto3
 import pandas as pd
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import io
 import time
 from datetime import datetime
 import os
 from dotenv import load_dotenv
+import synthetic_data
+from glue_catalog import load_default_columns
+from query_optimizer import apply_partition_pruning, apply_projection_pruning, parse_time_window, FULL_SCAN_MARKER
+from cost_estimator import estimate_query_cost, format_bytes
+from query_history import load_query_history, record_execution
+from sql_validator import validate_sql, explain_query, statement_type
+from sql_fingerprint import fingerprint, dedupe_by_fingerprint
+from result_store import fetch_query_result, get_result_store
+from result_viewer import render_result_pages, render_result_profile
+from pushdown_analytics import render_pushdown_analytics, result_fields
+from materialized_views import (
+    load_materialized_state, update_materialized_state, check_freshness, refresh_materialized_views,
+    route_to_materialized, materialized_status, unknown_materialized_tables
+)
+from subquery_cache import load_subquery_cache, rewrite_with_cache, update_cache
+from source_prediction import source_index, predict_source, question_changed, best_match
+from query_templates import make_template, render_sql, execution_parameters, render_parameter_inputs, start_template_execution
+from query_coalescer import join_or_start, finish_flight, follow_flight
+from shared_services import get_client, get_shared_catalog, render_service_stats
+from nl_backends import generate_sql, selected_backend, render_backend_selector
+from query_retrieval import get_retrieval_index, find_similar_question
+from approximate_query import render_fast_mode_controls, fast_mode_sql, exact_query_for, is_approximate, start_exact_refinement, render_exact_refinement
+from cost_guard import load_budgets, resolve_budget, daily_usage, check_budget, downgrade_query, BUDGET_MARKER
 
 # Load environment variables
 load_dotenv()
@@ -20,6 +45,12 @@ SETUP_CONFIG = {
     'quicksight_account_id': os.getenv('QUICKSIGHT_ACCOUNT_ID', '')
 }
 
+# Glue catalog is cached per session and refreshed after this many seconds
+CATALOG_TTL_SECONDS = 300
+
+# Sample data generation
+SAMPLE_DATA_CHUNK_ROWS = 500_000  # rows generated and uploaded per batch
+
 # Page configuration
 st.set_page_config(
     page_title="Athena Query Generator - Full Setup",
@@ -124,6 +155,15 @@ def main():
             SETUP_CONFIG['s3_results_bucket'] = f"aws-athena-query-results-{region}-{account_id}"
             SETUP_CONFIG['s3_raw_data'] = f"athena-raw-data-{account_id}"
             SETUP_CONFIG['quicksight_account_id'] = account_id
+        
+        # Sampled, approximate answers for exploratory questions
+        render_fast_mode_controls()
+        
+        # Model-based SQL generation, when a local or remote model is configured
+        render_backend_selector()
+        
+        # Catalogs, results and clients held for all sessions
+        render_service_stats()
     
     # Main content with tabs
     if progress_value < 1.0:
@@ -164,13 +204,13 @@ def check_setup_progress():
     
     try:
         # Check AWS connection
-        sts_client = boto3.client('sts', region_name=SETUP_CONFIG['aws_region'])
+        sts_client = get_client('sts', region_name=SETUP_CONFIG['aws_region'])
         identity = sts_client.get_caller_identity()
         if identity.get('Account') == SETUP_CONFIG['aws_account_id']:
             progress["AWS Connection"] = True
         
         # Check S3 buckets
-        s3_client = boto3.client('s3', region_name=SETUP_CONFIG['aws_region'])
+        s3_client = get_client('s3', region_name=SETUP_CONFIG['aws_region'])
         try:
             s3_client.head_bucket(Bucket=SETUP_CONFIG['s3_results_bucket'])
             progress["S3 Buckets"] = True
@@ -178,7 +218,7 @@ def check_setup_progress():
             pass
         
         # Check Athena workgroup
-        athena_client = boto3.client('athena', region_name=SETUP_CONFIG['aws_region'])
+        athena_client = get_client('athena', region_name=SETUP_CONFIG['aws_region'])
         try:
             workgroups = athena_client.list_work_groups()
             workgroup_names = [wg['Name'] for wg in workgroups['WorkGroups']]
@@ -188,7 +228,7 @@ def check_setup_progress():
             pass
         
         # Check Glue database
-        glue_client = boto3.client('glue', region_name=SETUP_CONFIG['aws_region'])
+        glue_client = get_client('glue', region_name=SETUP_CONFIG['aws_region'])
         try:
             databases = glue_client.get_databases()
             database_names = [db['Name'] for db in databases['DatabaseList']]
@@ -280,12 +320,25 @@ def show_setup_wizard():
         with col1:
             st.write("**Sample datasets to create:**")
             st.write("• Sales transactions")
-            st.write("• Customer data") 
+            st.write("• Customer data")
             st.write("• Contract information")
-        
+
+            storage_format = st.radio(
+                "Storage format:",
+                ["Parquet (partitioned)", "CSV (text)"],
+                horizontal=True,
+                help="Parquet is columnar and partitioned, so Athena only reads the columns and partitions a query needs"
+            )
+            sales_rows = st.number_input("Sales rows", min_value=100, max_value=50_000_000, value=100, step=100_000)
+            contract_rows = st.number_input("Contract rows", min_value=50, max_value=10_000_000, value=50, step=50_000)
+
         with col2:
             if st.button("📤 Create Sample Data", use_container_width=True):
-                create_sample_data()
+                create_sample_data(
+                    storage_format='parquet' if storage_format.startswith('Parquet') else 'csv',
+                    sales_rows=int(sales_rows),
+                    contract_rows=int(contract_rows)
+                )
     
     # Step 6: QuickSight
     with st.expander("Step 6: QuickSight Integration"):
@@ -342,10 +395,11 @@ def show_query_interface():
             key="question_input"
         )
         
-        # Data source selector
-        available_tables = get_available_tables()
+        # Data source selector (a stale catalog is not refetched on the rerun that edited the question)
+        index = source_index(get_table_catalog(allow_stale=question_changed(user_question)))
+        available_tables = index['names']
         if available_tables:
-            auto_selected = predict_data_source(user_question, available_tables) if user_question else "Auto-select based on question"
+            auto_selected = predict_source(predict_data_source, SOURCE_KEYWORDS, user_question, index) if user_question else "Auto-select based on question"
             
             data_source_options = ["🤖 Auto-select"] + available_tables
             selected_data_source = st.selectbox(
@@ -405,7 +459,7 @@ def show_query_interface():
             current_question = user_question
             if current_question and current_question.strip():
                 with st.spinner("🤖 Processing your question..."):
-                    generated_sql = generate_enterprise_sql(current_question)
+                    generated_sql = generate_enterprise_sql(current_question, st.session_state.get('saved_queries', []))
                     st.session_state.current_sql = generated_sql
                     st.session_state.current_question = current_question
                     st.success("✅ Query generated! Review below and click Execute.")
@@ -424,6 +478,9 @@ def show_query_interface():
         st.markdown("### 📝 Generated SQL Query")
         st.code(st.session_state.current_sql, language="sql")
         
+        if FULL_SCAN_MARKER in st.session_state.current_sql:
+            st.warning("⚠️ This query scans every partition of at least one table. Add a date range (e.g. \"last quarter\") or other filter to reduce cost.")
+        
         # Query actions
         col1, col2, col3, col4 = st.columns(4)
         
@@ -453,7 +510,7 @@ def show_query_interface():
             """, unsafe_allow_html=True)
         
         with col4:
-            if 'query_results' in st.session_state:
+            if 'query_result' in st.session_state:
                 quicksight_datasets_url = f"https://{SETUP_CONFIG['aws_region']}.quicksight.aws.amazon.com/sn/start/data-sets"
                 st.markdown(f"""
                 <a href="{quicksight_datasets_url}" target="_blank" style="
@@ -494,22 +551,31 @@ def show_query_interface():
                 st.rerun()
     
     # Results Section (same as enterprise)
-    if 'query_results' in st.session_state:
+    if 'exact_refinement' in st.session_state:
+        try:
+            render_exact_refinement(
+                get_client('athena', region_name=SETUP_CONFIG['aws_region']),
+                get_client('s3', region_name=SETUP_CONFIG['aws_region'])
+            )
+        except Exception as e:
+            st.warning(f"⚠️ Could not check the exact refinement: {str(e)}")
+    
+    if 'query_result' in st.session_state:
         st.markdown("### 📊 Query Results")
         
-        df = st.session_state.query_results
+        handle = st.session_state.query_result
         
         # Results summary
         col1, col2, col3 = st.columns(3)
         with col1:
-            st.metric("Total Rows", len(df))
+            st.metric("Total Rows", f"{handle['num_rows']:,}")
         with col2:
-            st.metric("Columns", len(df.columns))
+            st.metric("Columns", len(handle['columns']))
         with col3:
             st.metric("Status", "Success ✅")
         
-        # Data display
-        st.dataframe(df, use_container_width=True, height=400)
+        # Data display (one page at a time from the on-disk result)
+        render_result_pages(handle)
         
         # Export options
         st.markdown("### 📤 Export to QuickSight")
@@ -564,20 +630,25 @@ def show_query_interface():
         
         for i, template in enumerate(reversed(st.session_state.saved_queries[-3:])):
             with st.expander(f"📝 {template['question']} - {template['timestamp']}"):
-                st.code(template['sql'], language="sql")
+                values = render_parameter_inputs(template, key=f"template_{i}")
+                rendered_sql = render_sql(template, values)
+                st.code(rendered_sql, language="sql")
                 
                 col1, col2, col3 = st.columns(3)
                 with col1:
                     if st.button("🔄 Load Query", key=f"load_{i}", use_container_width=True):
-                        st.session_state.current_sql = template['sql']
+                        st.session_state.current_sql = rendered_sql
                         st.session_state.current_question = template['question']
                         st.success(f"✅ Loaded: {template['question']}")
                         
                 with col2:
                     if st.button("▶️ Execute Now", key=f"exec_{i}", use_container_width=True):
-                        st.session_state.current_sql = template['sql']
+                        st.session_state.current_sql = rendered_sql
                         st.session_state.current_question = template['question']
-                        execute_enterprise_query(template['sql'])
+                        if template['parameters']:
+                            execute_enterprise_query(rendered_sql, template=template, values=values)
+                        else:
+                            execute_enterprise_query(template['sql'])
                         
                 with col3:
                     if st.button("🗑️ Delete", key=f"delete_{i}", use_container_width=True):
@@ -589,38 +660,33 @@ def show_results_analytics():
     """Results and analytics tab"""
     st.markdown("### 📊 Query Results & Analytics")
     
-    if 'query_results' in st.session_state:
-        df = st.session_state.query_results
+    if 'query_result' in st.session_state:
+        handle = st.session_state.query_result
         
         # Results summary
         col1, col2, col3 = st.columns(3)
         with col1:
-            st.metric("Total Rows", len(df))
+            st.metric("Total Rows", f"{handle['num_rows']:,}")
         with col2:
-            st.metric("Columns", len(df.columns))
+            st.metric("Columns", len(handle['columns']))
         with col3:
             st.metric("Status", "Success ✅")
         
-        # Data display
-        st.dataframe(df, use_container_width=True, height=400)
+        # Data display (one page at a time from the on-disk result)
+        render_result_pages(handle, key="analytics")
         
-        # Basic analytics
-        if len(df) > 0:
-            st.markdown("### 📈 Quick Analytics")
-            
-            # Show column types
-            col1, col2 = st.columns(2)
-            with col1:
-                st.markdown("**Column Information:**")
-                for col in df.columns:
-                    st.write(f"• {col}: {df[col].dtype}")
-            
-            with col2:
-                st.markdown("**Data Summary:**")
-                numeric_cols = df.select_dtypes(include=['number']).columns
-                if len(numeric_cols) > 0:
-                    for col in numeric_cols[:3]:  # Show first 3 numeric columns
-                        st.write(f"• {col}: avg {df[col].mean():.2f}")
+        # Column profile, computed once per execution
+        st.markdown("### 📈 Quick Analytics")
+        render_result_profile(handle)
+        
+        # Breakdowns run as aggregate queries in Athena; only the grouped rows come back
+        st.markdown("### 🧮 Summarize in Athena")
+        render_pushdown_analytics(
+            st.session_state.get('query_result_sql') or st.session_state.get('current_sql', ''),
+            result_fields(handle),
+            lambda sql: execute_enterprise_query(sql, summary=True),
+            key="analytics_summary"
+        )
     else:
         st.info("Execute a query to see results and analytics here.")
 
@@ -664,12 +730,47 @@ def show_setup_management():
     with col3:
         if st.button("📊 Add More Sample Data", use_container_width=True):
             create_additional_sample_data()
+    
+    # Materialized quick-action views
+    st.markdown("#### 🧱 Materialized Views")
+    catalog = get_table_catalog()
+    state = load_materialized_state()
+    st.dataframe(materialized_status(state, catalog, SETUP_CONFIG['aws_account_id']), use_container_width=True)
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        check_changes = st.button("🔍 Check for Data Changes", use_container_width=True)
+    with col2:
+        rebuild_stale = st.button("🧱 Rebuild Stale", use_container_width=True)
+    with col3:
+        rebuild_all = st.button("♻️ Rebuild All", use_container_width=True)
+    
+    try:
+        s3_client = get_client('s3', region_name=SETUP_CONFIG['aws_region'])
+        if check_changes:
+            stale = update_materialized_state(lambda latest: check_freshness(latest, catalog, SETUP_CONFIG['aws_account_id'], s3_client))
+            st.info(f"Stale: {', '.join(stale)}" if stale else "✅ All materialized views are fresh")
+        if rebuild_stale or rebuild_all:
+            with st.spinner("🧱 Building Parquet copies with CTAS..."):
+                messages = refresh_materialized_views(
+                    get_client('athena', region_name=SETUP_CONFIG['aws_region']), s3_client, catalog,
+                    SETUP_CONFIG['athena_workgroup'], SETUP_CONFIG['s3_results_bucket'], force=rebuild_all,
+                    budget=resolve_budget(load_budgets(), SETUP_CONFIG['aws_account_id']), account_id=SETUP_CONFIG['aws_account_id']
+                )
+            for view_name, message in messages.items():
+                st.write(f"• {view_name}: {message}")
+            if not messages:
+                st.success("✅ All materialized views are fresh")
+            get_table_catalog(force_refresh=True)
+    except Exception as e:
+        st.error(f"❌ Materialization error: {str(e)}")
+    st.caption("Schedule rebuilds with: python materialized_views.py <database> <workgroup> <results_bucket>")
 
 # Setup Functions
 def test_aws_connection():
     """Test AWS connection"""
     try:
-        sts_client = boto3.client('sts', region_name=SETUP_CONFIG['aws_region'])
+        sts_client = get_client('sts', region_name=SETUP_CONFIG['aws_region'])
         identity = sts_client.get_caller_identity()
         
         if identity.get('Account') == SETUP_CONFIG['aws_account_id']:
@@ -684,7 +785,7 @@ def test_aws_connection():
 def create_s3_buckets():
     """Create required S3 buckets"""
     try:
-        s3_client = boto3.client('s3', region_name=SETUP_CONFIG['aws_region'])
+        s3_client = get_client('s3', region_name=SETUP_CONFIG['aws_region'])
         
         # Create results bucket
         try:
@@ -718,7 +819,7 @@ def create_s3_buckets():
 def create_athena_workgroup():
     """Create Athena workgroup"""
     try:
-        athena_client = boto3.client('athena', region_name=SETUP_CONFIG['aws_region'])
+        athena_client = get_client('athena', region_name=SETUP_CONFIG['aws_region'])
         
         athena_client.create_work_group(
             Name=SETUP_CONFIG['athena_workgroup'],
@@ -731,7 +832,7 @@ def create_athena_workgroup():
                 },
                 'EnforceWorkGroupConfiguration': True,
                 'PublishCloudWatchMetrics': True,
-                'BytesScannedCutoffPerQuery': 1000000000  # 1GB limit
+                'BytesScannedCutoffPerQuery': resolve_budget(load_budgets(), SETUP_CONFIG['aws_account_id'])['per_query_bytes']
             },
             Description='Workgroup for Athena Query Generator application'
         )
@@ -749,7 +850,7 @@ def create_athena_workgroup():
 def create_glue_database():
     """Create Glue database"""
     try:
-        glue_client = boto3.client('glue', region_name=SETUP_CONFIG['aws_region'])
+        glue_client = get_client('glue', region_name=SETUP_CONFIG['aws_region'])
         
         glue_client.create_database(
             DatabaseInput={
@@ -765,104 +866,176 @@ def create_glue_database():
     except Exception as e:
         st.error(f"❌ Glue database creation failed: {str(e)}")
 
-def create_sample_data():
-    """Create and upload sample data"""
+def upsert_glue_table(glue_client, table_input):
+    """Create a Glue table, or update it in place if it already exists"""
     try:
-        # Create sample sales data
-        sales_data = pd.DataFrame({
-            'transaction_id': [f'TXN{i:03d}' for i in range(1, 101)],
-            'customer_id': [f'CUST{i:03d}' for i in range(1, 101)],
-            'product_id': [f'PROD{(i % 10) + 1:03d}' for i in range(1, 101)],
-            'sales_amount': [round(100 + (i * 15.5), 2) for i in range(1, 101)],
-            'transaction_date': pd.date_range('2024-01-01', periods=100, freq='D'),
-            'region': [['North', 'South', 'East', 'West'][i % 4] for i in range(100)]
-        })
-        
-        # Create sample contract data
-        contract_data = pd.DataFrame({
-            'contract_id': [f'CT{i:04d}' for i in range(1, 51)],
-            'risk_level': [['High', 'Medium', 'Low'][i % 3] for i in range(50)],
-            'compliance_status': [['Compliant', 'Non-Compliant', 'Pending Review'][i % 3] for i in range(50)],
-            'performance_score': [60 + (i * 2) % 40 for i in range(50)],
-            'sla_score': [65 + (i * 3) % 35 for i in range(50)],
-            'kpi_met': [['Yes' if i % 3 == 0 else 'No'][0] for i in range(50)]
-        })
-        
-        # Upload to S3
-        s3_client = boto3.client('s3', region_name=SETUP_CONFIG['aws_region'])
-        
-        # Upload sales data
-        sales_csv = sales_data.to_csv(index=False)
-        s3_client.put_object(
-            Bucket=SETUP_CONFIG['s3_raw_data'],
-            Key='sales/sales_data.csv',
-            Body=sales_csv
+        glue_client.create_table(DatabaseName=SETUP_CONFIG['glue_database'], TableInput=table_input)
+    except glue_client.exceptions.AlreadyExistsException:
+        glue_client.update_table(DatabaseName=SETUP_CONFIG['glue_database'], TableInput=table_input)
+
+def write_partitioned_parquet(s3_client, arrow_table, prefix, partition_cols, part_number):
+    """Write an Arrow table to S3 as Hive-style partitioned, Snappy-compressed Parquet"""
+    files_written = 0
+    bytes_written = 0
+    
+    partitions = arrow_table.select(partition_cols).to_pandas().drop_duplicates()
+    for _, partition in partitions.iterrows():
+        mask = None
+        for col in partition_cols:
+            col_mask = pc.equal(arrow_table[col], partition[col])
+            mask = col_mask if mask is None else pc.and_(mask, col_mask)
+        
+        # Partition values live in the S3 path, not in the data files
+        part_table = arrow_table.filter(mask).drop_columns(partition_cols)
+        partition_path = "/".join(f"{col}={partition[col]}" for col in partition_cols)
+        
+        buffer = io.BytesIO()
+        pq.write_table(
+            part_table,
+            buffer,
+            compression='snappy',
+            write_statistics=True,  # min/max per row group lets Athena skip row groups
+            row_group_size=128_000
         )
-        
-        # Upload contract data
-        contract_csv = contract_data.to_csv(index=False)
         s3_client.put_object(
             Bucket=SETUP_CONFIG['s3_raw_data'],
-            Key='contracts/contract_data.csv',
-            Body=contract_csv
+            Key=f"{prefix}/{partition_path}/part-{part_number:05d}.parquet",
+            Body=buffer.getvalue()
         )
-        
-        # Create Glue tables
-        glue_client = boto3.client('glue', region_name=SETUP_CONFIG['aws_region'])
-        
-        # Sales table
-        glue_client.create_table(
-            DatabaseName=SETUP_CONFIG['glue_database'],
-            TableInput={
-                'Name': 'sales_transactions',
-                'StorageDescriptor': {
-                    'Columns': [
-                        {'Name': 'transaction_id', 'Type': 'string'},
-                        {'Name': 'customer_id', 'Type': 'string'},
-                        {'Name': 'product_id', 'Type': 'string'},
-                        {'Name': 'sales_amount', 'Type': 'decimal(10,2)'},
-                        {'Name': 'transaction_date', 'Type': 'date'},
-                        {'Name': 'region', 'Type': 'string'}
-                    ],
-                    'Location': f's3://{SETUP_CONFIG["s3_raw_data"]}/sales/',
-                    'InputFormat': 'org.apache.hadoop.mapred.TextInputFormat',
-                    'OutputFormat': 'org.apache.hadoop.hive.ql.io.HiveIgnoreKeyTextOutputFormat',
-                    'SerdeInfo': {
-                        'SerializationLibrary': 'org.apache.hadoop.hive.serde2.lazy.LazySimpleSerDe',
-                        'Parameters': {'field.delim': ',', 'skip.header.line.count': '1'}
-                    }
-                }
+        files_written += 1
+        bytes_written += buffer.tell()
+    
+    return files_written, bytes_written
+
+def parquet_table_input(name, columns, partition_keys, prefix, projection, stats):
+    """Build a Glue TableInput for a partitioned Parquet table with partition projection"""
+    location = f"s3://{SETUP_CONFIG['s3_raw_data']}/{prefix}/"
+    partition_template = "/".join(f"{key['Name']}=${{{key['Name']}}}" for key in partition_keys)
+    
+    return {
+        'Name': name,
+        'TableType': 'EXTERNAL_TABLE',
+        'PartitionKeys': partition_keys,
+        'Parameters': {
+            'classification': 'parquet',
+            'parquet.compression': 'SNAPPY',
+            'projection.enabled': 'true',
+            'storage.location.template': f"{location}{partition_template}",
+            'recordCount': str(stats['rows']),
+            'numFiles': str(stats['files']),
+            'totalSize': str(stats['bytes']),
+            **projection
+        },
+        'StorageDescriptor': {
+            'Columns': columns,
+            'Location': location,
+            'InputFormat': 'org.apache.hadoop.hive.ql.io.parquet.MapredParquetInputFormat',
+            'OutputFormat': 'org.apache.hadoop.hive.ql.io.parquet.MapredParquetOutputFormat',
+            'SerdeInfo': {
+                'SerializationLibrary': 'org.apache.hadoop.hive.ql.io.parquet.serde.ParquetHiveSerDe',
+                'Parameters': {'serialization.format': '1'}
             }
-        )
-        
-        # Contract table
-        glue_client.create_table(
-            DatabaseName=SETUP_CONFIG['glue_database'],
-            TableInput={
-                'Name': 'contract_compliance',
-                'StorageDescriptor': {
-                    'Columns': [
-                        {'Name': 'contract_id', 'Type': 'string'},
-                        {'Name': 'risk_level', 'Type': 'string'},
-                        {'Name': 'compliance_status', 'Type': 'string'},
-                        {'Name': 'performance_score', 'Type': 'int'},
-                        {'Name': 'sla_score', 'Type': 'int'},
-                        {'Name': 'kpi_met', 'Type': 'string'}
-                    ],
-                    'Location': f's3://{SETUP_CONFIG["s3_raw_data"]}/contracts/',
-                    'InputFormat': 'org.apache.hadoop.mapred.TextInputFormat',
-                    'OutputFormat': 'org.apache.hadoop.hive.ql.io.HiveIgnoreKeyTextOutputFormat',
-                    'SerdeInfo': {
-                        'SerializationLibrary': 'org.apache.hadoop.hive.serde2.lazy.LazySimpleSerDe',
-                        'Parameters': {'field.delim': ',', 'skip.header.line.count': '1'}
-                    }
-                }
+        }
+    }
+
+def csv_table_input(name, columns, prefix):
+    """Build a Glue TableInput for a headered CSV table"""
+    return {
+        'Name': name,
+        'StorageDescriptor': {
+            'Columns': columns,
+            'Location': f's3://{SETUP_CONFIG["s3_raw_data"]}/{prefix}/',
+            'InputFormat': 'org.apache.hadoop.mapred.TextInputFormat',
+            'OutputFormat': 'org.apache.hadoop.hive.ql.io.HiveIgnoreKeyTextOutputFormat',
+            'SerdeInfo': {
+                'SerializationLibrary': 'org.apache.hadoop.hive.serde2.lazy.LazySimpleSerDe',
+                'Parameters': {'field.delim': ',', 'skip.header.line.count': '1'}
             }
-        )
+        }
+    }
+
+def create_sample_data(storage_format='parquet', sales_rows=100, contract_rows=50):
+    """Create and upload sample data as partitioned Parquet (default) or CSV"""
+    try:
+        s3_client = get_client('s3', region_name=SETUP_CONFIG['aws_region'])
+        glue_client = get_client('glue', region_name=SETUP_CONFIG['aws_region'])
+        
+        sales_columns = synthetic_data.glue_columns('sales_transactions')
+        contract_columns = synthetic_data.glue_columns('contract_compliance')
         
-        st.success("✅ Created sample data and tables:")
-        st.write("• Sales transactions (100 records)")
-        st.write("• Contract compliance (50 records)")
+        # Generate and write in chunks so millions of rows never sit in memory at once
+        sales_chunks = synthetic_data.iter_chunks('sales_transactions', sales_rows, SAMPLE_DATA_CHUNK_ROWS)
+        contract_chunks = synthetic_data.iter_chunks('contract_compliance', contract_rows, SAMPLE_DATA_CHUNK_ROWS)
+        
+        if storage_format == 'csv':
+            # Text format: every query reads every byte of every file
+            for part, chunk in enumerate(sales_chunks):
+                s3_client.put_object(
+                    Bucket=SETUP_CONFIG['s3_raw_data'],
+                    Key=f'sales/sales_data_part-{part:05d}.csv',
+                    Body=chunk.to_pandas().to_csv(index=False)
+                )
+            
+            for part, chunk in enumerate(contract_chunks):
+                s3_client.put_object(
+                    Bucket=SETUP_CONFIG['s3_raw_data'],
+                    Key=f'contracts/contract_data_part-{part:05d}.csv',
+                    Body=chunk.to_pandas().to_csv(index=False)
+                )
+            
+            upsert_glue_table(glue_client, csv_table_input('sales_transactions', sales_columns, 'sales'))
+            upsert_glue_table(glue_client, csv_table_input('contract_compliance', contract_columns, 'contracts'))
+        else:
+            sales_stats = {'rows': sales_rows, 'files': 0, 'bytes': 0}
+            for part, chunk in enumerate(sales_chunks):
+                chunk = chunk.append_column('transaction_month', pc.strftime(chunk['transaction_date'], format='%Y-%m'))
+                files, size = write_partitioned_parquet(
+                    s3_client, chunk, 'sales_parquet', ['region', 'transaction_month'], part
+                )
+                sales_stats['files'] += files
+                sales_stats['bytes'] += size
+            
+            contract_stats = {'rows': contract_rows, 'files': 0, 'bytes': 0}
+            for part, chunk in enumerate(contract_chunks):
+                files, size = write_partitioned_parquet(
+                    s3_client, chunk, 'contracts_parquet', ['risk_level'], part
+                )
+                contract_stats['files'] += files
+                contract_stats['bytes'] += size
+            
+            # Partition keys are registered through partition projection, so new
+            # partitions are queryable without MSCK REPAIR or crawler runs
+            upsert_glue_table(glue_client, parquet_table_input(
+                'sales_transactions',
+                [c for c in sales_columns if c['Name'] != 'region'],
+                [{'Name': 'region', 'Type': 'string'}, {'Name': 'transaction_month', 'Type': 'string'}],
+                'sales_parquet',
+                {
+                    'projection.region.type': 'enum',
+                    'projection.region.values': ','.join(synthetic_data.REGIONS),
+                    'projection.transaction_month.type': 'date',
+                    'projection.transaction_month.format': 'yyyy-MM',
+                    'projection.transaction_month.range': '2024-01,NOW',
+                    'projection.transaction_month.interval': '1',
+                    'projection.transaction_month.interval.unit': 'MONTHS'
+                },
+                sales_stats
+            ))
+            upsert_glue_table(glue_client, parquet_table_input(
+                'contract_compliance',
+                [c for c in contract_columns if c['Name'] != 'risk_level'],
+                [{'Name': 'risk_level', 'Type': 'string'}],
+                'contracts_parquet',
+                {
+                    'projection.risk_level.type': 'enum',
+                    'projection.risk_level.values': ','.join(synthetic_data.RISK_LEVELS)
+                },
+                contract_stats
+            ))
+        
+        st.success(f"✅ Created sample data and tables ({'Parquet, partitioned' if storage_format != 'csv' else 'CSV'}):")
+        st.write(f"• Sales transactions ({sales_rows:,} records)")
+        st.write(f"• Contract compliance ({contract_rows:,} records)")
         
     except Exception as e:
         st.error(f"❌ Sample data creation failed: {str(e)}")
@@ -949,48 +1122,51 @@ def create_additional_sample_data():
         st.error(f"❌ Additional data creation failed: {str(e)}")
 
 # Helper functions (same as enterprise version)
-def predict_data_source(question, available_tables):
-    """Predict which data source would be auto-selected for a question"""
-    if not question:
-        return "No question entered"
-    
-    question_lower = question.lower()
-    views = [t for t in available_tables if 'view' in t.lower() or '_detailed' in t.lower()]
-    tables = [t for t in available_tables if t not in views]
+# Substrings of the question that predict_data_source routes on
+SOURCE_KEYWORDS = ('executive', 'dashboard', 'renewal', 'expiring', 'high risk', 'risk', 'high', 'compliance', 'sales', 'all', 'contract')
+
+def predict_data_source(present, index):
+    """Predict which data source would be auto-selected, from the SOURCE_KEYWORDS in the question"""
+    views = index['view_set']
+    tables = index['table_set']
     
-    if ("executive" in question_lower and "dashboard" in question_lower) or "executive dashboard overview" in question_lower:
+    if "executive" in present and "dashboard" in present:
         return "executive_dashboard_detailed" if "executive_dashboard_detailed" in views else "First available view"
     
-    if "renewal" in question_lower or "expiring" in question_lower:
+    if "renewal" in present or "expiring" in present:
         return "renewals_contracts_detailed" if "renewals_contracts_detailed" in views else "First available view"
     
-    if "high risk" in question_lower or ("risk" in question_lower and "high" in question_lower):
+    if "high risk" in present or ("risk" in present and "high" in present):
         return "contract_compliance" if "contract_compliance" in tables else "First available table"
     
-    if "compliance" in question_lower:
+    if "compliance" in present:
         return "contract_compliance" if "contract_compliance" in tables else "First available table"
     
-    if "sales" in question_lower:
+    if "sales" in present:
         return "sales_transactions" if "sales_transactions" in tables else "First available table"
     
-    if "all" in question_lower and "contract" in question_lower:
-        return tables[0] if tables else "First available table"
+    if "all" in present and "contract" in present:
+        return index['tables'][0] if index['tables'] else "First available table"
     
-    return tables[0] if tables else (views[0] if views else "No tables available")
+    # Generic fallback: the table index ranks tables against the whole question
+    return None
+
+def get_table_catalog(force_refresh=False, allow_stale=False):
+    """Get the Glue catalog (tables, columns, partition keys) for the setup database, shared by all sessions"""
+    return get_shared_catalog(
+        SETUP_CONFIG['aws_account_id'], SETUP_CONFIG['glue_database'],
+        lambda: get_client('glue', region_name=SETUP_CONFIG['aws_region']),
+        CATALOG_TTL_SECONDS, force_refresh=force_refresh, allow_stale=allow_stale
+    )
 
 def get_available_tables():
-    """Get list of available tables"""
-    try:
-        glue_client = boto3.client('glue', region_name=SETUP_CONFIG['aws_region'])
-        response = glue_client.get_tables(DatabaseName=SETUP_CONFIG['glue_database'])
-        return [table['Name'] for table in response['TableList']]
-    except:
-        return []
+    """Get list of available tables (materialized copies are routed to, never picked directly)"""
+    return source_index(get_table_catalog())['names']
 
 def show_available_tables():
     """Show available tables in compact format"""
     try:
-        glue_client = boto3.client('glue', region_name=SETUP_CONFIG['aws_region'])
+        glue_client = get_client('glue', region_name=SETUP_CONFIG['aws_region'])
         response = glue_client.get_tables(DatabaseName=SETUP_CONFIG['glue_database'])
         
         if response['TableList']:
@@ -1044,9 +1220,71 @@ def show_available_tables():
     except Exception as e:
         st.error(f"Error: {str(e)}")
 
-def generate_enterprise_sql(question):
+def reuse_similar_question(question, account_id, database, saved_queries):
+    """SQL of a near-identical earlier question in this account and database, or None to generate.
+    Questions with a relative time window ('last quarter') are always generated: pruning baked
+    the window's dates into the earlier SQL"""
+    if parse_time_window(question):
+        return None
+    history = [
+        entry for entry in load_query_history()
+        # Approximate and budget-downgraded (sampled, row-capped) runs are not answers to reuse
+        if entry.get('account_id') == account_id and entry.get('database') == database
+        and not is_approximate(entry.get('sql')) and BUDGET_MARKER not in (entry.get('sql') or '')
+    ]
+    templates = [item for item in saved_queries if item.get('account_id') == account_id and item.get('database') == database]
+    match = find_similar_question(get_retrieval_index(templates, history), question)
+    if not match:
+        return None
+    st.info(f"♻️ Reused the SQL of a similar earlier question from the {match['source']} ({match['similarity']:.0%} similar): \"{match['question']}\"")
+    return match['sql']
+
+def generate_enterprise_sql(question, saved_queries=None):
+    """SQL for the question: reused from a near-identical earlier question (when saved_queries is given) or generated,
+    then pruned, routed to fresh materialized copies and validated the same way"""
+    account_id, database = SETUP_CONFIG['aws_account_id'], SETUP_CONFIG['glue_database']
+    catalog = get_table_catalog()
+    sql = reuse_similar_question(question, account_id, database, saved_queries) if saved_queries is not None else None
+    reused = sql is not None
+    if not reused:
+        sql = generate_model_sql(question, catalog, get_available_tables(), generate_base_sql)
+        sql = apply_partition_pruning(sql, question, catalog)
+        sql = apply_projection_pruning(sql, question, catalog, load_default_columns())
+    state = load_materialized_state()
+    if unknown_materialized_tables(state, catalog, account_id):
+        # Copies built after the shared catalog was loaded: reload it so validation knows them
+        catalog = get_table_catalog(force_refresh=True)
+    sql = fast_mode_sql(route_to_materialized(sql, state, catalog, account_id), question)
+    if not reused:
+        return sql
+    
+    if not validate_sql(sql, catalog)['valid']:
+        # e.g. it read a materialized copy that has since been replaced
+        st.caption("♻️ The earlier SQL no longer matches the catalog; generating new SQL instead")
+        return generate_enterprise_sql(question)
+    cached = get_result_store().lookup(fingerprint(sql, account_id, database))
+    if cached:
+        st.session_state.query_result = cached
+        st.session_state.query_result_sql = sql
+        st.session_state.query_execution_id = cached['result_id']
+        st.success(f"⚡ Its result from {(time.time() - cached['created_at']) / 60:.0f} min ago is still fresh ({cached['num_rows']:,} rows, nothing scanned)")
+    return sql
+
+def generate_model_sql(question, catalog, table_names, rules):
+    """SQL from the selected model backend (the rule engine when none is selected, a data source was picked, or the model is slow)"""
+    backend = None if st.session_state.get('manual_data_source') else selected_backend()
+    sql, source = generate_sql(question, catalog, backend, rules, names=table_names)
+    if source == 'rules':
+        return sql
+    st.caption(f"🧠 SQL generator: {source}")
+    if source.startswith('rules'):
+        return sql
+    return f'-- Generated from: "{question}"\n-- Generated by: {source}\n{sql}'
+
+def generate_base_sql(question):
     """Generate SQL for database using actual table names and views"""
-    available_tables = get_available_tables()
+    index = source_index(get_table_catalog())
+    available_tables = index['names']
     
     if not available_tables:
         return f"""-- Error: No tables found in database
@@ -1066,8 +1304,8 @@ FROM {database_name}.{manual_source}
 LIMIT 100;"""
     
     # Auto-selection logic
-    views = [t for t in available_tables if 'view' in t.lower() or '_detailed' in t.lower()]
-    tables = [t for t in available_tables if t not in views]
+    views = index['view_set']
+    tables = index['tables']
     question_lower = question.lower()
     
     # Sales queries
@@ -1126,7 +1364,14 @@ FROM {database_name}.contract_compliance
 GROUP BY risk_level
 ORDER BY avg_performance_score DESC;"""
     
-    # Generic fallback
+    # Generic fallback: the table whose names, columns and comments best match the question
+    best_table = best_match(index, question, index['table_set'])
+    if best_table:
+        return f"""-- Generated from: "{question}"
+-- Auto-selected: Best-matching table ({best_table})
+SELECT *
+FROM {database_name}.{best_table}
+LIMIT 100;"""
     if tables:
         first_table = tables[0]
         return f"""-- Generated from: "{question}"
@@ -1134,8 +1379,8 @@ ORDER BY avg_performance_score DESC;"""
 SELECT *
 FROM {database_name}.{first_table}
 LIMIT 100;"""
-    elif views:
-        first_view = views[0]
+    elif index['views']:
+        first_view = index['views'][0]
         return f"""-- Generated from: "{question}"
 -- Auto-selected: First available view
 SELECT *
@@ -1146,33 +1391,174 @@ LIMIT 100;"""
 -- No tables available
 SELECT 'Complete setup wizard first' as message;"""
 
-def execute_enterprise_query(sql_query):
-    """Execute query on Athena infrastructure"""
+def execute_enterprise_query(sql_query, summary=False, template=None, values=None):
+    """Execute query on Athena infrastructure (summary queries return their result handle instead of replacing the current result).
+    With a saved template, sql_query is its rendered SQL and the run goes through the template's prepared statement"""
+    flight = None
     try:
-        athena_client = boto3.client('athena', region_name=SETUP_CONFIG['aws_region'])
-        
-        response = athena_client.start_query_execution(
-            QueryString=sql_query,
-            WorkGroup=SETUP_CONFIG['athena_workgroup'],
-            ResultConfiguration={
-                'OutputLocation': f"s3://{SETUP_CONFIG['s3_results_bucket']}/"
-            }
-        )
+        athena_client = get_client('athena', region_name=SETUP_CONFIG['aws_region'])
+        exact_sql = None if summary else exact_query_for(sql_query)
+        template_key = None
+        if template:
+            template_key = fingerprint(
+                template['statement'], SETUP_CONFIG['aws_account_id'], SETUP_CONFIG['glue_database'], *execution_parameters(template, values)
+            )
         
-        query_execution_id = response['QueryExecutionId']
+        # An identical query ran moments ago: reuse its stored result instead of scanning again
+        if statement_type(sql_query) in ('SELECT', 'WITH'):
+            cached = get_result_store().lookup(template_key or fingerprint(sql_query, SETUP_CONFIG['aws_account_id'], SETUP_CONFIG['glue_database']))
+            if cached:
+                st.success(f"⚡ Reused the result of an identical query ({cached['num_rows']:,} rows, nothing scanned)")
+                if summary:
+                    return cached
+                st.session_state.query_result = cached
+                st.session_state.query_result_sql = sql_query
+                st.session_state.query_execution_id = cached['result_id']
+                return None
+        
+        if not preflight_check(sql_query, athena_client):
+            return
+        
+        catalog = get_table_catalog()
+        history = load_query_history()
+        s3_client = get_client('s3', region_name=SETUP_CONFIG['aws_region'])
+        glue_client = get_client('glue', region_name=SETUP_CONFIG['aws_region'])
+        estimate = estimate_query_cost(sql_query, catalog, history, s3_client=s3_client, glue_client=glue_client)
+        
+        # Budget guardrails: refuse, or sample + LIMIT, queries that would overspend
+        budget = resolve_budget(load_budgets(), SETUP_CONFIG['aws_account_id'])
+        guard = check_budget(estimate, budget, daily_usage(history, SETUP_CONFIG['aws_account_id']))
+        if guard['decision'] == 'downgrade':
+            downgraded = downgrade_query(sql_query, estimate, guard['allowed_bytes'], catalog, budget['max_rows_on_downgrade'])
+            if downgraded:
+                st.warning(f"💰 Query downgraded because {guard['reason']}")
+                st.code(downgraded, language="sql")
+                sql_query = downgraded
+                template = None   # the prepared statement no longer matches the downgraded SQL
+                estimate = estimate_query_cost(sql_query, catalog, history, s3_client=s3_client, glue_client=glue_client)
+            else:
+                guard['decision'] = 'refuse'
+        if guard['decision'] == 'refuse':
+            st.error(f"💰 Query refused because {guard['reason']} ({format_bytes(estimate['bytes'])} estimated, {format_bytes(guard['allowed_bytes'])} allowed)")
+            return
+        
+        st.caption(f"📏 Estimated scan: {format_bytes(estimate['bytes'])} · ~{estimate['seconds']:.1f}s · ${estimate['cost_usd']:.4f}")
+        
+        result_key = template_key if template else fingerprint(sql_query, SETUP_CONFIG['aws_account_id'], SETUP_CONFIG['glue_database'])
+        if statement_type(sql_query) in ('SELECT', 'WITH'):
+            # Another session is running the same query right now: share its execution
+            flight, leader = join_or_start(result_key)
+            if not leader:
+                handle = follow_flight(flight, sql_query, summary)
+                flight = None
+                return handle if summary else None
+        
+        if template:
+            query_execution_id = start_template_execution(
+                athena_client, template, values, SETUP_CONFIG['athena_workgroup'],
+                {'ResultConfiguration': {'OutputLocation': f"s3://{SETUP_CONFIG['s3_results_bucket']}/"}},
+                SETUP_CONFIG['aws_account_id']
+            )
+        else:
+            # Repeated expensive subqueries read their cached CTAS copy while it is valid
+            run_sql = rewrite_with_cache(sql_query, load_subquery_cache(), catalog, SETUP_CONFIG['aws_account_id'])
+            if run_sql != sql_query:
+                st.caption("♻️ Reusing cached results for repeated subqueries")
+            
+            response = athena_client.start_query_execution(
+                QueryString=run_sql,
+                WorkGroup=SETUP_CONFIG['athena_workgroup'],
+                ResultConfiguration={
+                    'OutputLocation': f"s3://{SETUP_CONFIG['s3_results_bucket']}/"
+                }
+            )
+            query_execution_id = response['QueryExecutionId']
+        if flight:
+            flight.execution_id = query_execution_id
         st.success(f"✅ Query submitted successfully! Execution ID: {query_execution_id}")
         
         # Monitor query execution
         with st.spinner("⏳ Executing query..."):
             status = monitor_query_execution(athena_client, query_execution_id)
+        if flight:
+            flight.status = status
+        
+        if status in ('SUCCEEDED', 'FAILED'):
+            try:
+                record_execution(
+                    athena_client, query_execution_id, sql_query, SETUP_CONFIG['aws_account_id'], estimate,
+                    question=st.session_state.get('current_question', ''), database=SETUP_CONFIG['glue_database']
+                )
+            except Exception:
+                pass
         
         if status == 'SUCCEEDED':
-            display_query_results(athena_client, query_execution_id)
+            try:
+                update_cache(
+                    athena_client, s3_client, catalog, load_query_history(),
+                    SETUP_CONFIG['athena_workgroup'], SETUP_CONFIG['s3_results_bucket'], glue_client=glue_client,
+                    budget=resolve_budget(load_budgets(), SETUP_CONFIG['aws_account_id']), account_id=SETUP_CONFIG['aws_account_id']
+                )
+            except Exception:
+                pass
+            
+            if summary:
+                handle = fetch_query_result(athena_client, s3_client, query_execution_id, result_key)
+                if flight:
+                    flight.handle = handle
+                return handle
+            handle = display_query_results(athena_client, query_execution_id, s3_client, sql_query, result_key)
+            if flight:
+                flight.handle = handle
+                finish_flight(flight)
+                flight = None
+            
+            # Fast mode: run the exact query in the background if it fits the budget as-is
+            if exact_sql and st.session_state.get('refine_exact', True):
+                exact_estimate = estimate_query_cost(exact_sql, catalog, history, s3_client=s3_client, glue_client=glue_client)
+                usage = daily_usage(load_query_history(), SETUP_CONFIG['aws_account_id'])
+                if check_budget(exact_estimate, budget, usage)['decision'] == 'allow':
+                    start_exact_refinement(
+                        athena_client, exact_sql,
+                        {
+                            'WorkGroup': SETUP_CONFIG['athena_workgroup'],
+                            'ResultConfiguration': {'OutputLocation': f"s3://{SETUP_CONFIG['s3_results_bucket']}/"}
+                        },
+                        SETUP_CONFIG['aws_account_id']
+                    )
+                else:
+                    st.info("🎯 Exact refinement skipped: the full query does not fit the scan budget.")
         elif status == 'FAILED':
             st.error("❌ Query execution failed. Please check your SQL and try again.")
         
     except Exception as e:
         st.error(f"❌ Query execution error: {str(e)}")
+    finally:
+        # Release sessions waiting on this execution, even when it failed
+        if flight:
+            finish_flight(flight)
+    return None
+
+def preflight_check(sql_query, athena_client):
+    """Validate SQL against the cached catalog and EXPLAIN it before submitting"""
+    validation = validate_sql(sql_query, get_table_catalog())
+    for warning in validation['warnings']:
+        st.warning(f"⚠️ {warning}")
+    if not validation['valid']:
+        for error in validation['errors']:
+            st.error(f"❌ {error}")
+        return False
+    
+    with st.spinner("🧪 Checking query plan..."):
+        ok, message = explain_query(
+            athena_client, sql_query, SETUP_CONFIG['glue_database'], SETUP_CONFIG['athena_workgroup'],
+            f"s3://{SETUP_CONFIG['s3_results_bucket']}/"
+        )
+    if not ok:
+        st.error(f"❌ Athena rejected the query: {message}")
+        return False
+    
+    return True
 
 def monitor_query_execution(athena_client, query_execution_id):
     """Monitor Athena query execution status"""
@@ -1199,42 +1585,43 @@ def monitor_query_execution(athena_client, query_execution_id):
     
     return 'TIMEOUT'
 
-def display_query_results(athena_client, query_execution_id):
-    """Display query results in Streamlit"""
+def display_query_results(athena_client, query_execution_id, s3_client=None, sql_query=None, result_key=None):
+    """Spill query results to the result store; session state keeps only the handle (returned; None when empty)"""
     try:
-        results = athena_client.get_query_results(QueryExecutionId=query_execution_id)
-        
-        columns = [col['Label'] for col in results['ResultSet']['ResultSetMetadata']['ColumnInfo']]
-        rows = []
-        
-        for row in results['ResultSet']['Rows'][1:]:  # Skip header row
-            row_data = [field.get('VarCharValue', '') for field in row['Data']]
-            rows.append(row_data)
+        handle = fetch_query_result(athena_client, s3_client, query_execution_id, result_key)
         
-        if rows:
-            df = pd.DataFrame(rows, columns=columns)
-            st.session_state.query_results = df
+        if handle['num_rows']:
+            st.session_state.query_result = handle
+            st.session_state.query_result_sql = sql_query
             st.session_state.query_execution_id = query_execution_id
-            st.success(f"✅ Query completed! {len(df)} rows returned.")
-        else:
-            st.info("Query executed successfully but returned no results.")
+            st.success(f"✅ Query completed! {handle['num_rows']:,} rows returned.")
+            return handle
+        get_result_store().discard(handle)
+        st.info("Query executed successfully but returned no results.")
             
     except Exception as e:
         st.error(f"Error displaying results: {str(e)}")
+    return None
 
 def save_query_template(question, sql):
     """Save query as reusable template"""
     if 'saved_queries' not in st.session_state:
         st.session_state.saved_queries = []
     
-    template = {
-        'question': question,
-        'sql': sql,
-        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    }
+    # Literals in filters become typed parameters; the SQL is parsed here and never again
+    template = make_template(sql, question)
+    template['timestamp'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    # Reused for similar questions only in the account and database it was written for
+    template['account_id'] = SETUP_CONFIG['aws_account_id']
+    template['database'] = SETUP_CONFIG['glue_database']
     
-    st.session_state.saved_queries.append(template)
-    st.success("✅ Query saved as template!")
+    # The same statement (modulo comments, formatting, case and parameter values) replaces its older copy
+    count_before = len(st.session_state.saved_queries)
+    st.session_state.saved_queries = dedupe_by_fingerprint(st.session_state.saved_queries + [template], sql_key='statement')
+    if len(st.session_state.saved_queries) == count_before:
+        st.success("✅ Template already saved; updated it to this version")
+    else:
+        st.success("✅ Query saved as template!")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,275 @@
+"""
+Approximate Queries
+Fast mode for exploratory aggregate questions: a BERNOULLI sample of the driving table,
+counts and sums scaled back up, approx_distinct / approx_percentile, and a per-row
+error margin. The exact query can run in Athena in the background and replace the
+approximate result when it finishes
+"""
+
+import math
+import re
+import time
+
+import streamlit as st
+
+from cost_estimator import cte_names
+from query_history import record_execution
+from query_optimizer import (
+    add_header_notes, add_table_sample, find_table_references, split_header, top_level_positions
+)
+from result_store import fetch_query_result
+
+APPROX_MARKER = "-- ⚡ Approximate:"
+SAMPLE_PERCENTS = [1, 2, 5, 10, 20, 25, 50]   # divisors of 100, so scale factors stay integers
+DEFAULT_SAMPLE_PERCENT = 10
+APPROX_DISTINCT_ERROR = 0.023                 # standard error of approx_distinct (default accuracy)
+Z_95 = 1.96
+
+AGGREGATE_FUNCTIONS = r'\b(COUNT|SUM|AVG|MIN|MAX)\s*\('
+SCALED_AGGREGATES = r'\b(COUNT_IF|COUNT|SUM)\s*\('
+
+# Question phrases -> quantiles to add as approx_percentile columns
+PERCENTILE_PATTERNS = [
+    (r'\bmedian\b', [0.5]),
+    (r'\bquartiles?\b', [0.25, 0.5, 0.75]),
+    (r'\b(?:p|percentile\s*)(\d{1,2})\b', None),
+    (r'\b(\d{1,2})(?:st|nd|rd|th)\s+percentile\b', None)
+]
+
+def percentile_targets(question):
+    """Quantiles the question asks about (median, quartiles, p90, 95th percentile)"""
+    question = (question or '').lower()
+    quantiles = set()
+    for pattern, values in PERCENTILE_PATTERNS:
+        for match in re.finditer(pattern, question):
+            quantiles.update(values if values else [int(match.group(1)) / 100])
+    return sorted(q for q in quantiles if 0 < q < 1)
+
+def is_aggregate_query(sql):
+    """True when the outer query groups or aggregates (row listings are not approximated)"""
+    _, body = split_header(sql)
+    return bool(top_level_positions(body, r'\bGROUP\s+BY\b') or top_level_positions(body, AGGREGATE_FUNCTIONS))
+
+def count_margin(sample_rows, fraction):
+    """95% relative margin of a count (or sum) scaled up from a BERNOULLI sample"""
+    if not sample_rows:
+        return None
+    return Z_95 * math.sqrt((1 - fraction) / sample_rows)
+
+def add_select_columns(body, columns):
+    """Append expressions to the outer SELECT list (just before its FROM)"""
+    froms = top_level_positions(body, r'\bFROM\b')
+    if not froms or not columns:
+        return body
+    position = froms[0].start()
+    before = body[:position].rstrip()
+    if '--' in before.rsplit('\n', 1)[-1]:
+        # The last select item ends with a comment, so lead with the commas instead
+        addition = ''.join(f"\n    , {column}" for column in columns)
+    else:
+        addition = ''.join(f",\n    {column}" for column in columns)
+    return before + addition + '\n' + body[position:]
+
+def masked_code(sql):
+    """sql with string literals and comments blanked out (same length), for scanning its structure"""
+    return re.sub(r"'(?:[^']|'')*'|--[^\n]*", lambda m: ' ' * len(m.group()), sql)
+
+def closing_paren(code, start):
+    """Position of the parenthesis closing the one at start, or None when unbalanced"""
+    depth = 0
+    for i in range(start, len(code)):
+        if code[i] == '(':
+            depth += 1
+        elif code[i] == ')':
+            depth -= 1
+            if depth == 0:
+                return i
+    return None
+
+def query_levels(code):
+    """For each position, the opening parenthesis of the innermost subquery around it (-1 for the outer query)"""
+    levels = []
+    stack = [-1]
+    for i, ch in enumerate(code):
+        if ch == '(':
+            is_query = re.match(r'\s*(SELECT|WITH)\b', code[i + 1:i + 64], re.IGNORECASE)
+            stack.append(i if is_query else stack[-1])
+        elif ch == ')' and len(stack) > 1:
+            stack.pop()
+        levels.append(stack[-1])
+    return levels
+
+def scale_aggregates(body, scale):
+    """Counts and sums multiplied by scale, COUNT(DISTINCT x) as approx_distinct(x); None when an aggregate cannot be scaled.
+    Arguments are matched with balanced parentheses, so SUM(CAST(x AS DOUBLE)) and COUNT(col) are scaled too"""
+    code = masked_code(body)
+    levels = query_levels(code)
+    scaled_levels = set()
+    parts = []
+    position = 0
+    for match in re.finditer(SCALED_AGGREGATES, code, re.IGNORECASE):
+        if match.start() < position:
+            continue   # inside an aggregate already rewritten
+        function = match.group(1).upper()
+        close = closing_paren(code, match.end() - 1)
+        if close is None:
+            return None
+        argument = body[match.end():close]
+        argument_code = code[match.end():close]
+        end = close + 1
+        clause = re.compile(r'\s*FILTER\s*\(', re.IGNORECASE).match(code, end)
+        if clause:
+            filter_close = closing_paren(code, clause.end() - 1)
+            if filter_close is None:
+                return None
+            end = filter_close + 1
+
+        if re.compile(r'\s*OVER\b', re.IGNORECASE).match(code, end):
+            # SUM(COUNT(*)) OVER () totals group counts that are scaled themselves;
+            # a window over raw sampled rows has no scaled equivalent
+            if not re.search(AGGREGATE_FUNCTIONS, argument_code, re.IGNORECASE):
+                return None
+            continue
+        if re.search(AGGREGATE_FUNCTIONS, argument_code, re.IGNORECASE):
+            return None
+
+        distinct = re.match(r'\s*DISTINCT\b', argument_code, re.IGNORECASE)
+        if distinct:
+            # approx_distinct takes one expression; SUM(DISTINCT x) has no sampled estimate
+            if function != 'COUNT' or clause or top_level_positions(argument_code, ','):
+                return None
+            replacement = f"approx_distinct({argument[distinct.end():].strip()})"
+        else:
+            replacement = f"({body[match.start():end]} * {scale})"
+            scaled_levels.add(levels[match.start()])
+        parts.append(body[position:match.start()])
+        parts.append(replacement)
+        position = end
+
+    # Counts re-aggregated by an outer query (e.g. SUM over a CTE's COUNT(*)) would be scaled twice
+    if len(scaled_levels) > 1:
+        return None
+    parts.append(body[position:])
+    return ''.join(parts)
+
+def approximate_query(sql, question='', percent=DEFAULT_SAMPLE_PERCENT):
+    """Fast approximate variant of an aggregate query, or None when it cannot be approximated"""
+    if not is_aggregate_query(sql) or re.search(r'\bTABLESAMPLE\b', sql, re.IGNORECASE):
+        return None
+
+    ctes = cte_names(sql)
+    references = [ref for ref in find_table_references(sql) if ref['name'].lower() not in ctes]
+    if not references:
+        return None
+
+    header, body = split_header(sql)
+    fraction = percent / 100
+    scale = 100 // percent
+
+    body = scale_aggregates(body, scale)
+    if body is None:
+        return None
+
+    # Sample only the driving table: joined dimensions stay complete, so each sampled
+    # fact row still finds its matches and scaling by 1/fraction stays unbiased
+    driving_table = references[0]['name']
+    body = add_table_sample(body, driving_table, percent, method='BERNOULLI')
+
+    extra_columns = []
+    averaged = re.findall(r'\bAVG\s*\(\s*([\w."]+)\s*\)', body, re.IGNORECASE)
+    for quantile in percentile_targets(question):
+        for column in dict.fromkeys(averaged):
+            name = column.split('.')[-1].strip('"')
+            extra_columns.append(f"approx_percentile({column}, {quantile:g}) AS p{round(quantile * 100)}_{name}")
+    extra_columns.append("COUNT(*) AS sample_rows")
+    extra_columns.append(f"ROUND(100 * {Z_95} * sqrt({1 - fraction:g} / COUNT(*)), 1) AS margin_pct_95")
+    body = add_select_columns(body, extra_columns)
+
+    notes = [
+        f"{APPROX_MARKER} BERNOULLI {percent}% sample of {driving_table}; counts and sums scaled x{scale}",
+        f"--   margin_pct_95: 95% margin of each row's counts/sums (e.g. ±{100 * count_margin(1000, fraction):.1f}% for 1,000 sampled rows)",
+        f"--   approx_distinct: ±{APPROX_DISTINCT_ERROR:.1%} standard error; AVG is unbiased; MIN/MAX cover sampled rows only"
+    ]
+    if len(extra_columns) > 2:
+        notes.append("--   approx_percentile: rank error about 1%")
+    return add_header_notes('\n'.join(header) + ('\n' if header else '') + body, notes)
+
+def render_fast_mode_controls():
+    """Sidebar toggles for fast mode, its sample size and background refinement"""
+    with st.expander("⚡ Fast Mode"):
+        st.checkbox("Approximate aggregate questions", key="fast_mode",
+                    help="Sample the data and use approx_distinct / approx_percentile; results carry a 95% margin")
+        st.select_slider("Sample size (%):", SAMPLE_PERCENTS, value=DEFAULT_SAMPLE_PERCENT, key="fast_mode_percent")
+        st.checkbox("Refine to the exact answer in the background", value=True, key="refine_exact")
+
+def fast_mode_sql(sql, question):
+    """Approximate variant of generated SQL when fast mode is on (remembering the exact query)"""
+    if not st.session_state.get('fast_mode'):
+        return sql
+    approximate = approximate_query(sql, question, st.session_state.get('fast_mode_percent', DEFAULT_SAMPLE_PERCENT))
+    if not approximate:
+        return sql
+    remember_exact_query(approximate, sql)
+    return approximate
+
+def is_approximate(sql):
+    return APPROX_MARKER in (sql or '')
+
+def remember_exact_query(approximate_sql, exact_sql):
+    """Keep the exact query behind a generated approximate one, for background refinement"""
+    st.session_state.fast_mode_exact = {'approximate': approximate_sql, 'exact': exact_sql}
+
+def exact_query_for(sql):
+    """Exact query behind an approximate one generated in this session (None once edited)"""
+    remembered = st.session_state.get('fast_mode_exact') or {}
+    return remembered.get('exact') if remembered.get('approximate') == sql else None
+
+def start_exact_refinement(athena_client, exact_sql, query_context, account_id='', user=''):
+    """Submit the exact query without waiting; render_exact_refinement picks up its result"""
+    response = athena_client.start_query_execution(QueryString=exact_sql, **query_context)
+    st.session_state.exact_refinement = {
+        'execution_id': response['QueryExecutionId'],
+        'sql': exact_sql,
+        'account_id': account_id,
+        'user': user,
+        'question': st.session_state.get('current_question', ''),
+        'started_at': time.time()
+    }
+    st.info("🎯 Exact answer is running in the background; it can replace the approximate result when ready.")
+
+def render_exact_refinement(athena_client, s3_client):
+    """Status of the background exact query; its result replaces the approximate one when done"""
+    refinement = st.session_state.get('exact_refinement')
+    if not refinement:
+        return
+
+    status = athena_client.get_query_execution(QueryExecutionId=refinement['execution_id'])['QueryExecution']['Status']
+    state = status['State']
+    elapsed = time.time() - refinement['started_at']
+
+    if state in ('QUEUED', 'RUNNING'):
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            st.caption(f"🎯 Exact answer running in Athena ({elapsed:.0f}s so far)...")
+        with col2:
+            if st.button("🔄 Check", key="refinement_check"):
+                st.rerun()
+        return
+
+    del st.session_state.exact_refinement
+    try:
+        record_execution(athena_client, refinement['execution_id'], refinement['sql'], refinement['account_id'],
+                         user=refinement['user'], question=refinement.get('question', ''))
+    except Exception:
+        pass
+
+    if state != 'SUCCEEDED':
+        st.warning(f"⚠️ Exact refinement {state.lower()}: {status.get('StateChangeReason', '')}")
+        return
+
+    handle = fetch_query_result(athena_client, s3_client, refinement['execution_id'])
+    # The approximate result stays in the process-wide store (other sessions may hold it) until it ages out
+    st.session_state.query_result = handle
+    st.session_state.query_result_sql = refinement['sql']
+    st.session_state.query_execution_id = refinement['execution_id']
+    st.success(f"🎯 Exact result ready: {handle['num_rows']:,} rows (replaced the approximate result)")
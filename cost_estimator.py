@@ -0,0 +1,371 @@
+"""
+Scan Cost Estimator
+Predicts bytes scanned, runtime and cost of a query before it runs, from Glue table
+statistics and partition metadata, calibrated against executed-query Statistics
+"""
+
+import re
+import json
+import base64
+from datetime import date, datetime
+
+import numpy as np
+
+from glue_catalog import get_table_info
+from query_optimizer import (
+    strip_comments, find_table_references, filter_clauses, estimate_scan_fraction, partition_date_format
+)
+from query_history import latency_by_fingerprint
+from sql_fingerprint import shape_fingerprint
+
+ATHENA_PRICE_PER_TB = 5.0
+MIN_BILLED_BYTES = 10 * 1024 ** 2  # Athena bills at least 10 MB per query
+
+# Uncalibrated runtime model: fixed planning/queue overhead + scan throughput
+DEFAULT_BASE_MS = 800.0
+DEFAULT_BYTES_PER_MS = 150 * 1024 ** 2 / 1000.0
+MIN_CALIBRATION_POINTS = 5
+MIN_SIMILAR_RUNS = 3   # runs of the same query shape needed to use their runtime directly
+
+# Table parameters Glue crawlers and our setup write size statistics into
+SIZE_PARAMETERS = ('totalSize', 'sizeKey', 'rawDataSize')
+
+# Partition projection interval units -> days
+INTERVAL_DAYS = {'DAYS': 1, 'WEEKS': 7, 'MONTHS': 30, 'YEARS': 365}
+
+# Selectivity assumed for a partition predicate that cannot be resolved
+UNKNOWN_PREDICATE_SELECTIVITY = 0.5
+
+RUNTIME_TIERS = [
+    (5, "⚡ Fast (< 5 seconds)", "green"),
+    (30, "⏳ Moderate (5-30 seconds)", "orange"),
+    (None, "🐌 Complex (30+ seconds)", "red")
+]
+
+def format_bytes(num_bytes):
+    """Human-readable byte count"""
+    size = float(num_bytes or 0)
+    for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
+        if size < 1024 or unit == 'TB':
+            return f"{size:,.0f} {unit}" if unit == 'B' else f"{size:,.1f} {unit}"
+        size /= 1024
+
+def strip_literals(sql):
+    """Blank out string literals so values are not mistaken for column names"""
+    return re.sub(r"'(?:[^']|'')*'", "''", sql)
+
+def cte_names(sql):
+    """Names defined in a WITH clause (referenced like tables, but not in the catalog)"""
+    code = strip_comments(sql)
+    return {name.lower() for name in re.findall(r'(?:\bWITH|,)\s+(\w+)\s+AS\s*\(', code, re.IGNORECASE)}
+
+def decode_view_sql(view_sql):
+    """Original SQL of an Athena view (Glue stores it as a base64 Presto view blob)"""
+    match = re.match(r'/\*\s*Presto View:\s*(\S+)\s*\*/', view_sql or '')
+    if not match:
+        return view_sql or ''
+    try:
+        return json.loads(base64.b64decode(match.group(1)))['originalSql']
+    except Exception:
+        return ''
+
+def s3_location_stats(s3_client, location):
+    """Total bytes and object count under an s3:// location"""
+    bucket, _, prefix = location.replace('s3://', '', 1).partition('/')
+    total_bytes = 0
+    num_files = 0
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get('Contents', []):
+            total_bytes += obj['Size']
+            num_files += 1
+    return total_bytes, num_files
+
+def table_size(table_info, s3_client=None):
+    """(bytes, files, source) for a table: Glue statistics first, then an S3 listing"""
+    parameters = table_info['parameters']
+    num_files = int(parameters.get('numFiles', 0) or 0)
+    for key in SIZE_PARAMETERS:
+        if parameters.get(key, '').isdigit() and int(parameters[key]) > 0:
+            return int(parameters[key]), num_files, 'glue'
+
+    # Listings are cached on the catalog entry, so they refresh with the catalog
+    if 'listed_size' not in table_info and s3_client and table_info['location'].startswith('s3://'):
+        try:
+            table_info['listed_size'] = s3_location_stats(s3_client, table_info['location'])
+        except Exception:
+            table_info['listed_size'] = None
+    if table_info.get('listed_size'):
+        total_bytes, listed_files = table_info['listed_size']
+        return total_bytes, listed_files, 's3'
+
+    return None, num_files, 'unknown'
+
+def referenced_columns(sql, table_info):
+    """Columns of the table the query reads (all of them for SELECT *)"""
+    code = strip_literals(strip_comments(sql))
+    all_columns = [c['name'] for c in table_info['columns']]
+    if re.search(r'\bSELECT\s+(?:DISTINCT\s+)?(?:\w+\.)?\*', code, re.IGNORECASE):
+        return all_columns
+    identifiers = {name.lower() for name in re.findall(r'\b\w+\b', code)}
+    return [name for name in all_columns if name.lower() in identifiers]
+
+def sample_fraction(sql, table_name):
+    """Fraction kept by a TABLESAMPLE SYSTEM clause on the table (BERNOULLI still reads every row)"""
+    pattern = (
+        r'\b' + re.escape(table_name) + r'"?(?:\s+(?:AS\s+)?\w+)?\s+TABLESAMPLE\s+SYSTEM\s*\(\s*([\d.]+)\s*\)'
+    )
+    match = re.search(pattern, strip_comments(sql), re.IGNORECASE)
+    return min(float(match.group(1)) / 100.0, 1.0) if match else 1.0
+
+def parse_literal(text):
+    """Strip DATE/TIMESTAMP prefixes and quotes from a SQL literal"""
+    return re.sub(r"^(?:DATE|TIMESTAMP)\s+", '', text.strip(), flags=re.IGNORECASE).strip("'")
+
+def key_predicates(sql, key_name):
+    """Predicates on a partition key in WHERE/ON clauses, as (operator, values) tuples"""
+    clauses = filter_clauses(sql)
+    column = r'\b(?:\w+\.)?' + re.escape(key_name) + r'\b'
+    literal = r"((?:DATE\s+|TIMESTAMP\s+)?'[^']*'|\d+)"
+    predicates = []
+
+    for match in re.finditer(column + r'\s+BETWEEN\s+' + literal + r'\s+AND\s+' + literal, clauses, re.IGNORECASE):
+        predicates.append(('between', [parse_literal(match.group(1)), parse_literal(match.group(2))]))
+    for match in re.finditer(column + r'\s+IN\s*\(([^)]*)\)', clauses, re.IGNORECASE):
+        predicates.append(('in', [parse_literal(v) for v in match.group(1).split(',') if v.strip()]))
+    for match in re.finditer(column + r'\s*(>=|<=|>|<|=)\s*' + literal, clauses, re.IGNORECASE):
+        predicates.append((match.group(1), [parse_literal(match.group(2))]))
+    return predicates
+
+def glue_partition_expression(key_name, operator, values):
+    """Glue GetPartitions expression for one predicate"""
+    quoted = [f"'{v}'" for v in values]
+    if operator == 'between':
+        return f"{key_name} BETWEEN {quoted[0]} AND {quoted[1]}"
+    if operator == 'in':
+        return f"{key_name} IN ({', '.join(quoted)})"
+    return f"{key_name} {operator} {quoted[0]}"
+
+def count_partitions(glue_client, database, table_name, expression=''):
+    """Number of registered partitions, optionally matching a Glue expression"""
+    count = 0
+    paginator = glue_client.get_paginator('get_partitions')
+    params = {'DatabaseName': database, 'TableName': table_name, 'ExcludeColumnSchema': True}
+    if expression:
+        params['Expression'] = expression
+    for page in paginator.paginate(**params):
+        count += len(page['Partitions'])
+    return count
+
+def projection_date(value, python_format, today):
+    """Parse a projection range endpoint ('2024-01', 'NOW')"""
+    if value.strip().upper().startswith('NOW'):
+        return today
+    return datetime.strptime(value.strip(), python_format).date()
+
+def projected_fraction(table_info, key, predicates, today=None):
+    """Fraction of projected partitions a key's predicates keep, or None if not projected"""
+    parameters = table_info['parameters']
+    prefix = f"projection.{key['name']}"
+    projection_type = parameters.get(f"{prefix}.type")
+    if parameters.get('projection.enabled') != 'true' or not projection_type:
+        return None
+
+    fraction = 1.0
+    if projection_type == 'enum':
+        values = [v for v in parameters.get(f"{prefix}.values", '').split(',') if v]
+        for operator, operands in predicates:
+            if operator in ('=', 'in') and values:
+                fraction *= min(len(operands), len(values)) / len(values)
+            else:
+                fraction *= UNKNOWN_PREDICATE_SELECTIVITY
+        return fraction
+
+    if projection_type == 'date':
+        python_format = partition_date_format(table_info, key)
+        try:
+            low, high = parameters[f"{prefix}.range"].split(',')
+            range_start = projection_date(low, python_format, today or date.today())
+            range_end = projection_date(high, python_format, today or date.today())
+        except Exception:
+            return None
+        total_days = max((range_end - range_start).days + 1, 1)
+        interval_days = INTERVAL_DAYS.get(parameters.get(f"{prefix}.interval.unit", '').upper(), 1)
+        value_length = len(range_start.strftime(python_format))
+        for operator, operands in predicates:
+            try:
+                bounds = [datetime.strptime(v[:value_length], python_format).date() for v in operands]
+            except ValueError:
+                fraction *= UNKNOWN_PREDICATE_SELECTIVITY
+                continue
+            if operator in ('=', 'in'):
+                kept_days = interval_days * len(bounds)
+            elif operator == 'between':
+                kept_days = (min(bounds[1], range_end) - max(bounds[0], range_start)).days + interval_days
+            elif operator in ('>', '>='):
+                kept_days = (range_end - max(bounds[0], range_start)).days + 1
+            else:
+                kept_days = (min(bounds[0], range_end) - range_start).days + 1
+            fraction *= min(max(kept_days, 0) / total_days, 1.0)
+        return fraction
+
+    if projection_type == 'integer':
+        try:
+            low, high = [int(v) for v in parameters[f"{prefix}.range"].split(',')]
+        except Exception:
+            return None
+        total = max(high - low + 1, 1)
+        for operator, operands in predicates:
+            if operator in ('=', 'in'):
+                fraction *= len(operands) / total
+            elif operator == 'between' and all(v.isdigit() for v in operands):
+                fraction *= max(min(int(operands[1]), high) - max(int(operands[0]), low) + 1, 0) / total
+            else:
+                fraction *= UNKNOWN_PREDICATE_SELECTIVITY
+        return fraction
+
+    return None
+
+def partition_fraction(sql, table_info, database, glue_client=None, today=None):
+    """Fraction of a table's partitions the query's predicates keep (1.0 when unpartitioned)"""
+    fraction = 1.0
+    expressions = []
+    for key in table_info['partition_keys']:
+        predicates = key_predicates(sql, key['name'])
+        if not predicates:
+            continue
+        projected = projected_fraction(table_info, key, predicates, today)
+        if projected is not None:
+            fraction *= projected
+        else:
+            expressions.extend(glue_partition_expression(key['name'], op, values) for op, values in predicates)
+
+    if not expressions:
+        return fraction
+
+    # Registered partitions: ask Glue how many match versus how many exist
+    counts = table_info.setdefault('partition_counts', {})
+    expression = ' AND '.join(expressions)
+    try:
+        if glue_client is None:
+            raise ValueError("no Glue client")
+        if '' not in counts:
+            counts[''] = count_partitions(glue_client, database, table_info['name'])
+        if expression not in counts:
+            counts[expression] = count_partitions(glue_client, database, table_info['name'], expression)
+        if counts['']:
+            return fraction * counts[expression] / counts['']
+    except Exception:
+        pass
+    return fraction * UNKNOWN_PREDICATE_SELECTIVITY ** len(expressions)
+
+def estimate_table_scans(sql, catalog, s3_client=None, glue_client=None, today=None, depth=0):
+    """Per-table scan estimates for every table the query (and any views it uses) reads"""
+    scans = []
+    unresolved = []
+    local_names = cte_names(sql)
+
+    for ref in find_table_references(sql):
+        if ref['name'].lower() in local_names:
+            continue
+        table_info = get_table_info(catalog, ref['name'])
+        if not table_info:
+            unresolved.append(ref['name'])
+            continue
+
+        if table_info['format'] == 'view':
+            view_sql = decode_view_sql(table_info['view_sql'])
+            if view_sql and depth < 3:
+                view_scans, view_unresolved = estimate_table_scans(view_sql, catalog, s3_client, glue_client, today, depth + 1)
+                scans.extend(dict(scan, via=table_info['name']) for scan in view_scans)
+                unresolved.extend(view_unresolved)
+            else:
+                unresolved.append(table_info['name'])
+            continue
+
+        size, num_files, source = table_size(table_info, s3_client)
+        columns = referenced_columns(sql, table_info)
+        column_fraction = estimate_scan_fraction(table_info, columns) if columns else 1.0
+        kept_fraction = partition_fraction(sql, table_info, catalog['database'], glue_client, today)
+        kept_fraction *= sample_fraction(sql, ref['name'])
+
+        scans.append({
+            'table': table_info['name'],
+            'format': table_info['format'],
+            'size_bytes': size,
+            'files': num_files,
+            'size_source': source,
+            'partition_fraction': kept_fraction,
+            'column_fraction': column_fraction,
+            'bytes': int(size * kept_fraction * column_fraction) if size is not None else None,
+            'via': None
+        })
+
+    return scans, unresolved
+
+def calibrate(history):
+    """Fit the runtime model and a bytes correction factor to executed-query Statistics"""
+    model = {'base_ms': DEFAULT_BASE_MS, 'bytes_per_ms': DEFAULT_BYTES_PER_MS, 'bytes_factor': 1.0, 'points': 0}
+    succeeded = [h for h in history or [] if h.get('state') == 'SUCCEEDED' and h.get('engine_ms')]
+
+    scanned = np.array([h['data_scanned_bytes'] for h in succeeded], dtype=float)
+    engine_ms = np.array([h['engine_ms'] for h in succeeded], dtype=float)
+    if len(succeeded) >= MIN_CALIBRATION_POINTS and np.ptp(scanned) > 0:
+        slope, intercept = np.polyfit(scanned, engine_ms, 1)
+        if slope > 0:
+            model['bytes_per_ms'] = 1.0 / slope
+            model['base_ms'] = max(intercept, 0.0)
+            model['points'] = len(succeeded)
+
+    # How far off past byte estimates were (compression, stale statistics). Compared with the
+    # uncorrected estimates: the corrected ones already include the factor being fitted
+    ratios = [
+        h['data_scanned_bytes'] / h['estimated_raw_bytes'] for h in succeeded
+        if h.get('estimated_raw_bytes') and h.get('data_scanned_bytes')
+    ]
+    if len(ratios) >= MIN_CALIBRATION_POINTS:
+        model['bytes_factor'] = float(np.clip(np.median(ratios), 0.05, 20.0))
+
+    return model
+
+def runtime_tier(seconds):
+    """(label, color) for a predicted runtime"""
+    for limit, label, color in RUNTIME_TIERS:
+        if limit is None or seconds < limit:
+            return label, color
+
+def estimate_query_cost(sql, catalog, history=None, s3_client=None, glue_client=None, today=None):
+    """Predict bytes scanned, runtime and cost of a query before running it"""
+    scans, unresolved = estimate_table_scans(sql, catalog, s3_client, glue_client, today) if catalog else ([], [])
+    model = calibrate(history)
+
+    known = [scan['bytes'] for scan in scans if scan['bytes'] is not None]
+    missing_sizes = [scan['table'] for scan in scans if scan['bytes'] is None]
+    raw_bytes = sum(known)
+    estimated_bytes = int(raw_bytes * model['bytes_factor'])
+    seconds = (model['base_ms'] + estimated_bytes / model['bytes_per_ms']) / 1000.0
+
+    # Earlier runs of the same query shape (literals aside) beat the model for runtime
+    similar = latency_by_fingerprint(history or []).get(shape_fingerprint(sql)) if history else None
+    if similar and similar['runs'] >= MIN_SIMILAR_RUNS:
+        seconds = similar['p50_ms'] / 1000.0
+
+    if unresolved or missing_sizes or not scans:
+        confidence = 'low'
+    elif model['points']:
+        confidence = 'high'
+    else:
+        confidence = 'medium'
+
+    return {
+        'bytes': estimated_bytes,
+        'raw_bytes': raw_bytes,
+        'seconds': seconds,
+        'cost_usd': max(estimated_bytes, MIN_BILLED_BYTES) / 1024 ** 4 * ATHENA_PRICE_PER_TB,
+        'tables': scans,
+        'unresolved': sorted(set(unresolved)),
+        'missing_sizes': missing_sizes,
+        'calibration_points': model['points'],
+        'similar_runs': similar['runs'] if similar else 0,
+        'confidence': confidence
+    }
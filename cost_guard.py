@@ -0,0 +1,144 @@
+"""
+Cost Guardrails
+Per-account and per-user scan budgets: a per-query bytes cutoff, daily usage tracked
+from execution Statistics, and refusal or downgrade of queries that would exceed them
+"""
+
+import json
+import math
+from datetime import datetime
+
+from cost_estimator import estimate_query_cost
+from glue_catalog import get_table_info
+from query_optimizer import add_table_sample, add_limit, add_header_notes, find_table_references
+
+COST_BUDGETS_FILE = 'cost_budgets.json'
+
+DEFAULT_BUDGET = {
+    'per_query_bytes': 10 * 1024 ** 3,
+    'daily_bytes': 100 * 1024 ** 3,
+    'action': 'downgrade',          # 'downgrade' (sample + LIMIT) or 'refuse'
+    'max_rows_on_downgrade': 1000
+}
+
+# Athena rejects workgroup cutoffs below 10 MB
+MIN_WORKGROUP_CUTOFF_BYTES = 10 * 1024 ** 2
+
+BUDGET_MARKER = "-- 💰 Budget:"
+
+def load_budgets(path=COST_BUDGETS_FILE):
+    """Load budget settings from file"""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'defaults': dict(DEFAULT_BUDGET), 'accounts': {}, 'users': {}, 'admins': []}
+    except Exception:
+        return {'defaults': dict(DEFAULT_BUDGET), 'accounts': {}, 'users': {}, 'admins': []}
+
+def save_budgets(budgets, path=COST_BUDGETS_FILE):
+    """Save budget settings to file"""
+    try:
+        with open(path, 'w') as f:
+            json.dump(budgets, f, indent=2)
+        return True
+    except Exception:
+        return False
+
+def resolve_budget(budgets, account_id, user=''):
+    """Effective limits for an account and user: the tightest per-query cutoff, and one daily limit per scope"""
+    defaults = {**DEFAULT_BUDGET, **budgets.get('defaults', {})}
+    account = budgets.get('accounts', {}).get(account_id, {})
+    user_budget = budgets.get('users', {}).get(user, {}) if user else {}
+
+    per_query = [scope['per_query_bytes'] for scope in (defaults, account, user_budget) if scope.get('per_query_bytes')]
+    return {
+        'per_query_bytes': min(per_query),
+        'account_daily_bytes': account.get('daily_bytes', defaults['daily_bytes']),
+        'user_daily_bytes': user_budget.get('daily_bytes'),
+        'action': user_budget.get('action', account.get('action', defaults['action'])),
+        'max_rows_on_downgrade': defaults['max_rows_on_downgrade']
+    }
+
+def is_budget_admin(budgets, user):
+    """Whether a signed-in user may change settings shared by everyone, such as workgroup cutoffs"""
+    return bool(user) and user in budgets.get('admins', [])
+
+def daily_usage(history, account_id, user='', day=None):
+    """Bytes scanned today by the account and by the user, from recorded execution Statistics"""
+    day = day or datetime.now().strftime('%Y-%m-%d')
+    todays = [h for h in history if h.get('timestamp', '').startswith(day) and h.get('account_id') == account_id]
+    return {
+        'account_bytes': sum(h.get('data_scanned_bytes', 0) for h in todays),
+        'user_bytes': sum(h.get('data_scanned_bytes', 0) for h in todays if user and h.get('user') == user)
+    }
+
+def allowed_bytes(budget, usage):
+    """Largest scan the next query may do under the per-query cutoff and remaining daily budgets"""
+    limits = [
+        budget['per_query_bytes'],
+        budget['account_daily_bytes'] - usage['account_bytes']
+    ]
+    if budget['user_daily_bytes']:
+        limits.append(budget['user_daily_bytes'] - usage['user_bytes'])
+    return max(min(limits), 0)
+
+def check_budget(estimate, budget, usage):
+    """Decide whether a query may run as-is ('allow'), must be downgraded, or is refused"""
+    allowed = allowed_bytes(budget, usage)
+    # Tables without a known size would count as free, so the estimate cannot be trusted
+    unsized = sorted(set(estimate.get('unresolved', [])) | set(estimate.get('missing_sizes', [])))
+    if unsized:
+        return {'decision': 'refuse', 'allowed_bytes': allowed, 'reason': f"the scan size of {', '.join(unsized)} is unknown"}
+    if estimate['bytes'] <= allowed:
+        return {'decision': 'allow', 'allowed_bytes': allowed, 'reason': ''}
+
+    if allowed <= 0:
+        reason = "today's scan budget is used up"
+    elif estimate['bytes'] > budget['per_query_bytes']:
+        reason = "the estimated scan exceeds the per-query limit"
+    else:
+        reason = "the estimated scan exceeds the remaining daily budget"
+
+    decision = 'downgrade' if budget['action'] == 'downgrade' and allowed > 0 else 'refuse'
+    return {'decision': decision, 'allowed_bytes': allowed, 'reason': reason}
+
+def check_background_budget(select_sql, catalog, history, budget, account_id, user='', glue_client=None, s3_client=None):
+    """(allowed, estimate) for background work such as a CTAS of select_sql: it runs as-is or not at all"""
+    estimate = estimate_query_cost(select_sql, catalog, history, s3_client=s3_client, glue_client=glue_client)
+    guard = check_budget(estimate, budget, daily_usage(history, account_id, user))
+    return guard['decision'] == 'allow', estimate
+
+def downgrade_query(sql, estimate, allowed, catalog, max_rows):
+    """Sample the query's base tables and cap the rows so the scan fits the allowance; None if impossible"""
+    base_scans = [
+        scan for scan in estimate['tables']
+        if scan['bytes'] and not scan['via'] and get_table_info(catalog, scan['table'])
+    ]
+    referenced = {ref['name'].lower() for ref in find_table_references(sql)}
+    sampleable = [scan for scan in base_scans if scan['table'].lower() in referenced]
+    if not sampleable:
+        return None
+
+    # Tables that cannot be sampled (e.g. read through views) still count in full
+    fixed_bytes = estimate['bytes'] - sum(scan['bytes'] for scan in sampleable)
+    if fixed_bytes >= allowed:
+        return None
+    percent = math.floor(10000.0 * (allowed - fixed_bytes) / (estimate['bytes'] - fixed_bytes)) / 100.0
+
+    downgraded = sql
+    for table_name in {scan['table'] for scan in sampleable}:
+        downgraded = add_table_sample(downgraded, table_name, percent)
+    downgraded = add_limit(downgraded, max_rows)
+    return add_header_notes(downgraded, [
+        f"{BUDGET_MARKER} sampled to ~{percent:.1f}% of data and capped at {max_rows:,} rows to stay within budget"
+    ])
+
+def apply_workgroup_cutoff(athena_client, workgroup, cutoff_bytes):
+    """Set the workgroup's BytesScannedCutoffPerQuery so Athena itself cancels oversized scans"""
+    cutoff = max(int(cutoff_bytes), MIN_WORKGROUP_CUTOFF_BYTES)
+    athena_client.update_work_group(
+        WorkGroup=workgroup,
+        ConfigurationUpdates={'BytesScannedCutoffPerQuery': cutoff}
+    )
+    return cutoff
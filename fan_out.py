@@ -0,0 +1,196 @@
+"""
+Multi-Account Fan-Out
+Runs the same SQL concurrently in several accounts (each with its own pooled clients,
+database and workgroup), yields each account's outcome as soon as it finishes, and streams
+the results batch by batch into one typed result-store entry with an account column
+"""
+
+import time
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pyarrow as pa
+import streamlit as st
+
+from result_store import get_result_store, result_schema, csv_result_batches, paged_result_batches
+from sql_fingerprint import fingerprint
+
+MAX_FAN_OUT_WORKERS = 8
+FAN_OUT_TIMEOUT_SECONDS = 10 * 60
+POLL_SECONDS = 1
+ACCOUNT_COLUMN = 'account'
+
+def render_fan_out_selector(accounts, selected_account):
+    """Sidebar choice of accounts to run queries in at once (the selected account is preselected)"""
+    with st.expander("🌐 Multi-Account Fan-Out"):
+        st.multiselect(
+            "Run queries in:", list(accounts), default=[selected_account], key="fan_out_accounts",
+            help="With two or more accounts, Execute runs the SQL in each one concurrently and merges the results"
+        )
+
+def fan_out_accounts(accounts):
+    """Configs of the fan-out accounts, or {} when fewer than two are selected"""
+    names = [name for name in st.session_state.get('fan_out_accounts', []) if name in accounts]
+    return {name: accounts[name] for name in names} if len(names) > 1 else {}
+
+def wait_for_execution(athena_client, query_execution_id, timeout=FAN_OUT_TIMEOUT_SECONDS):
+    """Final QueryExecution of a run; stopped and reported as TIMEOUT if it outlasts the timeout"""
+    deadline = time.time() + timeout
+    while True:
+        execution = athena_client.get_query_execution(QueryExecutionId=query_execution_id)['QueryExecution']
+        if execution['Status']['State'] in ('SUCCEEDED', 'FAILED', 'CANCELLED'):
+            return execution
+        if time.time() > deadline:
+            athena_client.stop_query_execution(QueryExecutionId=query_execution_id)
+            execution['Status']['State'] = 'TIMEOUT'
+            return execution
+        time.sleep(POLL_SECONDS)
+
+def result_batches(athena_client, s3_client, query_execution_id, output_location, schema):
+    """Record batches of a finished execution: the S3 result file, else GetQueryResults.
+    The source is chosen on the first batch, so a fallback never repeats rows already yielded"""
+    if s3_client and output_location.endswith('.csv'):
+        batches = csv_result_batches(s3_client, output_location, schema)
+        try:
+            first = next(batches, None)
+        except Exception:
+            batches = None  # e.g. no s3:GetObject on this account's results bucket
+        if batches is not None:
+            if first is not None:
+                yield first
+            yield from batches
+            return
+    yield from paged_result_batches(athena_client, query_execution_id, schema)
+
+def run_in_account(name, config, clients, sql_query):
+    """Run sql_query in one account; never raises, failures are reported in the outcome"""
+    started = time.time()
+    outcome = {
+        'account': name,
+        'account_id': config['aws_account_id'],
+        'sql': sql_query,
+        'execution_id': None,
+        'status': 'FAILED',
+        'error': '',
+        'schema': None,
+        'batches': None,
+        'rows': None,
+        'bytes_scanned': 0,
+        'engine_ms': 0,
+        'seconds': 0.0
+    }
+    try:
+        response = clients['athena'].start_query_execution(
+            QueryString=sql_query,
+            WorkGroup=config['athena_workgroup'],
+            QueryExecutionContext={'Database': config['glue_database']},
+            ResultConfiguration={'OutputLocation': f"s3://{config['s3_results_bucket']}/"}
+        )
+        outcome['execution_id'] = response['QueryExecutionId']
+        execution = wait_for_execution(clients['athena'], outcome['execution_id'])
+        statistics = execution.get('Statistics', {})
+        outcome.update({
+            'status': execution['Status']['State'],
+            'error': execution['Status'].get('StateChangeReason', ''),
+            'bytes_scanned': statistics.get('DataScannedInBytes', 0),
+            'engine_ms': statistics.get('EngineExecutionTimeInMillis', 0)
+        })
+        if outcome['status'] == 'SUCCEEDED':
+            # Only the schema now; rows are streamed into the result store once every account is done
+            metadata = clients['athena'].get_query_results(QueryExecutionId=outcome['execution_id'], MaxResults=1)
+            outcome['schema'] = result_schema(metadata['ResultSet']['ResultSetMetadata']['ColumnInfo'])
+            output_location = execution.get('ResultConfiguration', {}).get('OutputLocation', '')
+            outcome['batches'] = partial(
+                result_batches, clients['athena'], clients.get('s3'), outcome['execution_id'], output_location, outcome['schema']
+            )
+    except Exception as e:
+        outcome['error'] = str(e)
+    outcome['seconds'] = time.time() - started
+    return outcome
+
+def fan_out(targets, sql_queries, max_workers=MAX_FAN_OUT_WORKERS):
+    """Yield each account's outcome as it completes. targets: [(name, config, clients)];
+    sql_queries: name -> SQL to run there (the same SQL, possibly downgraded per account)"""
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(targets)) or 1, thread_name_prefix='fan-out') as executor:
+        futures = [executor.submit(run_in_account, name, config, clients, sql_queries[name]) for name, config, clients in targets]
+        for future in as_completed(futures):
+            yield future.result()
+
+INTEGER_DIGITS = {8: 3, 16: 5, 32: 10, 64: 19}
+MAX_DECIMAL_PRECISION = 38
+
+def decimal_type(types):
+    """Decimal holding every integer and decimal type given: widest integer part plus widest scale"""
+    scale = max((t.scale for t in types if pa.types.is_decimal(t)), default=0)
+    integer_digits = max(
+        t.precision - t.scale if pa.types.is_decimal(t) else INTEGER_DIGITS[t.bit_width] for t in types
+    )
+    return pa.decimal128(min(integer_digits + scale, MAX_DECIMAL_PRECISION), scale)
+
+def common_type(types):
+    """One type for a column across accounts: integers and decimals widened, other numbers as double, else string"""
+    if len(types) == 1:
+        return next(iter(types))
+    if all(pa.types.is_integer(t) for t in types):
+        return pa.int64()
+    if all(pa.types.is_integer(t) or pa.types.is_decimal(t) for t in types):
+        return decimal_type(types)
+    if all(pa.types.is_integer(t) or pa.types.is_floating(t) or pa.types.is_decimal(t) for t in types):
+        return pa.float64()
+    return pa.string()
+
+def merged_schema(schemas):
+    """Union of the account results' columns in first-seen order, each with a type common to all accounts"""
+    types = {}
+    for schema in schemas:
+        for field in schema:
+            types.setdefault(field.name, set()).add(field.type)
+    fields = [pa.field(ACCOUNT_COLUMN, pa.string())]
+    for name, column_types in types.items():
+        if name != ACCOUNT_COLUMN:
+            fields.append(pa.field(name, common_type(column_types)))
+    return pa.schema(fields)
+
+def merged_batches(outcomes, schema):
+    """Every successful account's batches cast to the merged schema and tagged with the account; counts rows per account"""
+    for outcome in outcomes:
+        if outcome['batches'] is None:
+            continue
+        outcome['rows'] = 0
+        for batch in outcome['batches']():
+            columns = [pa.array([outcome['account']] * batch.num_rows, pa.string())]
+            for field in schema:
+                if field.name == ACCOUNT_COLUMN:
+                    continue
+                if field.name in batch.schema.names:
+                    columns.append(batch.column(field.name).cast(field.type))
+                else:
+                    columns.append(pa.nulls(batch.num_rows, field.type))
+            outcome['rows'] += batch.num_rows
+            yield pa.RecordBatch.from_arrays(columns, schema=schema)
+
+def store_fan_out_result(sql_query, outcomes):
+    """Merged result written to the result store batch by batch, keyed by the SQL and the accounts it ran in"""
+    account_ids = sorted(outcome['account_id'] for outcome in outcomes)
+    result_key = fingerprint(sql_query, 'fan-out', *account_ids)
+    schema = merged_schema([outcome['schema'] for outcome in outcomes if outcome['schema'] is not None])
+    result_id = f"fanout-{result_key[:16]}-{int(time.time() * 1000)}"
+    # Rows in account order, whichever account finished first
+    ordered = sorted(outcomes, key=lambda outcome: outcome['account'])
+    return get_result_store().put_batches(result_id, schema, merged_batches(ordered, schema), result_key)
+
+def fan_out_timings(outcomes):
+    """Per-account status, rows, scan and timings for display"""
+    return [
+        {
+            'Account': outcome['account'],
+            'Status': outcome['status'],
+            'Rows': outcome['rows'],
+            'Scanned (bytes)': outcome['bytes_scanned'],
+            'Engine (s)': round(outcome['engine_ms'] / 1000, 2),
+            'Wall (s)': round(outcome['seconds'], 2),
+            'Execution ID': outcome['execution_id'] or '',
+            'Error': outcome['error']
+        }
+        for outcome in outcomes
+    ]
@@ -0,0 +1,131 @@
+"""
+Glue Catalog Cache
+Loads table, column and partition metadata once per database so SQL generation
+does not call Glue on every rerun
+"""
+
+import time
+import hashlib
+import json
+
+# Default column set per table/view used instead of SELECT * (editable in the sidebar)
+DEFAULT_COLUMNS_FILE = 'default_columns.json'
+
+def is_view_name(table_name):
+    """Same naming convention the apps use to tell pre-built views from base tables"""
+    name = table_name.lower()
+    return 'view' in name or '_detailed' in name
+
+def detect_storage_format(table):
+    """Infer the storage format of a Glue table from its SerDe and input format"""
+    storage = table.get('StorageDescriptor', {})
+    serde = storage.get('SerdeInfo', {}).get('SerializationLibrary', '').lower()
+    input_format = storage.get('InputFormat', '').lower()
+    classification = table.get('Parameters', {}).get('classification', '').lower()
+
+    if table.get('TableType') == 'VIRTUAL_VIEW':
+        return 'view'
+    if 'parquet' in serde or 'parquet' in input_format or classification == 'parquet':
+        return 'parquet'
+    if 'orc' in serde or 'orc' in input_format or classification == 'orc':
+        return 'orc'
+    if 'json' in serde or classification == 'json':
+        return 'json'
+    if 'avro' in serde or classification == 'avro':
+        return 'avro'
+    return 'text'
+
+def describe_table(table):
+    """Reduce a Glue GetTables entry to the metadata the query tools need"""
+    storage = table.get('StorageDescriptor', {})
+    return {
+        'name': table['Name'],
+        'table_type': table.get('TableType', ''),
+        'is_view': table.get('TableType') == 'VIRTUAL_VIEW' or is_view_name(table['Name']),
+        'columns': [
+            {'name': col['Name'], 'type': col.get('Type', ''), 'comment': col.get('Comment', '')}
+            for col in storage.get('Columns', [])
+        ],
+        'partition_keys': [
+            {'name': key['Name'], 'type': key.get('Type', ''), 'comment': key.get('Comment', '')}
+            for key in table.get('PartitionKeys', [])
+        ],
+        'location': storage.get('Location', ''),
+        'format': detect_storage_format(table),
+        'parameters': table.get('Parameters', {}),
+        'description': table.get('Description', ''),
+        'view_sql': table.get('ViewOriginalText', ''),
+        'updated_at': str(table.get('UpdateTime', ''))
+    }
+
+def catalog_version(tables):
+    """Stable hash of table names, columns and update times"""
+    signature = [
+        [name, [c['name'] + ':' + c['type'] for c in info['columns']],
+         [k['name'] for k in info['partition_keys']], info['updated_at']]
+        for name, info in sorted(tables.items())
+    ]
+    return hashlib.sha1(json.dumps(signature).encode('utf-8')).hexdigest()[:12]
+
+def fetch_catalog(glue_client, database):
+    """Load every table in a Glue database (all pages) into a catalog dict"""
+    tables = {}
+    paginator = glue_client.get_paginator('get_tables')
+    for page in paginator.paginate(DatabaseName=database):
+        for table in page['TableList']:
+            tables[table['Name']] = describe_table(table)
+
+    return {
+        'database': database,
+        'tables': tables,
+        'table_names': list(tables),
+        'views': [name for name, info in tables.items() if info['is_view']],
+        'base_tables': [name for name, info in tables.items() if not info['is_view']],
+        'version': catalog_version(tables),
+        'loaded_at': time.time()
+    }
+
+def empty_catalog(database):
+    """Catalog placeholder used when Glue cannot be reached"""
+    return {
+        'database': database,
+        'tables': {},
+        'table_names': [],
+        'views': [],
+        'base_tables': [],
+        'version': 'empty',
+        'loaded_at': time.time()
+    }
+
+def get_table_info(catalog, table_name):
+    """Look up a table in the catalog, ignoring case and identifier quotes"""
+    if not catalog or not table_name:
+        return None
+    name = table_name.strip('"`').lower()
+    for candidate, info in catalog['tables'].items():
+        if candidate.lower() == name:
+            return info
+    return None
+
+def is_catalog_stale(catalog, max_age_seconds):
+    """True when the cached catalog is older than max_age_seconds"""
+    return catalog is None or time.time() - catalog['loaded_at'] > max_age_seconds
+
+def load_default_columns(path=DEFAULT_COLUMNS_FILE):
+    """Load the user-configurable default column set per table/view"""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception:
+        return {}
+
+def save_default_columns(default_columns, path=DEFAULT_COLUMNS_FILE):
+    """Save the default column sets to file"""
+    try:
+        with open(path, 'w') as f:
+            json.dump(default_columns, f, indent=2)
+        return True
+    except Exception:
+        return False
@@ -0,0 +1,367 @@
+"""
+Materialized Views
+The quick-action views re-join contract_master, contract_compliance and
+contract_ownership on every query. This keeps a partitioned Parquet copy of each
+(built with CTAS), rebuilds it on a schedule or when the source data changes, and
+routes generated SQL to the copy only while it is fresh
+"""
+
+import os
+import re
+import json
+import time
+import threading
+from datetime import datetime
+
+from cost_estimator import decode_view_sql
+from cost_guard import check_background_budget
+from glue_catalog import get_table_info
+from query_history import load_query_history, record_execution
+from query_optimizer import add_header_notes, find_table_references
+
+MATERIALIZED_VIEWS_FILE = 'materialized_views.json'
+MATERIALIZED_PREFIX = 'materialized'
+MATERIALIZED_MARKER = "-- Materialized:"
+TABLE_PREFIX = 'mv_'
+
+# View -> materialized table base name and partition column (low cardinality, used in
+# the quick-action filters; CTAS writes at most 100 partitions)
+MATERIALIZED_VIEWS = {
+    'executive_dashboard_detailed': {'table': 'mv_executive_dashboard', 'partitioned_by': 'department'},
+    'renewals_contracts_detailed': {'table': 'mv_renewals_contracts', 'partitioned_by': 'department'},
+    'compliance_contracts_detailed': {'table': 'mv_compliance_contracts', 'partitioned_by': 'risk_level'}
+}
+DEFAULT_SOURCE_TABLES = ['contract_master', 'contract_compliance', 'contract_ownership']
+
+MAX_AGE_HOURS = 24                 # scheduled rebuild even without detected changes
+CHECK_INTERVAL_SECONDS = 15 * 60   # how often the apps look for source data changes
+CTAS_POLL_SECONDS = 2
+CTAS_TIMEOUT_SECONDS = 600
+
+# Sessions of every account and the rebuild buttons all write the same file
+_state_lock = threading.Lock()
+
+def read_materialized_state(path=MATERIALIZED_VIEWS_FILE):
+    """Materialization state per account and database (current table per view, build times, source signatures);
+    raises if the file cannot be parsed"""
+    try:
+        with open(path, 'r') as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return {'scopes': {}}
+    # Files written before states were kept per account do not say which account their copies belong to
+    return state if 'scopes' in state else {'scopes': {}}
+
+def load_materialized_state(path=MATERIALIZED_VIEWS_FILE):
+    """Load the materialization state (empty if it cannot be read)"""
+    try:
+        return read_materialized_state(path)
+    except Exception:
+        return {'scopes': {}}
+
+def save_materialized_state(state, path=MATERIALIZED_VIEWS_FILE):
+    """Save the materialization state atomically"""
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temp_path, 'w') as f:
+            json.dump(state, f, indent=2)
+        os.replace(temp_path, path)
+        return True
+    except Exception:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        return False
+
+def update_materialized_state(update, path=MATERIALIZED_VIEWS_FILE):
+    """Apply update(state) to the latest saved state under the lock and save it; returns update's result.
+    An unreadable file is left for inspection and nothing is saved (None is returned)"""
+    with _state_lock:
+        try:
+            state = read_materialized_state(path)
+        except Exception:
+            return None
+        result = update(state)
+        save_materialized_state(state, path)
+        return result
+
+def materialized_scope(state, account_id, database):
+    """Views and last check time of one account and database: copies of the same view elsewhere are other tables"""
+    return state.setdefault('scopes', {}).setdefault(f"{account_id}:{database}", {'views': {}, 'checked_at': 0})
+
+def scope_views(state, account_id, database):
+    """Materialized copies of one account and database (read-only)"""
+    return state.get('scopes', {}).get(f"{account_id}:{database}", {}).get('views', {})
+
+def is_materialized_table(table_name):
+    """Tables written by this module (hidden from the generator's table list)"""
+    return table_name.lower().startswith(TABLE_PREFIX)
+
+def source_tables(catalog, view_name, seen=None):
+    """Base tables behind a view, following nested views"""
+    seen = seen if seen is not None else set()
+    info = get_table_info(catalog, view_name)
+    if not info or not info['view_sql']:
+        return list(DEFAULT_SOURCE_TABLES) if not seen else []
+
+    seen.add(view_name.lower())
+    sources = []
+    for ref in find_table_references(decode_view_sql(info['view_sql'])):
+        name = ref['name'].lower()
+        if name in seen:
+            continue
+        referenced = get_table_info(catalog, name)
+        if referenced and referenced['format'] == 'view':
+            sources.extend(source_tables(catalog, name, seen))
+        elif name not in sources:
+            sources.append(name)
+    return sources or list(DEFAULT_SOURCE_TABLES)
+
+def latest_modified(s3_client, location):
+    """Newest object timestamp under an s3:// location (ISO string, '' when empty)"""
+    bucket, _, prefix = location.replace('s3://', '', 1).partition('/')
+    latest = None
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get('Contents', []):
+            if latest is None or obj['LastModified'] > latest:
+                latest = obj['LastModified']
+    return latest.isoformat() if latest else ''
+
+def table_signature(catalog, table_names, s3_client=None):
+    """Per table: Glue update time plus the newest data file, so new files count as a change"""
+    signature = {}
+    for name in table_names:
+        info = get_table_info(catalog, name)
+        if not info:
+            continue
+        modified = ''
+        if s3_client and info['location'].startswith('s3://'):
+            try:
+                modified = latest_modified(s3_client, info['location'])
+            except Exception:
+                modified = ''
+        signature[name] = f"{info['updated_at']}|{modified}"
+    return signature
+
+def source_signature(catalog, view_name, s3_client=None):
+    """Signature of the base tables behind a view"""
+    return table_signature(catalog, source_tables(catalog, view_name), s3_client)
+
+def build_ctas_sql(database, view_name, table_name, columns, location, partition_column=None):
+    """CTAS writing a view to partitioned Parquet (partition column last, as Athena requires)"""
+    names = [column['name'] for column in columns]
+    properties = [
+        "format = 'PARQUET'",
+        "write_compression = 'SNAPPY'",
+        f"external_location = '{location}'"
+    ]
+    if partition_column and partition_column in names:
+        names = [name for name in names if name != partition_column] + [partition_column]
+        properties.append(f"partitioned_by = ARRAY['{partition_column}']")
+    select_list = ',\n    '.join(f'"{name}"' for name in names)
+    return (
+        f'CREATE TABLE "{database}"."{table_name}"\n'
+        f"WITH (\n    " + ',\n    '.join(properties) + "\n)\n"
+        f'AS SELECT\n    {select_list}\nFROM "{database}"."{view_name}"'
+    )
+
+def run_statement(athena_client, sql, database, workgroup, output_location, timeout=CTAS_TIMEOUT_SECONDS):
+    """Run a statement to completion; returns (execution ID, state, reason)"""
+    response = athena_client.start_query_execution(
+        QueryString=sql,
+        QueryExecutionContext={'Database': database},
+        WorkGroup=workgroup,
+        ResultConfiguration={'OutputLocation': output_location}
+    )
+    query_execution_id = response['QueryExecutionId']
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = athena_client.get_query_execution(QueryExecutionId=query_execution_id)['QueryExecution']['Status']
+        if status['State'] in ('SUCCEEDED', 'FAILED', 'CANCELLED'):
+            return query_execution_id, status['State'], status.get('StateChangeReason', '')
+        time.sleep(CTAS_POLL_SECONDS)
+
+    athena_client.stop_query_execution(QueryExecutionId=query_execution_id)
+    return query_execution_id, 'TIMEOUT', f"CTAS did not finish within {timeout}s"
+
+def delete_location(s3_client, location):
+    """Remove the data files of a replaced materialized table"""
+    bucket, _, prefix = location.replace('s3://', '', 1).partition('/')
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        keys = [{'Key': obj['Key']} for obj in page.get('Contents', [])]
+        if keys:
+            s3_client.delete_objects(Bucket=bucket, Delete={'Objects': keys})
+
+def build_materialized_view(athena_client, s3_client, catalog, view_name, workgroup, results_bucket, previous=None,
+                            budget=None, account_id='', user=''):
+    """Write a fresh versioned copy of a view; the previous copy is dropped only after the new one succeeds.
+    The CTAS is skipped when it does not fit the budget, and recorded in the query history like any query"""
+    spec = MATERIALIZED_VIEWS[view_name]
+    info = get_table_info(catalog, view_name)
+    if not info or not info['columns']:
+        raise RuntimeError(f"{view_name} is not in the catalog")
+
+    database = catalog['database']
+    version = datetime.now().strftime('%Y%m%d_%H%M%S')
+    table_name = f"{spec['table']}_{version}"
+    location = f"s3://{results_bucket}/{MATERIALIZED_PREFIX}/{view_name}/{version}/"
+    output_location = f"s3://{results_bucket}/"
+
+    # Signature first: data arriving during the build makes the copy stale, not silently fresh
+    signature = source_signature(catalog, view_name, s3_client)
+    estimate = None
+    if budget:
+        allowed, estimate = check_background_budget(
+            f'SELECT * FROM "{database}"."{view_name}"', catalog, load_query_history(), budget, account_id, user,
+            s3_client=s3_client
+        )
+        if not allowed:
+            raise RuntimeError(f"skipped: rebuilding {view_name} would exceed the scan budget")
+
+    started = time.time()
+    sql = build_ctas_sql(database, view_name, table_name, info['columns'], location, spec['partitioned_by'])
+    query_execution_id, state, reason = run_statement(athena_client, sql, database, workgroup, output_location)
+    try:
+        record_execution(athena_client, query_execution_id, sql, account_id, estimate, user, database=database)
+    except Exception:
+        pass
+    if state != 'SUCCEEDED':
+        raise RuntimeError(f"CTAS for {view_name} {state.lower()}: {reason}")
+
+    if previous:
+        try:
+            run_statement(athena_client, f'DROP TABLE IF EXISTS `{database}`.`{previous["table"]}`', database, workgroup, output_location)
+            delete_location(s3_client, previous['location'])
+        except Exception:
+            pass  # an orphaned old copy is harmless; routing already points at the new one
+
+    return {
+        'table': table_name,
+        'location': location,
+        'built_at': time.time(),
+        'build_seconds': round(time.time() - started, 1),
+        'execution_id': query_execution_id,
+        'source_signature': signature,
+        'stale': False
+    }
+
+def is_fresh(entry, signature=None, max_age_hours=MAX_AGE_HOURS, now=None):
+    """True when a materialized copy can stand in for its view"""
+    if not entry or entry.get('stale'):
+        return False
+    if (now or time.time()) - entry['built_at'] > max_age_hours * 3600:
+        return False
+    return signature is None or signature == entry['source_signature']
+
+def check_freshness(state, catalog, account_id, s3_client=None, now=None):
+    """Compare the account's source signatures with the ones recorded at build time; marks and returns stale views"""
+    scope = materialized_scope(state, account_id, catalog['database'])
+    stale = []
+    for view_name in MATERIALIZED_VIEWS:
+        if not get_table_info(catalog, view_name):
+            continue
+        entry = scope['views'].get(view_name)
+        if not is_fresh(entry, source_signature(catalog, view_name, s3_client), now=now):
+            if entry:
+                entry['stale'] = True
+            stale.append(view_name)
+    scope['checked_at'] = now or time.time()
+    return stale
+
+def refresh_materialized_views(athena_client, s3_client, catalog, workgroup, results_bucket, force=False, path=MATERIALIZED_VIEWS_FILE,
+                               budget=None, account_id='', user=''):
+    """Rebuild the account's missing, stale or (with force) all materialized views within the budget; returns {view: message}.
+    Builds run outside the state lock; each finished one is saved into the latest state"""
+    database = catalog['database']
+    if force:
+        to_build = [name for name in MATERIALIZED_VIEWS if get_table_info(catalog, name)]
+    else:
+        to_build = update_materialized_state(lambda state: check_freshness(state, catalog, account_id, s3_client), path) or []
+    messages = {}
+    for view_name in to_build:
+        try:
+            previous = scope_views(load_materialized_state(path), account_id, database).get(view_name)
+            entry = build_materialized_view(
+                athena_client, s3_client, catalog, view_name, workgroup, results_bucket, previous,
+                budget, account_id, user
+            )
+
+            def store_entry(state):
+                materialized_scope(state, account_id, database)['views'][view_name] = entry
+            update_materialized_state(store_entry, path)
+            messages[view_name] = f"built {entry['table']} in {entry['build_seconds']}s"
+        except Exception as e:
+            messages[view_name] = f"failed: {str(e)}"
+    return messages
+
+def unknown_materialized_tables(state, catalog, account_id, now=None):
+    """The account's fresh materialized tables built after the catalog was loaded, which it therefore does not list yet"""
+    return [
+        entry['table'] for entry in scope_views(state, account_id, catalog['database']).values()
+        if is_fresh(entry, now=now) and entry['built_at'] > catalog['loaded_at'] and not get_table_info(catalog, entry['table'])
+    ]
+
+def route_to_materialized(sql, state, catalog, account_id, now=None):
+    """Point view references at the fresh materialized copies of the catalog's account and database; stale views,
+    and copies missing from the catalog (validation would reject them), stay live"""
+    notes = []
+    for view_name, entry in scope_views(state, account_id, catalog['database']).items():
+        if not is_fresh(entry, now=now):
+            continue
+        if not get_table_info(catalog, entry['table']):
+            continue
+        pattern = r'(\b(?:FROM|JOIN)\s+(?:(?:"[^"]+"|\w+)\.)?)"?' + re.escape(view_name) + r'"?(?![\w"])'
+        sql, count = re.subn(pattern, lambda m: m.group(1) + entry['table'], sql, flags=re.IGNORECASE)
+        if count:
+            built = datetime.fromtimestamp(entry['built_at']).strftime('%Y-%m-%d %H:%M')
+            notes.append(f"{MATERIALIZED_MARKER} {view_name} -> {entry['table']} (built {built})")
+    return add_header_notes(sql, notes)
+
+def materialized_status(state, catalog, account_id, now=None):
+    """One row per materialized view of the account and database for display"""
+    views = scope_views(state, account_id, catalog['database'])
+    rows = []
+    for view_name, spec in MATERIALIZED_VIEWS.items():
+        entry = views.get(view_name)
+        rows.append({
+            'View': view_name,
+            'Table': entry['table'] if entry else '–',
+            'Partitioned By': spec['partitioned_by'],
+            'Built': datetime.fromtimestamp(entry['built_at']).strftime('%Y-%m-%d %H:%M') if entry else 'never',
+            'Status': (
+                'view missing' if not get_table_info(catalog, view_name)
+                else 'fresh' if is_fresh(entry, now=now)
+                else 'stale (live view used)' if entry
+                else 'not built (live view used)'
+            )
+        })
+    return rows
+
+if __name__ == "__main__":
+    # Scheduled refresh, e.g. from cron: python materialized_views.py <database> <workgroup> <results_bucket> [--force] [region]
+    import sys
+    import boto3
+    from cost_guard import load_budgets, resolve_budget
+    from glue_catalog import fetch_catalog
+
+    args = [arg for arg in sys.argv[1:] if arg != '--force']
+    if len(args) < 3:
+        print("Usage: python materialized_views.py <database> <workgroup> <results_bucket> [--force] [region]")
+        sys.exit(1)
+
+    region = args[3] if len(args) > 3 else 'us-east-1'
+    account_id = boto3.client('sts', region_name=region).get_caller_identity()['Account']
+    catalog = fetch_catalog(boto3.client('glue', region_name=region), args[0])
+    messages = refresh_materialized_views(
+        boto3.client('athena', region_name=region), boto3.client('s3', region_name=region),
+        catalog, args[1], args[2], force='--force' in sys.argv,
+        budget=resolve_budget(load_budgets(), account_id), account_id=account_id
+    )
+    for view_name, message in messages.items():
+        print(f"{view_name}: {message}")
+    if not messages:
+        print("All materialized views are fresh")
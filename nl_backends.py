@@ -0,0 +1,157 @@
+"""
+NL-to-SQL Backends
+Pluggable SQL generation: the keyword rule engine, a local model server or a remote LLM
+(both over an OpenAI-compatible chat completions API). Model answers are cached by
+question and schema fingerprint, identical in-flight questions share one request, and a
+slow or failing model falls back to the rule engine so repeated questions never wait
+"""
+
+import json
+import os
+import re
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import streamlit as st
+
+from schema_context import build_schema_context
+from sql_validator import statement_type
+
+RESPONSE_CACHE_ENTRIES = 256
+RESPONSE_CACHE_TTL_SECONDS = 24 * 3600
+DEFAULT_TIMEOUT_SECONDS = 8          # how long a question waits for the model (NL_SQL_TIMEOUT)
+REQUEST_TIMEOUT_SECONDS = 60         # how long the model request itself may run
+MODEL_WORKERS = 4
+
+SYSTEM_PROMPT = (
+    "You write a single Amazon Athena (Trino) SQL SELECT statement answering the user's question. "
+    "Use only the tables and columns listed. Reply with the SQL only, no explanation."
+)
+
+_response_cache = OrderedDict()
+_in_flight = {}
+_backend_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=MODEL_WORKERS, thread_name_prefix='nl-sql')
+
+class ChatCompletionsBackend:
+    """Model behind an OpenAI-compatible /chat/completions endpoint (local server or remote API).
+    A backend is anything with a name and generate(question, schema_text) -> reply containing SQL"""
+
+    def __init__(self, name, base_url, model, api_key=None, timeout=REQUEST_TIMEOUT_SECONDS):
+        self.name = name
+        self.base_url = base_url.rstrip('/')
+        self.model = model
+        self.api_key = api_key
+        self.timeout = timeout
+
+    def generate(self, question, schema_text):
+        body = json.dumps({
+            'model': self.model,
+            'temperature': 0,
+            'messages': [
+                {'role': 'system', 'content': SYSTEM_PROMPT},
+                {'role': 'user', 'content': f"Tables:\n{schema_text}\n\nQuestion: {question}"}
+            ]
+        }).encode('utf-8')
+        headers = {'Content-Type': 'application/json'}
+        if self.api_key:
+            headers['Authorization'] = f"Bearer {self.api_key}"
+        request = urllib.request.Request(f"{self.base_url}/chat/completions", data=body, headers=headers)
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            reply = json.load(response)
+        return reply['choices'][0]['message']['content']
+
+def extract_sql(text):
+    """SQL from a model reply (code fences and surrounding prose removed)"""
+    fenced = re.search(r'```(?:sql)?\s*(.*?)```', text, re.DOTALL | re.IGNORECASE)
+    sql = (fenced.group(1) if fenced else text).strip()
+    start = re.search(r'\b(WITH|SELECT)\b', sql, re.IGNORECASE)
+    return sql[start.start():].strip() if start else sql
+
+def configured_backends():
+    """Model backends available from the environment, by name"""
+    backends = {}
+    if os.getenv('NL_SQL_LOCAL_URL'):
+        backends['local'] = ChatCompletionsBackend(
+            'local', os.getenv('NL_SQL_LOCAL_URL'), os.getenv('NL_SQL_LOCAL_MODEL', 'sqlcoder')
+        )
+    api_key = os.getenv('OPENAI_API_KEY', '')
+    if api_key and not api_key.startswith('your-'):
+        backends['openai'] = ChatCompletionsBackend(
+            'openai', os.getenv('OPENAI_BASE_URL', 'https://api.openai.com/v1'), os.getenv('OPENAI_MODEL', 'gpt-4o-mini'),
+            api_key=api_key
+        )
+    return backends
+
+def selected_backend():
+    """Backend picked in the sidebar (NL_SQL_BACKEND by default); None means the rule engine"""
+    return configured_backends().get(st.session_state.get('nl_backend', os.getenv('NL_SQL_BACKEND', 'rules')))
+
+def render_backend_selector():
+    """Sidebar choice of SQL generator, shown when a model backend is configured"""
+    backends = configured_backends()
+    if not backends:
+        return
+    options = ['rules'] + list(backends)
+    default = os.getenv('NL_SQL_BACKEND', 'rules')
+    st.selectbox(
+        "🧠 SQL generator:", options, index=options.index(default) if default in options else 0, key="nl_backend",
+        help="Model answers are cached per question and schema; slow answers fall back to the rule engine"
+    )
+
+def schema_fingerprint(catalog):
+    return f"{catalog['database']}:{catalog['version']}"
+
+def cache_key(backend, question, schema_key):
+    return (backend.name, ' '.join(question.lower().split()), schema_key)
+
+def cached_response(key):
+    with _backend_lock:
+        entry = _response_cache.get(key)
+        if entry and time.time() - entry[1] < RESPONSE_CACHE_TTL_SECONDS:
+            _response_cache.move_to_end(key)
+            return entry[0]
+    return None
+
+def call_backend(backend, question, prompt_schema, key):
+    """Run the model once for a key; the answer is cached if it is a usable SELECT"""
+    try:
+        sql = extract_sql(backend.generate(question, prompt_schema))
+        if statement_type(sql) not in ('SELECT', 'WITH'):
+            raise ValueError(f"{backend.name} did not return a SELECT statement")
+        with _backend_lock:
+            _response_cache[key] = (sql, time.time())
+            _response_cache.move_to_end(key)
+            while len(_response_cache) > RESPONSE_CACHE_ENTRIES:
+                _response_cache.popitem(last=False)
+        return sql
+    finally:
+        with _backend_lock:
+            _in_flight.pop(key, None)
+
+def generate_sql(question, catalog, backend, fallback, names=None, timeout=None):
+    """(sql, source) from the backend (cached, coalesced), or from fallback(question) on timeout or error.
+    A timed-out request keeps running and caches its answer for the next time the question is asked"""
+    if backend is None:
+        return fallback(question), 'rules'
+
+    key = cache_key(backend, question, schema_fingerprint(catalog))
+    sql = cached_response(key)
+    if sql:
+        return sql, f"{backend.name} (cached)"
+
+    with _backend_lock:
+        future = _in_flight.get(key)
+        if future is None:
+            future = _executor.submit(call_backend, backend, question, build_schema_context(catalog, question, names), key)
+            _in_flight[key] = future
+
+    try:
+        return future.result(timeout=timeout or float(os.getenv('NL_SQL_TIMEOUT', DEFAULT_TIMEOUT_SECONDS))), backend.name
+    except FutureTimeoutError:
+        return fallback(question), f"rules ({backend.name} timed out)"
+    except Exception as e:
+        return fallback(question), f"rules ({backend.name} failed: {e})"
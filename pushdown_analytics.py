@@ -0,0 +1,133 @@
+"""
+Push-down Analytics
+Summaries of a query result (averages by department, counts by risk level, value
+distributions) run as a follow-up aggregate query in Athena, so only the grouped rows
+come back instead of the raw result
+"""
+
+import pyarrow as pa
+import streamlit as st
+
+from query_optimizer import strip_comments, top_level_positions
+from result_store import get_result_store
+from result_viewer import render_result_pages
+
+# label, SQL template, needs a numeric column
+AGGREGATIONS = {
+    'count_distinct': ('Distinct count of', 'COUNT(DISTINCT {column})', False),
+    'sum': ('Sum of', 'SUM({column})', True),
+    'avg': ('Average of', 'AVG({column})', True),
+    'median': ('Median of', 'approx_percentile({column}, 0.5)', True),
+    'min': ('Min of', 'MIN({column})', False),
+    'max': ('Max of', 'MAX({column})', False)
+}
+ROW_COUNT = 'Row count'
+MAX_GROUP_COLUMNS = 3
+MAX_GROUPS = 1000
+MAX_CHART_GROUPS = 50
+
+def quote_identifier(name):
+    """Double-quoted SQL identifier"""
+    return '"' + name.replace('"', '""') + '"'
+
+def base_query_limit(sql):
+    """Top-level LIMIT of the base query, if any (the summary then covers only those rows)"""
+    limits = top_level_positions(strip_comments(sql), r'\bLIMIT\s+(\d+)\b')
+    return int(limits[-1].group(1)) if limits else None
+
+def measure_options(fields):
+    """Measure choices for the result's columns, as {label: (aggregation, column)}"""
+    options = {ROW_COUNT: ('count', None)}
+    for name, numeric in fields:
+        for aggregation, (label, _, needs_numeric) in AGGREGATIONS.items():
+            if numeric or not needs_numeric:
+                options[f"{label} {name}"] = (aggregation, name)
+    return options
+
+def measure_alias(aggregation, column):
+    return 'row_count' if aggregation == 'count' else f"{aggregation}_{column}"
+
+def build_aggregate_sql(base_sql, group_by, measures, bucket_widths=None, source_table=None, max_groups=MAX_GROUPS):
+    """Aggregate query over the base query (as a CTE) or over an already-exported table"""
+    bucket_widths = bucket_widths or {}
+    select_items = []
+    for column in group_by:
+        width = bucket_widths.get(column)
+        if width:
+            # Numeric distributions: group into fixed-width buckets labelled by their lower bound
+            select_items.append(f"floor({quote_identifier(column)} / {width}) * {width} AS {quote_identifier(column + '_bucket')}")
+        else:
+            select_items.append(quote_identifier(column))
+    for aggregation, column in measures:
+        expression = 'COUNT(*)' if aggregation == 'count' else AGGREGATIONS[aggregation][1].format(column=quote_identifier(column))
+        select_items.append(f"{expression} AS {quote_identifier(measure_alias(aggregation, column))}")
+
+    if source_table:
+        source = quote_identifier(source_table)
+        prefix = f"-- Push-down aggregation over exported table {source_table}\n"
+    else:
+        body = strip_comments(base_sql).strip().rstrip(';').strip()
+        source = 'base'
+        prefix = f"-- Push-down aggregation over the original query\nWITH base AS (\n{body}\n)\n"
+
+    sql = prefix + "SELECT\n    " + ",\n    ".join(select_items) + f"\nFROM {source}"
+    if group_by:
+        ordinals = ', '.join(str(i + 1) for i in range(len(group_by)))
+        sql += f"\nGROUP BY {ordinals}"
+        bucketed = any(bucket_widths.get(column) for column in group_by)
+        sql += f"\nORDER BY {ordinals}" if bucketed else f"\nORDER BY {len(group_by) + 1} DESC"
+    return sql + f"\nLIMIT {max_groups}"
+
+def result_fields(handle):
+    """(column, is_numeric) pairs of a stored result"""
+    table = get_result_store().open(handle)
+    if table is None:
+        return [(name, False) for name in handle['columns']]
+    return [
+        (field.name, pa.types.is_integer(field.type) or pa.types.is_floating(field.type) or pa.types.is_decimal(field.type))
+        for field in table.schema
+    ]
+
+def render_pushdown_analytics(base_sql, fields, run_query, key="pushdown", source_table=None):
+    """Build a breakdown, run it in Athena via run_query(sql) -> result handle, and show the grouped rows"""
+    if not base_sql or not fields:
+        return
+
+    options = measure_options(fields)
+    numeric_columns = {name for name, numeric in fields if numeric}
+
+    col1, col2 = st.columns(2)
+    with col1:
+        group_by = st.multiselect("Break down by:", [name for name, _ in fields], max_selections=MAX_GROUP_COLUMNS, key=f"{key}_group_by")
+    with col2:
+        measure_labels = st.multiselect("Measures:", list(options), default=[ROW_COUNT], key=f"{key}_measures")
+
+    bucket_widths = {}
+    for column in group_by:
+        if column in numeric_columns:
+            width = st.number_input(f"Bucket width for {column} (0 = exact values):", min_value=0.0, value=0.0, key=f"{key}_bucket_{column}")
+            if width:
+                bucket_widths[column] = f"{width:g}"
+
+    if not measure_labels:
+        st.info("Choose at least one measure.")
+        return
+
+    measures = [options[label] for label in measure_labels]
+    sql = build_aggregate_sql(base_sql, group_by, measures, bucket_widths, source_table)
+    limit = None if source_table else base_query_limit(base_sql)
+    if limit:
+        st.caption(f"ℹ️ The original query has LIMIT {limit:,}, so this summary covers those rows only.")
+    st.code(sql, language="sql")
+
+    if st.button("▶️ Run Summary in Athena", key=f"{key}_run"):
+        handle = run_query(sql)
+        if handle:
+            st.session_state[f"{key}_handle"] = handle
+
+    handle = st.session_state.get(f"{key}_handle")
+    if handle:
+        page = render_result_pages(handle, key=f"{key}_result")
+        if page is not None and len(group_by) == 1 and len(measures) == 1 and 0 < handle['num_rows'] <= MAX_CHART_GROUPS:
+            label_column = page.columns[0]
+            st.bar_chart(page.set_index(label_column)[page.columns[1]].astype(float))
@@ -0,0 +1,85 @@
+"""
+Query Coalescer
+Single-flight execution across the sessions of one server process: while a query is
+running, sessions submitting the same query (same fingerprint, account and database)
+attach to the in-flight Athena execution and share its stored result instead of
+starting executions of their own
+"""
+
+import threading
+import time
+
+import streamlit as st
+
+# A leader that never finishes (e.g. its session was closed) stops blocking new runs after this
+MAX_FLIGHT_SECONDS = 15 * 60
+FOLLOWER_WAIT_SECONDS = 10 * 60
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+class Flight:
+    """One in-flight execution; the leader fills in execution_id, status and handle"""
+
+    def __init__(self, key):
+        self.key = key
+        self.started_at = time.time()
+        self.execution_id = None
+        self.status = None
+        self.handle = None
+        self.followers = 0
+        self.done = threading.Event()
+
+def join_or_start(key):
+    """(flight, is_leader): the running flight for key, or a new one the caller must run and finish"""
+    with _flights_lock:
+        flight = _flights.get(key)
+        if flight and not flight.done.is_set() and time.time() - flight.started_at < MAX_FLIGHT_SECONDS:
+            flight.followers += 1
+            return flight, False
+        flight = Flight(key)
+        _flights[key] = flight
+        return flight, True
+
+def finish_flight(flight):
+    """Release followers with whatever the leader recorded (status None means it gave up)"""
+    with _flights_lock:
+        if _flights.get(flight.key) is flight:
+            del _flights[flight.key]
+    flight.done.set()
+
+def wait_for_flight(flight, timeout=FOLLOWER_WAIT_SECONDS):
+    """(status, handle) of a flight once its leader finishes; status None on timeout or if the leader gave up"""
+    if not flight.done.wait(timeout):
+        return None, None
+    return flight.status, flight.handle
+
+def flight_stats():
+    """Executions in flight and the sessions waiting on them"""
+    with _flights_lock:
+        return {
+            'running': len(_flights),
+            'followers': sum(flight.followers for flight in _flights.values())
+        }
+
+def follow_flight(flight, sql_query, summary=False):
+    """Wait for the leader's execution and use its result; summary runs just get the handle back"""
+    running = f" (execution {flight.execution_id})" if flight.execution_id else ""
+    st.info(f"🤝 An identical query is already running{running}; sharing its result instead of starting another execution.")
+    with st.spinner("⏳ Waiting for the shared execution..."):
+        status, handle = wait_for_flight(flight)
+
+    if handle:
+        if not summary:
+            st.session_state.query_result = handle
+            st.session_state.query_result_sql = sql_query
+            st.session_state.query_execution_id = flight.execution_id
+            st.success(f"✅ Query completed! {handle['num_rows']:,} rows returned (shared execution).")
+        return handle
+    if status == 'SUCCEEDED':
+        st.info("Query executed successfully but returned no results.")
+    elif status in (None, 'QUEUED', 'RUNNING'):
+        st.warning("⚠️ The shared execution did not finish in time. Run the query again to start a new one.")
+    else:
+        st.error(f"❌ The shared execution {status.lower()}. Please check your SQL and try again.")
+    return None
@@ -0,0 +1,132 @@
+"""
+Query History Store
+Execution statistics (bytes scanned, engine time) for every query the apps run,
+used to calibrate cost estimates and track usage
+"""
+
+import json
+import os
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from sql_fingerprint import fingerprint, shape_fingerprint
+
+QUERY_HISTORY_FILE = 'query_history.json'
+MAX_HISTORY_ENTRIES = 1000
+
+# Sessions, fan-out workers and background refinements all append to the same file
+_history_lock = threading.Lock()
+
+def read_query_history(path=QUERY_HISTORY_FILE):
+    """Executed-query history from file ([] if there is none yet); raises if the file cannot be parsed"""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+def load_query_history(path=QUERY_HISTORY_FILE):
+    """Load executed-query history from file (empty if it cannot be read)"""
+    try:
+        return read_query_history(path)
+    except Exception:
+        return []
+
+def save_query_history(history, path=QUERY_HISTORY_FILE):
+    """Save executed-query history atomically, keeping only the most recent entries"""
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temp_path, 'w') as f:
+            json.dump(history[-MAX_HISTORY_ENTRIES:], f, indent=2)
+        # Readers see either the old or the new file, never a partly written one
+        os.replace(temp_path, path)
+        return True
+    except Exception:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        return False
+
+def execution_statistics(athena_client, query_execution_id):
+    """Read state and Statistics for a finished Athena query execution"""
+    response = athena_client.get_query_execution(QueryExecutionId=query_execution_id)
+    execution = response['QueryExecution']
+    statistics = execution.get('Statistics', {})
+    return {
+        'execution_id': query_execution_id,
+        'state': execution['Status']['State'],
+        'workgroup': execution.get('WorkGroup', ''),
+        'database': execution.get('QueryExecutionContext', {}).get('Database', ''),
+        'data_scanned_bytes': statistics.get('DataScannedInBytes', 0),
+        'engine_ms': statistics.get('EngineExecutionTimeInMillis', 0),
+        'total_ms': statistics.get('TotalExecutionTimeInMillis', 0),
+        'queue_ms': statistics.get('QueryQueueTimeInMillis', 0)
+    }
+
+def record_execution(athena_client, query_execution_id, sql, account_id='', estimate=None, user='', question='', database='',
+                     path=QUERY_HISTORY_FILE):
+    """Append a finished execution's statistics (the pre-execution estimate and the question it answers) to the history.
+    database defaults to the execution's query context, which queries using qualified names may not set"""
+    entry = execution_statistics(athena_client, query_execution_id)
+    if database:
+        entry['database'] = database
+    entry.update({
+        'sql': sql,
+        'fingerprint': fingerprint(sql),
+        'shape': shape_fingerprint(sql),
+        'account_id': account_id,
+        'user': user,
+        'question': question,
+        'estimated_bytes': estimate['bytes'] if estimate else None,
+        'estimated_raw_bytes': estimate.get('raw_bytes') if estimate else None,
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    })
+
+    with _history_lock:
+        try:
+            history = read_query_history(path)
+        except Exception:
+            # An unreadable history is left for inspection rather than replaced by this one entry
+            return entry
+        history.append(entry)
+        save_query_history(history, path)
+    return entry
+
+def entry_fingerprints(entry):
+    """(fingerprint, shape) of a history entry (computed for entries recorded before fingerprints)"""
+    sql = entry.get('sql', '')
+    return entry.get('fingerprint') or fingerprint(sql), entry.get('shape') or shape_fingerprint(sql)
+
+def distinct_queries(history):
+    """One entry per distinct query (the latest run), with how often it ran; newest first"""
+    latest = {}
+    for entry in history:
+        key = entry_fingerprints(entry)[0]
+        runs = latest[key]['runs'] + 1 if key in latest else 1
+        latest[key] = dict(entry, runs=runs)
+    return sorted(latest.values(), key=lambda entry: entry.get('timestamp', ''), reverse=True)
+
+def latency_by_fingerprint(history, by='shape'):
+    """Engine time percentiles and bytes per fingerprint ('fingerprint' or 'shape') over succeeded runs"""
+    groups = {}
+    for entry in history:
+        if entry.get('state') != 'SUCCEEDED':
+            continue
+        query_fingerprint, shape = entry_fingerprints(entry)
+        groups.setdefault(shape if by == 'shape' else query_fingerprint, []).append(entry)
+
+    stats = {}
+    for key, entries in groups.items():
+        engine_ms = np.array([entry.get('engine_ms') or 0 for entry in entries], dtype=float)
+        stats[key] = {
+            'runs': len(entries),
+            'p50_ms': float(np.percentile(engine_ms, 50)),
+            'p95_ms': float(np.percentile(engine_ms, 95)),
+            'avg_bytes': float(np.mean([entry.get('data_scanned_bytes') or 0 for entry in entries])),
+            'last_sql': entries[-1].get('sql', ''),
+            'last_run': entries[-1].get('timestamp', '')
+        }
+    return stats
@@ -0,0 +1,459 @@
+"""
+Query Optimizer for Generated SQL
+Rewrites generated Athena SQL so it reads less data: partition predicates derived
+from the question, plus full-scan warnings
+"""
+
+import re
+from datetime import date, timedelta
+
+from glue_catalog import get_table_info
+
+FULL_SCAN_MARKER = "-- ⚠️ Full scan:"
+PARTITION_MARKER = "-- Partition filter:"
+PROJECTION_MARKER = "-- Projection:"
+
+SQL_KEYWORDS = {
+    'where', 'group', 'order', 'limit', 'join', 'inner', 'left', 'right', 'full', 'cross',
+    'on', 'using', 'union', 'having', 'tablesample', 'as', 'with', 'select', 'from'
+}
+
+# Java date formats used by partition projection -> strftime
+PROJECTION_FORMATS = [('yyyy', '%Y'), ('MM', '%m'), ('dd', '%d'), ('HH', '%H')]
+
+UNIT_DAYS = {'day': 1, 'week': 7, 'month': 30, 'year': 365}
+
+# Columns each question intent needs (matched case-insensitively against the catalog)
+INTENT_KEYWORDS = {
+    'renewal': ['renewal', 'renew', 'expiring', 'expire'],
+    'risk': ['risk'],
+    'compliance': ['compliance', 'compliant'],
+    'performance': ['performance', 'score', 'sla'],
+    'executive': ['executive', 'dashboard', 'overview'],
+    'value': ['value', 'spend', 'balance', 'cost'],
+    'department': ['department', 'owner', 'team'],
+    'sales': ['sales', 'revenue', 'transaction']
+}
+
+INTENT_COLUMNS = {
+    'renewal': ['contract_id', 'contract_name', 'vendor', 'end_date', 'value', 'auto_renewal', 'contract_owner'],
+    'risk': ['contract_id', 'contract_name', 'risk_level', 'compliance_status', 'performance_score', 'department'],
+    'compliance': ['contract_id', 'contract_name', 'compliance_status', 'risk_level', 'sla_score', 'kpi_met'],
+    'performance': ['contract_id', 'contract_name', 'performance_score', 'sla_score', 'department'],
+    'executive': ['contract_id', 'contract_name', 'vendor', 'value', 'status', 'end_date', 'department'],
+    'value': ['contract_id', 'contract_name', 'value', 'outstanding_balance'],
+    'department': ['department', 'contract_owner'],
+    'sales': ['transaction_id', 'customer_id', 'product_id', 'sales_amount', 'transaction_date', 'region']
+}
+
+# Rough encoded width per value, used to compare projected vs SELECT * scan size
+TYPE_WIDTHS = {
+    'boolean': 1, 'tinyint': 1, 'smallint': 2, 'int': 4, 'integer': 4, 'bigint': 8,
+    'float': 4, 'double': 8, 'decimal': 8, 'date': 4, 'timestamp': 8, 'string': 24, 'varchar': 24
+}
+
+def strip_comments(sql):
+    """Remove -- line comments and /* */ block comments (outside string literals)"""
+    result = []
+    i = 0
+    in_string = False
+    while i < len(sql):
+        ch = sql[i]
+        if in_string:
+            result.append(ch)
+            if ch == "'":
+                in_string = False
+            i += 1
+        elif ch == "'":
+            in_string = True
+            result.append(ch)
+            i += 1
+        elif sql.startswith('--', i):
+            end = sql.find('\n', i)
+            i = len(sql) if end == -1 else end
+        elif sql.startswith('/*', i):
+            end = sql.find('*/', i + 2)
+            i = len(sql) if end == -1 else end + 2
+        else:
+            result.append(ch)
+            i += 1
+    return ''.join(result)
+
+def top_level_positions(sql, pattern):
+    """Positions of a keyword regex that are outside parentheses, strings and comments"""
+    code_mask = []
+    depth = 0
+    i = 0
+    in_string = False
+    while i < len(sql):
+        ch = sql[i]
+        if in_string:
+            code_mask.append(False)
+            if ch == "'":
+                in_string = False
+            i += 1
+            continue
+        if ch == "'":
+            in_string = True
+            code_mask.append(False)
+            i += 1
+            continue
+        if sql.startswith('--', i):
+            end = sql.find('\n', i)
+            end = len(sql) if end == -1 else end
+            code_mask.extend([False] * (end - i))
+            i = end
+            continue
+        if ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth -= 1
+        code_mask.append(depth == 0 and ch != ')')
+        i += 1
+
+    return [
+        match for match in re.finditer(pattern, sql, re.IGNORECASE)
+        if code_mask[match.start()]
+    ]
+
+def split_header(sql):
+    """Split leading comment lines (the generator's header) from the query body"""
+    lines = sql.split('\n')
+    header_end = 0
+    while header_end < len(lines) and (not lines[header_end].strip() or lines[header_end].strip().startswith('--')):
+        header_end += 1
+    return lines[:header_end], '\n'.join(lines[header_end:])
+
+def add_header_notes(sql, notes):
+    """Append comment lines to the generator's header block"""
+    if not notes:
+        return sql
+    header, body = split_header(sql)
+    return '\n'.join(header + notes) + '\n' + body
+
+def is_simple_select(sql):
+    """True for a single SELECT without CTEs, subqueries or set operations"""
+    code = strip_comments(sql).strip().upper()
+    return (
+        code.startswith('SELECT')
+        and len(re.findall(r'\bSELECT\b', code)) == 1
+        and not re.search(r'\b(UNION|INTERSECT|EXCEPT)\b', code)
+    )
+
+def find_table_references(sql):
+    """Tables referenced after FROM/JOIN as dicts with name, database and alias"""
+    code = strip_comments(sql)
+    pattern = (
+        r'\b(?:FROM|JOIN)\s+'
+        r'(?:("[^"]+"|\w+)\.)?'          # optional database
+        r'("[^"]+"|\w+)'                  # table
+        r'(?:\s+(?:AS\s+)?(\w+))?'        # optional alias
+    )
+    references = []
+    for match in re.finditer(pattern, code, re.IGNORECASE):
+        alias = match.group(3)
+        if alias and alias.lower() in SQL_KEYWORDS:
+            alias = None
+        references.append({
+            'database': (match.group(1) or '').strip('"'),
+            'name': match.group(2).strip('"'),
+            'alias': alias
+        })
+    return references
+
+def add_where_conditions(sql, conditions):
+    """AND extra conditions into the top-level WHERE clause of a simple SELECT"""
+    if not conditions:
+        return sql
+
+    header, body = split_header(sql)
+    body = body.rstrip()
+    terminator = ''
+    if body.endswith(';'):
+        body = body[:-1].rstrip()
+        terminator = ';'
+
+    clause_matches = top_level_positions(body, r'\b(GROUP\s+BY|HAVING|ORDER\s+BY|LIMIT)\b')
+    where_matches = top_level_positions(body, r'\bWHERE\b')
+    clause_start = clause_matches[0].start() if clause_matches else len(body)
+
+    if where_matches:
+        where = where_matches[0]
+        existing = body[where.end():clause_start].strip()
+        if top_level_positions(existing, r'\bOR\b'):
+            existing = f"(\n    {existing}\n)"
+        new_where = f"WHERE {existing}\n" + "".join(f"  AND {cond}\n" for cond in conditions)
+        body = body[:where.start()] + new_where + body[clause_start:]
+    else:
+        new_where = f"WHERE {conditions[0]}\n" + "".join(f"  AND {cond}\n" for cond in conditions[1:])
+        prefix = body[:clause_start].rstrip() + '\n'
+        body = prefix + new_where + body[clause_start:]
+
+    return '\n'.join(header) + ('\n' if header else '') + body.rstrip() + terminator
+
+def quarter_bounds(year, quarter):
+    """First and last day of a calendar quarter"""
+    start = date(year, 3 * (quarter - 1) + 1, 1)
+    end_month = start.month + 2
+    next_month = date(year + (end_month // 12), end_month % 12 + 1, 1)
+    return start, next_month - timedelta(days=1)
+
+def month_bounds(year, month):
+    """First and last day of a calendar month"""
+    start = date(year, month, 1)
+    next_month = date(year + (month // 12), month % 12 + 1, 1)
+    return start, next_month - timedelta(days=1)
+
+def parse_time_window(question, today=None):
+    """Derive a (start, end, label) date range from phrases like 'next 30 days' or 'last quarter'"""
+    today = today or date.today()
+    text = question.lower()
+
+    match = re.search(r'\b(next|coming|upcoming)\s+(\d+)\s+(day|week|month|year)s?\b', text)
+    if match:
+        days = int(match.group(2)) * UNIT_DAYS[match.group(3)]
+        return today, today + timedelta(days=days), match.group(0)
+
+    match = re.search(r'\b(last|past|previous)\s+(\d+)\s+(day|week|month|year)s?\b', text)
+    if match:
+        days = int(match.group(2)) * UNIT_DAYS[match.group(3)]
+        return today - timedelta(days=days), today, match.group(0)
+
+    current_quarter = (today.month - 1) // 3 + 1
+    if re.search(r'\b(last|previous)\s+quarter\b', text):
+        year, quarter = (today.year, current_quarter - 1) if current_quarter > 1 else (today.year - 1, 4)
+        return (*quarter_bounds(year, quarter), 'last quarter')
+    if re.search(r'\b(this|current)\s+quarter\b', text):
+        return (*quarter_bounds(today.year, current_quarter), 'this quarter')
+    if re.search(r'\bnext\s+quarter\b', text):
+        year, quarter = (today.year, current_quarter + 1) if current_quarter < 4 else (today.year + 1, 1)
+        return (*quarter_bounds(year, quarter), 'next quarter')
+
+    match = re.search(r'\bq([1-4])\s*(\d{4})\b', text)
+    if match:
+        return (*quarter_bounds(int(match.group(2)), int(match.group(1))), match.group(0))
+
+    if re.search(r'\b(last|previous)\s+month\b', text):
+        year, month = (today.year, today.month - 1) if today.month > 1 else (today.year - 1, 12)
+        return (*month_bounds(year, month), 'last month')
+    if re.search(r'\b(this|current)\s+month\b', text):
+        return (*month_bounds(today.year, today.month), 'this month')
+    if re.search(r'\bnext\s+month\b', text):
+        year, month = (today.year, today.month + 1) if today.month < 12 else (today.year + 1, 1)
+        return (*month_bounds(year, month), 'next month')
+
+    if re.search(r'\b(year to date|ytd)\b', text):
+        return date(today.year, 1, 1), today, 'year to date'
+    if re.search(r'\b(last|previous)\s+year\b', text):
+        return date(today.year - 1, 1, 1), date(today.year - 1, 12, 31), 'last year'
+    if re.search(r'\b(this|current)\s+year\b', text):
+        return date(today.year, 1, 1), date(today.year, 12, 31), 'this year'
+
+    match = re.search(r'\b(?:in|during|for)\s+(20\d{2})\b', text)
+    if match:
+        year = int(match.group(1))
+        return date(year, 1, 1), date(year, 12, 31), match.group(0)
+
+    return None
+
+def partition_date_format(table_info, key):
+    """strftime format for a string date partition, from projection settings or the key name"""
+    java_format = table_info['parameters'].get(f"projection.{key['name']}.format")
+    if java_format:
+        python_format = java_format
+        for java, python in PROJECTION_FORMATS:
+            python_format = python_format.replace(java, python)
+        return python_format
+
+    name = key['name'].lower()
+    if name in ('year', 'yr'):
+        return '%Y'
+    if 'month' in name:
+        return '%Y-%m'
+    if name in ('dt', 'date', 'day', 'ds') or name.endswith('_date') or name.endswith('_day'):
+        return '%Y-%m-%d'
+    return None
+
+def temporal_predicate(table_info, key, column, window):
+    """Range predicate on a date-like partition key, or None if the key is not temporal"""
+    start, end, _ = window
+    key_type = key['type'].lower()
+
+    if key_type == 'date':
+        return f"{column} BETWEEN DATE '{start.isoformat()}' AND DATE '{end.isoformat()}'"
+    if key_type.startswith('timestamp'):
+        return f"{column} BETWEEN TIMESTAMP '{start.isoformat()} 00:00:00' AND TIMESTAMP '{end.isoformat()} 23:59:59'"
+    if key_type in ('int', 'bigint', 'smallint') and key['name'].lower() in ('year', 'yr'):
+        return f"{column} BETWEEN {start.year} AND {end.year}"
+    if key_type in ('string', 'varchar') or key_type.startswith('varchar'):
+        date_format = partition_date_format(table_info, key)
+        if date_format:
+            return f"{column} BETWEEN '{start.strftime(date_format)}' AND '{end.strftime(date_format)}'"
+    return None
+
+def enum_predicate(table_info, key, column, question):
+    """Equality predicate when exactly one known partition value is named in the question"""
+    values = table_info['parameters'].get(f"projection.{key['name']}.values", '')
+    if not values:
+        return None
+    text = question.lower()
+    matches = [
+        value for value in values.split(',')
+        if value and re.search(r'\b' + re.escape(value.lower()) + r'\b', text)
+    ]
+    if len(matches) != 1:
+        return None
+    return f"{column} = '{matches[0]}'"
+
+def filter_clauses(sql):
+    """Text of every WHERE and JOIN ... ON condition in the query (comments removed)"""
+    pattern = r'\b(?:WHERE|ON)\b(.*?)(?=\b(?:GROUP\s+BY|ORDER\s+BY|LIMIT|HAVING|UNION|JOIN|INNER|LEFT|RIGHT)\b|$)'
+    return ' '.join(re.findall(pattern, strip_comments(sql), re.IGNORECASE | re.DOTALL))
+
+def is_filtered_on(sql, column_name):
+    """True if a WHERE or ON condition mentions the column"""
+    return re.search(r'\b' + re.escape(column_name) + r'\b', filter_clauses(sql), re.IGNORECASE) is not None
+
+def apply_partition_pruning(sql, question, catalog, today=None):
+    """Inject partition predicates derived from the question and flag full scans"""
+    if not catalog:
+        return sql
+
+    window = parse_time_window(question, today)
+    notes = []
+    conditions = []
+    simple = is_simple_select(sql)
+
+    for ref in find_table_references(sql):
+        table_info = get_table_info(catalog, ref['name'])
+        if not table_info or table_info['is_view']:
+            continue
+
+        keys = table_info['partition_keys']
+        if not keys:
+            notes.append(f"{FULL_SCAN_MARKER} {table_info['name']} is not partitioned")
+            continue
+
+        filtered = [k['name'] for k in keys if is_filtered_on(sql, k['name'])]
+        if simple:
+            for key in keys:
+                if key['name'] in filtered:
+                    continue
+                column = f"{ref['alias']}.{key['name']}" if ref['alias'] else key['name']
+                predicate = None
+                if window:
+                    predicate = temporal_predicate(table_info, key, column, window)
+                if not predicate:
+                    predicate = enum_predicate(table_info, key, column, question)
+                if predicate:
+                    conditions.append(predicate)
+                    filtered.append(key['name'])
+                    notes.append(f"{PARTITION_MARKER} {predicate}")
+
+        if not filtered:
+            key_names = ', '.join(k['name'] for k in keys)
+            notes.append(f"{FULL_SCAN_MARKER} {table_info['name']} is partitioned by {key_names} but no partition filter applies")
+
+    if conditions:
+        sql = add_where_conditions(sql, conditions)
+    return add_header_notes(sql, notes)
+
+def detect_intents(question):
+    """Intents named in the question, in INTENT_KEYWORDS order"""
+    text = question.lower()
+    return [
+        intent for intent, keywords in INTENT_KEYWORDS.items()
+        if any(re.search(r'\b' + keyword, text) for keyword in keywords)
+    ]
+
+def column_width(column_type):
+    """Estimated bytes per value for a Glue column type"""
+    base_type = re.split(r'[(<]', column_type.lower(), maxsplit=1)[0].strip()
+    return TYPE_WIDTHS.get(base_type, 32)  # arrays, maps, structs: assume wide
+
+def estimate_scan_fraction(table_info, column_names):
+    """Fraction of a SELECT * scan that reading only column_names would cost"""
+    if table_info['format'] in ('text', 'json'):
+        return 1.0  # row formats read whole rows regardless of projection
+    widths = {c['name'].lower(): column_width(c['type']) for c in table_info['columns']}
+    total = sum(widths.values())
+    if not total:
+        return 1.0
+    selected = sum(widths.get(name.lower(), 0) for name in column_names)
+    return selected / total
+
+def select_columns_for_question(question, table_info, default_columns=None, sql=''):
+    """Columns to project for a question: configured defaults + intent columns + sort columns"""
+    available = {c['name'].lower(): c['name'] for c in table_info['columns'] + table_info['partition_keys']}
+    wanted = list((default_columns or {}).get(table_info['name'], []))
+    for intent in detect_intents(question):
+        wanted.extend(INTENT_COLUMNS[intent])
+
+    order_by = re.search(r'\bORDER\s+BY\b(.*?)(?:\bLIMIT\b|;|$)', strip_comments(sql), re.IGNORECASE | re.DOTALL)
+    if order_by:
+        wanted.extend(re.findall(r'(\w+)\s*(?:ASC|DESC)?\s*(?:,|$)', order_by.group(1).strip(), re.IGNORECASE))
+
+    selected = []
+    for name in wanted:
+        column = available.get(name.lower())
+        if column and column not in selected:
+            selected.append(column)
+    return selected
+
+def apply_projection_pruning(sql, question, catalog, default_columns=None):
+    """Replace SELECT * with the columns the question needs and note the estimated scan reduction"""
+    if not catalog or not is_simple_select(sql):
+        return sql
+
+    header, body = split_header(sql)
+    star = re.match(r'\s*SELECT\s+\*\s*\n?', body, re.IGNORECASE)
+    references = find_table_references(sql)
+    if not star or len(references) != 1:
+        return sql
+
+    table_info = get_table_info(catalog, references[0]['name'])
+    if not table_info or not table_info['columns']:
+        return sql
+
+    columns = select_columns_for_question(question, table_info, default_columns, sql)
+    total_columns = len(table_info['columns']) + len(table_info['partition_keys'])
+    if not columns or len(columns) >= total_columns:
+        return sql
+
+    fraction = estimate_scan_fraction(table_info, columns)
+    if table_info['format'] in ('text', 'json'):
+        note = f"{PROJECTION_MARKER} {len(columns)} of {total_columns} columns (no scan reduction: {table_info['name']} is stored as {table_info['format']})"
+    else:
+        note = f"{PROJECTION_MARKER} {len(columns)} of {total_columns} columns (~{(1 - fraction) * 100:.0f}% less data scanned than SELECT *)"
+
+    select_list = "SELECT\n    " + ",\n    ".join(columns) + "\n"
+    body = select_list + body[star.end():]
+    return '\n'.join(header + [note]) + '\n' + body
+
+def add_table_sample(sql, table_name, percent, method='SYSTEM'):
+    """Add TABLESAMPLE to every reference of table_name (SYSTEM skips whole splits, so it scans less)"""
+    pattern = (
+        r'(\b(?:FROM|JOIN)\s+(?:(?:"[^"]+"|\w+)\.)?"?' + re.escape(table_name) + r'"?(?![\w"])'
+        r'(?:\s+(?:AS\s+)?(?!(?:' + '|'.join(SQL_KEYWORDS) + r')\b)\w+)?)'
+    )
+    percent = max(min(percent, 100.0), 0.01)
+    return re.sub(pattern, lambda m: f"{m.group(1)} TABLESAMPLE {method} ({percent:g})", sql, flags=re.IGNORECASE)
+
+def add_limit(sql, max_rows):
+    """Add a LIMIT to a query without one, or tighten an existing larger LIMIT"""
+    header, body = split_header(sql)
+    body = body.rstrip()
+    terminator = ''
+    if body.endswith(';'):
+        body = body[:-1].rstrip()
+        terminator = ';'
+
+    limits = top_level_positions(body, r'\bLIMIT\s+(\d+)\b')
+    if limits:
+        limit = limits[-1]
+        if int(limit.group(1)) <= max_rows:
+            return sql
+        body = body[:limit.start()] + f"LIMIT {max_rows}" + body[limit.end():]
+    else:
+        body = f"{body}\nLIMIT {max_rows}"
+    return '\n'.join(header) + ('\n' if header else '') + body + terminator
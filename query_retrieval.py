@@ -0,0 +1,116 @@
+"""
+Query Retrieval
+Finds an earlier question close enough to the new one to reuse its SQL (and its stored
+result while that is still fresh) instead of generating from scratch. Questions are
+embedded locally as hashed word and character n-gram vectors; the vectors of saved
+templates and past successful runs sit in one float32 matrix, searched with a single
+matrix-vector product. Similar wording is not enough to reuse: the two questions must
+also share the same content words (negations, regions, statuses) and numbers
+"""
+
+import re
+import threading
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+from table_index import tokenize
+
+EMBEDDING_DIM = 1024
+CHAR_NGRAMS = (3, 4, 5)
+SIMILARITY_THRESHOLD = 0.9
+RETRIEVAL_INDEX_ENTRIES = 4
+
+_retrieval_indexes = OrderedDict()
+_retrieval_index_lock = threading.Lock()
+
+def question_words(question):
+    return re.findall(r'[a-z0-9]+', (question or '').lower())
+
+def question_numbers(question):
+    """Numbers in a question (top 10 vs top 20 must not match each other)"""
+    return tuple(sorted(re.findall(r'\d+(?:\.\d+)?', question or '')))
+
+def content_words(question):
+    """Stemmed non-stopwords of a question; 'not', 'west' and 'east' all count, 'show me all' does not"""
+    return frozenset(tokenize(question))
+
+def embed_question(question):
+    """L2-normalized hashed n-gram vector: words, word bigrams and character 3-5 grams, signed hashing"""
+    words = question_words(question)
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    text = f" {' '.join(words)} "
+    for n in CHAR_NGRAMS:
+        features += [text[i:i + n] for i in range(len(text) - n + 1)]
+
+    vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    if not features:
+        return vector
+    hashes = np.fromiter((zlib.crc32(feature.encode('utf-8')) for feature in features), dtype=np.uint32, count=len(features))
+    signs = np.where(hashes & np.uint32(1 << 31), -1.0, 1.0).astype(np.float32)
+    np.add.at(vector, (hashes % EMBEDDING_DIM).astype(np.int64), signs)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+def retrieval_candidates(saved_queries, history):
+    """(question, sql, source, timestamp) for saved templates and successful runs with a question; latest per question"""
+    latest = {}
+    for item in saved_queries:
+        if item.get('question') and item.get('sql'):
+            latest[' '.join(question_words(item['question']))] = (item['question'], item['sql'], 'saved template', item.get('timestamp', ''))
+    for entry in history:
+        if entry.get('question') and entry.get('state') == 'SUCCEEDED':
+            latest[' '.join(question_words(entry['question']))] = (entry['question'], entry['sql'], 'query history', entry.get('timestamp', ''))
+    return list(latest.values())
+
+def build_retrieval_index(candidates):
+    """Embedding matrix (one row per candidate question) plus the candidates and their numbers"""
+    matrix = np.zeros((len(candidates), EMBEDDING_DIM), dtype=np.float32)
+    for row, candidate in enumerate(candidates):
+        matrix[row] = embed_question(candidate[0])
+    return {
+        'matrix': matrix,
+        'candidates': candidates,
+        'numbers': [question_numbers(candidate[0]) for candidate in candidates],
+        'content': [content_words(candidate[0]) for candidate in candidates]
+    }
+
+def get_retrieval_index(saved_queries, history):
+    """build_retrieval_index, cached until the saved queries or the history change"""
+    key = (
+        len(saved_queries), saved_queries[-1].get('timestamp', '') if saved_queries else '',
+        len(history), history[-1].get('timestamp', '') if history else ''
+    )
+    with _retrieval_index_lock:
+        if key in _retrieval_indexes:
+            _retrieval_indexes.move_to_end(key)
+            return _retrieval_indexes[key]
+
+    index = build_retrieval_index(retrieval_candidates(saved_queries, history))
+    with _retrieval_index_lock:
+        _retrieval_indexes[key] = index
+        while len(_retrieval_indexes) > RETRIEVAL_INDEX_ENTRIES:
+            _retrieval_indexes.popitem(last=False)
+    return index
+
+def find_similar_question(index, question, threshold=SIMILARITY_THRESHOLD):
+    """Best prior match at or above the cosine threshold with the same numbers and content words, or None"""
+    if not len(index['candidates']):
+        return None
+    similarities = index['matrix'] @ embed_question(question)
+    numbers = question_numbers(question)
+    content = content_words(question)
+    for row in np.argsort(similarities)[::-1][:5]:
+        if similarities[row] < threshold:
+            break
+        if index['numbers'][row] == numbers and index['content'][row] == content:
+            prior_question, sql, source, timestamp = index['candidates'][row]
+            return {
+                'question': prior_question,
+                'sql': sql,
+                'source': source,
+                'timestamp': timestamp,
+                'similarity': float(similarities[row])
+            }
+    return None
@@ -0,0 +1,249 @@
+"""
+Query Templates
+Saved queries with typed parameters instead of baked-in literals (thresholds, day
+windows, department names). A template is parsed once, when it is saved; running it
+executes an Athena prepared statement with ExecutionParameters, so every variant is the
+same statement and rendering never touches the SQL parser again
+"""
+
+import re
+import threading
+from datetime import date, datetime
+
+import streamlit as st
+
+from query_optimizer import split_header, strip_comments
+from sql_fingerprint import TOKEN_PATTERN, fingerprint
+from sql_validator import statement_type
+
+STATEMENT_PREFIX = 'tpl_'
+
+# Literals in these positions become parameters; elsewhere (CASE labels, date_add units,
+# LIMIT) they stay part of the statement
+COMPARISON_OPERATORS = {'=', '<>', '!=', '<', '>', '<=', '>='}
+FILTER_CLAUSES = {'where', 'having', 'on'}
+CLAUSE_KEYWORDS = {'select', 'from', 'where', 'group', 'having', 'order', 'limit', 'on', 'join', 'union'}
+TYPED_PREFIXES = {'date', 'timestamp'}
+# A '-' after these is a sign (date_add('day', -30, ...), x > -5), not a subtraction
+UNARY_CONTEXT = {'and', 'or', 'not', 'between', 'then', 'else', 'when'}
+
+# (account, workgroup, statement name) known to exist, so each is created once per process
+_prepared_statements = set()
+_prepared_statements_lock = threading.Lock()
+
+def literal_type(kind, text, typed_prefix=None):
+    """Athena type of a literal token"""
+    if typed_prefix in TYPED_PREFIXES:
+        return typed_prefix
+    if kind == 'string':
+        return 'varchar'
+    return 'integer' if re.fullmatch(r'-?\d+', text) else 'double'
+
+def literal_value(kind, text, parameter_type):
+    """JSON-friendly value of a literal token (dates as ISO strings)"""
+    if kind == 'string':
+        text = text[1:-1].replace("''", "'")
+    if parameter_type == 'integer':
+        return int(text)
+    if parameter_type == 'double':
+        return float(text)
+    if parameter_type == 'date':
+        return date.fromisoformat(text).isoformat()
+    if parameter_type == 'timestamp':
+        return timestamp_text(text)
+    return text
+
+def timestamp_text(value):
+    """Athena timestamp text ('2024-01-31 12:00:00[.000]') of a datetime or ISO string; raises ValueError if invalid"""
+    value = value if isinstance(value, datetime) else datetime.fromisoformat(str(value).strip())
+    return value.isoformat(sep=' ', timespec='milliseconds' if value.microsecond else 'seconds')
+
+def parameter_name(previous_words, used):
+    """Name from the column the literal is compared with (risk_level, performance_score_2, ...)"""
+    base = next((word for word in reversed(previous_words) if word not in CLAUSE_KEYWORDS | {'and', 'or', 'not', 'between', 'in'} | TYPED_PREFIXES), 'value')
+    base = re.sub(r'\W', '_', base.split('.')[-1]).lower() or 'value'
+    name = base
+    suffix = 2
+    while name in used:
+        name = f"{base}_{suffix}"
+        suffix += 1
+    used.add(name)
+    return name
+
+def is_unary_context(token):
+    """True when a '-' following this token is a sign rather than a subtraction"""
+    if token.lastgroup == 'operator':
+        return token.group() != ')'
+    return token.lastgroup == 'word' and token.group().lower() in UNARY_CONTEXT | CLAUSE_KEYWORDS
+
+def make_template(sql, question='', name=None):
+    """Template dict for a query: statement with ? placeholders, the SQL pieces between them and typed parameters"""
+    header, body = split_header(sql)
+    code = strip_comments(body).strip().rstrip(';').strip()
+    template = {
+        'name': name or question or 'Unnamed Template',
+        'question': question,
+        'sql': sql,
+        'header': header,
+        'statement': code,
+        'segments': [code],
+        'parameters': []
+    }
+    if statement_type(sql) not in ('SELECT', 'WITH'):
+        return template
+
+    matches = list(TOKEN_PATTERN.finditer(code))
+    clause = None
+    in_list = False
+    between = False
+    used = set()
+    words = []
+    segments = []
+    parameters = []
+    position = 0
+    for i, match in enumerate(matches):
+        kind = match.lastgroup
+        text = match.group()
+        lowered = text.lower()
+        previous = matches[i - 1].group().lower() if i else ''
+        if kind == 'word' and lowered in CLAUSE_KEYWORDS:
+            clause = lowered
+        if kind in ('word', 'quoted'):
+            words = (words + [lowered.strip('"')])[-4:]
+            between = lowered == 'between' or (between and lowered == 'and')
+        if text == '(':
+            in_list = previous == 'in'
+        elif text == ')':
+            in_list = False
+        if kind not in ('string', 'number') or clause not in FILTER_CLAUSES:
+            continue
+
+        # A signed number: the sign belongs to the literal and the token before it decides its position
+        signed = kind == 'number' and previous == '-' and i >= 2 and is_unary_context(matches[i - 2])
+        first = i - 1 if signed else i
+        if signed:
+            previous = matches[first - 1].group().lower()
+            text = '-' + text
+
+        typed_prefix = previous if previous in TYPED_PREFIXES and kind == 'string' else None
+        date_add_unit = None
+        if previous == ',' and first >= 4 and matches[first - 4].group().lower() == 'date_add' and matches[first - 2].lastgroup == 'string':
+            date_add_unit = matches[first - 2].group().strip("'").lower()
+        if not (previous in COMPARISON_OPERATORS or typed_prefix or date_add_unit
+                or (between and previous in ('between', 'and'))
+                or (in_list and previous in ('(', ','))):
+            continue
+
+        start = matches[i - 1].start() if typed_prefix or signed else match.start()
+        parameter_type = literal_type(kind, text, typed_prefix)
+        segments.append(code[position:start])
+        parameters.append({
+            'name': parameter_name([date_add_unit + 's'] if date_add_unit else words, used),
+            'type': parameter_type,
+            'default': literal_value(kind, text, parameter_type)
+        })
+        position = match.end()
+
+    if parameters:
+        segments.append(code[position:])
+        template['segments'] = segments
+        template['statement'] = '?'.join(segments)
+        template['parameters'] = parameters
+    return template
+
+def format_literal(value, parameter_type):
+    """SQL literal for a parameter value, as Athena ExecutionParameters expects it"""
+    if parameter_type == 'integer':
+        return str(int(value))
+    if parameter_type == 'double':
+        return repr(float(value))
+    if parameter_type == 'date':
+        value = value if isinstance(value, date) else date.fromisoformat(str(value))
+        return f"DATE '{value.isoformat()}'"
+    if parameter_type == 'timestamp':
+        return f"TIMESTAMP '{timestamp_text(value)}'"
+    return "'" + str(value).replace("'", "''") + "'"
+
+def parameter_values(template, values=None):
+    """Values for every parameter, falling back to the saved defaults"""
+    values = values or {}
+    return [values.get(parameter['name'], parameter['default']) for parameter in template['parameters']]
+
+def execution_parameters(template, values=None):
+    """ExecutionParameters list for a run of the template"""
+    return [
+        format_literal(value, parameter['type'])
+        for value, parameter in zip(parameter_values(template, values), template['parameters'])
+    ]
+
+def render_sql(template, values=None):
+    """Readable SQL of a run (for display, cost estimates and history), joined from the saved segments"""
+    literals = execution_parameters(template, values)
+    parts = [template['segments'][0]]
+    for literal, segment in zip(literals, template['segments'][1:]):
+        parts.extend([literal, segment])
+    header = '\n'.join(template.get('header') or [])
+    return (header + '\n' if header else '') + ''.join(parts)
+
+def statement_name(template):
+    """Prepared statement name; the statement text is fixed per name, so it never needs updating"""
+    return STATEMENT_PREFIX + fingerprint(template['statement'])
+
+def ensure_prepared_statement(athena_client, template, workgroup, account_id=''):
+    """Create the template's prepared statement in the workgroup unless it already exists; returns its name"""
+    name = statement_name(template)
+    key = (account_id, workgroup, name)
+    with _prepared_statements_lock:
+        if key in _prepared_statements:
+            return name
+
+    try:
+        athena_client.get_prepared_statement(StatementName=name, WorkGroup=workgroup)
+    except athena_client.exceptions.ResourceNotFoundException:
+        try:
+            athena_client.create_prepared_statement(
+                StatementName=name,
+                WorkGroup=workgroup,
+                QueryStatement=template['statement'],
+                Description=template['name'][:1024]
+            )
+        except athena_client.exceptions.InvalidRequestException:
+            # Created concurrently by another session
+            athena_client.get_prepared_statement(StatementName=name, WorkGroup=workgroup)
+
+    with _prepared_statements_lock:
+        _prepared_statements.add(key)
+    return name
+
+def start_template_execution(athena_client, template, values, workgroup, query_context, account_id=''):
+    """Submit EXECUTE of the template's prepared statement with typed parameters; returns the execution ID"""
+    name = ensure_prepared_statement(athena_client, template, workgroup, account_id)
+    request = {'QueryString': f"EXECUTE {name}", 'WorkGroup': workgroup, **query_context}
+    if template['parameters']:
+        request['ExecutionParameters'] = execution_parameters(template, values)
+    return athena_client.start_query_execution(**request)['QueryExecutionId']
+
+def render_parameter_inputs(template, key):
+    """Streamlit inputs for a template's parameters, as {name: value}"""
+    values = {}
+    for parameter in template['parameters']:
+        label = f"{parameter['name']} ({parameter['type']})"
+        input_key = f"{key}_{parameter['name']}"
+        default = parameter['default']
+        if parameter['type'] == 'integer':
+            values[parameter['name']] = st.number_input(label, value=int(default), step=1, key=input_key)
+        elif parameter['type'] == 'double':
+            values[parameter['name']] = st.number_input(label, value=float(default), key=input_key)
+        elif parameter['type'] == 'date':
+            values[parameter['name']] = st.date_input(label, value=date.fromisoformat(default), key=input_key)
+        else:
+            values[parameter['name']] = st.text_input(label, value=str(default), key=input_key)
+    return values
+
+def upgrade_template(item):
+    """Saved query from before templates: parse it once into a template"""
+    if 'statement' in item:
+        return item
+    template = make_template(item.get('sql', ''), item.get('question', ''), item.get('name'))
+    template['timestamp'] = item.get('timestamp', '')
+    return template
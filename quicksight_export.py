@@ -5,6 +5,22 @@ import os
 from datetime import datetime
 import json
 
+# Columns of the default dataset table
+EXECUTIVE_DASHBOARD_COLUMNS = [
+    {'Name': 'contract_id', 'Type': 'STRING'},
+    {'Name': 'contract_name', 'Type': 'STRING'},
+    {'Name': 'vendor', 'Type': 'STRING'},
+    {'Name': 'value', 'Type': 'INTEGER'},
+    {'Name': 'status', 'Type': 'STRING'},
+    {'Name': 'end_date', 'Type': 'STRING'},
+    {'Name': 'department', 'Type': 'STRING'},
+    {'Name': 'compliance_status', 'Type': 'STRING'},
+    {'Name': 'performance_score', 'Type': 'INTEGER'},
+    {'Name': 'outstanding_balance', 'Type': 'INTEGER'},
+    {'Name': 'auto_renewal', 'Type': 'STRING'},
+    {'Name': 'contract_owner', 'Type': 'STRING'}
+]
+
 class QuickSightExporter:
     def __init__(self, config):
         # Set all attributes first
@@ -95,8 +111,8 @@ class QuickSightExporter:
                 st.error(f"Failed to create Athena data source: {str(e)}")
                 return None
     
-    def create_dataset(self, dataset_id, dataset_name, sql_query):
-        """Create QuickSight dataset with direct table reference"""
+    def create_dataset(self, dataset_id, dataset_name, sql_query, table_name=None, input_columns=None):
+        """Create QuickSight dataset with direct table reference (default: executive_dashboard_detailed)"""
         datasource_id = self.ensure_athena_datasource()
         
         if not datasource_id:
@@ -115,21 +131,8 @@ class QuickSightExporter:
                             'DataSourceArn': f"arn:aws:quicksight:{self.region}:{self.account_id}:datasource/{datasource_id}",
                             'Catalog': 'awsdatacatalog',
                             'Schema': self.database,
-                            'Name': 'executive_dashboard_detailed',
-                            'InputColumns': [
-                                {'Name': 'contract_id', 'Type': 'STRING'},
-                                {'Name': 'contract_name', 'Type': 'STRING'},
-                                {'Name': 'vendor', 'Type': 'STRING'},
-                                {'Name': 'value', 'Type': 'INTEGER'},
-                                {'Name': 'status', 'Type': 'STRING'},
-                                {'Name': 'end_date', 'Type': 'STRING'},
-                                {'Name': 'department', 'Type': 'STRING'},
-                                {'Name': 'compliance_status', 'Type': 'STRING'},
-                                {'Name': 'performance_score', 'Type': 'INTEGER'},
-                                {'Name': 'outstanding_balance', 'Type': 'INTEGER'},
-                                {'Name': 'auto_renewal', 'Type': 'STRING'},
-                                {'Name': 'contract_owner', 'Type': 'STRING'}
-                            ]
+                            'Name': table_name or 'executive_dashboard_detailed',
+                            'InputColumns': input_columns or EXECUTIVE_DASHBOARD_COLUMNS
                         }
                     }
                 },
@@ -196,15 +199,16 @@ class QuickSightExporter:
             'quicksight_home': f"{base_url}/start"
         }
     
-    def export_to_quicksight(self, sql_query, user_prompt, query_description="", custom_name=None):
-        """Main export function"""
+    def export_to_quicksight(self, sql_query, user_prompt, query_description="", custom_name=None,
+                             table_name=None, input_columns=None):
+        """Main export function (table_name/input_columns point the dataset at an exported table)"""
         try:
             # Generate dataset details
             dataset_name = self.generate_dataset_name(user_prompt, query_description, custom_name)
             dataset_id = self.generate_dataset_id(dataset_name)
             
             # Create dataset
-            result = self.create_dataset(dataset_id, dataset_name, sql_query)
+            result = self.create_dataset(dataset_id, dataset_name, sql_query, table_name, input_columns)
             
             if result:
                 urls = self.generate_quicksight_urls(dataset_id)
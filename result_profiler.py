@@ -0,0 +1,124 @@
+"""
+Result Profiler
+Per-column profile of a query result (nulls, distinct counts, min/max, quantiles, top
+values) computed with Arrow compute kernels, cached per execution ID
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Above this many rows distinct counts use HyperLogLog and quantiles use t-digest
+EXACT_PROFILE_MAX_ROWS = 100_000
+HLL_PRECISION = 14          # 2^14 registers: ~0.8% standard error, 16 KB per column
+HLL_RANK_BITS = 50          # hash bits after the register index used for the rank
+QUANTILES = [0.05, 0.25, 0.5, 0.75, 0.95]
+TOP_K = 5
+
+PROFILE_CACHE_ENTRIES = 32
+_profile_cache = OrderedDict()
+_profile_cache_lock = threading.Lock()
+
+def hll_update(registers, hashes):
+    """Fold 64-bit hashes into HyperLogLog registers (vectorized)"""
+    index = (hashes >> np.uint64(64 - HLL_PRECISION)).astype(np.int64)
+    rest = (hashes >> np.uint64(64 - HLL_PRECISION - HLL_RANK_BITS)) & np.uint64((1 << HLL_RANK_BITS) - 1)
+    # frexp gives the exact bit length of integers below 2^53
+    bit_length = np.frexp(rest.astype(np.float64))[1]
+    rank = (HLL_RANK_BITS - bit_length + 1).astype(np.uint8)
+    np.maximum.at(registers, index, rank)
+
+def hll_estimate(registers):
+    """Cardinality estimate from HyperLogLog registers"""
+    m = len(registers)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / np.sum(np.power(2.0, -registers.astype(np.float64)))
+    zeros = np.count_nonzero(registers == 0)
+    if estimate <= 2.5 * m and zeros:
+        estimate = m * np.log(m / zeros)  # small-range correction (linear counting)
+    return int(round(estimate))
+
+def approx_count_distinct(chunked_array):
+    """HyperLogLog distinct count, one chunk at a time so memory stays bounded"""
+    registers = np.zeros(1 << HLL_PRECISION, dtype=np.uint8)
+    for chunk in chunked_array.chunks:
+        values = chunk.drop_null()
+        if len(values):
+            hll_update(registers, pd.util.hash_array(values.to_numpy(zero_copy_only=False)))
+    return hll_estimate(registers)
+
+def is_numeric(arrow_type):
+    return pa.types.is_integer(arrow_type) or pa.types.is_floating(arrow_type) or pa.types.is_decimal(arrow_type)
+
+def is_orderable(arrow_type):
+    return (
+        is_numeric(arrow_type) or pa.types.is_string(arrow_type) or pa.types.is_temporal(arrow_type)
+        or pa.types.is_boolean(arrow_type)
+    )
+
+def column_profile(name, array):
+    """Profile of one column"""
+    num_rows = len(array)
+    exact = num_rows <= EXACT_PROFILE_MAX_ROWS
+    profile = {
+        'column': name,
+        'type': str(array.type),
+        'nulls': array.null_count,
+        'null_pct': array.null_count / num_rows if num_rows else 0.0,
+        'distinct': pc.count_distinct(array).as_py() if exact else approx_count_distinct(array),
+        'distinct_exact': exact,
+        'min': None,
+        'max': None,
+        'mean': None,
+        'quantiles': {},
+        'top_values': []
+    }
+
+    if num_rows == array.null_count:
+        return profile
+
+    if is_orderable(array.type):
+        min_max = pc.min_max(array)
+        profile['min'] = min_max['min'].as_py()
+        profile['max'] = min_max['max'].as_py()
+
+    if is_numeric(array.type):
+        values = pc.cast(array, pa.float64()) if pa.types.is_decimal(array.type) else array
+        profile['mean'] = pc.mean(values).as_py()
+        quantiles = pc.quantile(values, q=QUANTILES) if exact else pc.tdigest(values, q=QUANTILES)
+        profile['quantiles'] = dict(zip(QUANTILES, quantiles.to_pylist()))
+
+    # Top values only mean something when values repeat (skip ID-like columns)
+    if profile['distinct'] < 0.9 * (num_rows - array.null_count):
+        counts = pc.value_counts(array.drop_null())
+        order = pc.array_sort_indices(counts.field('counts'), order='descending')[:TOP_K]
+        top = counts.take(order)
+        profile['top_values'] = list(zip(top.field('values').to_pylist(), top.field('counts').to_pylist()))
+
+    return profile
+
+def profile_table(table):
+    """Profile every column of an Arrow table"""
+    return {
+        'num_rows': table.num_rows,
+        'num_columns': table.num_columns,
+        'columns': [column_profile(name, table[name]) for name in table.column_names]
+    }
+
+def cached_profile(handle, table):
+    """profile_table, computed once per stored result (execution ID)"""
+    with _profile_cache_lock:
+        if handle['result_id'] in _profile_cache:
+            _profile_cache.move_to_end(handle['result_id'])
+            return _profile_cache[handle['result_id']]
+
+    profile = profile_table(table)
+    with _profile_cache_lock:
+        _profile_cache[handle['result_id']] = profile
+        while len(_profile_cache) > PROFILE_CACHE_ENTRIES:
+            _profile_cache.popitem(last=False)
+    return profile
@@ -0,0 +1,248 @@
+"""
+Result Store
+Query results spilled to memory-mapped Arrow files on disk. Session state holds only a
+small handle; rows are paged in on demand and old results are evicted (LRU, byte budget)
+"""
+
+import atexit
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+RESULT_STORE_DIR = os.getenv('RESULT_STORE_DIR', os.path.join(tempfile.gettempdir(), 'athena_query_results'))
+RESULT_STORE_MAX_BYTES = int(os.getenv('RESULT_STORE_MAX_BYTES', 2 * 1024 ** 3))
+RESULT_STORE_MAX_ENTRIES = 200
+DEFAULT_PAGE_ROWS = 100
+RESULT_CACHE_TTL_SECONDS = 10 * 60   # identical queries within this window reuse the stored result
+CSV_BLOCK_SIZE = 8 * 1024 ** 2
+
+# Athena result column types -> Arrow (anything else stays a string)
+ATHENA_ARROW_TYPES = {
+    'boolean': pa.bool_(),
+    'tinyint': pa.int8(),
+    'smallint': pa.int16(),
+    'integer': pa.int32(),
+    'int': pa.int32(),
+    'bigint': pa.int64(),
+    'float': pa.float32(),
+    'real': pa.float32(),
+    'double': pa.float64(),
+    'date': pa.date32(),
+    'timestamp': pa.timestamp('ms')
+}
+
+def arrow_type(column_info):
+    """Arrow type for an Athena ResultSetMetadata column"""
+    athena_type = column_info.get('Type', 'varchar').lower()
+    if athena_type == 'decimal':
+        return pa.decimal128(column_info.get('Precision', 38) or 38, column_info.get('Scale', 0))
+    return ATHENA_ARROW_TYPES.get(athena_type, pa.string())
+
+def result_schema(column_infos):
+    """Arrow schema for an Athena result (labels made unique so duplicate aliases survive)"""
+    fields = []
+    seen = {}
+    for info in column_infos:
+        name = info['Label']
+        seen[name] = seen.get(name, 0) + 1
+        if seen[name] > 1:
+            name = f"{name}_{seen[name]}"
+        fields.append(pa.field(name, arrow_type(info)))
+    return pa.schema(fields)
+
+def csv_result_batches(s3_client, output_location, schema):
+    """Stream Athena's CSV result file from S3 as typed record batches"""
+    bucket, _, key = output_location.replace('s3://', '', 1).partition('/')
+    body = s3_client.get_object(Bucket=bucket, Key=key)['Body']
+    reader = pa_csv.open_csv(
+        pa.PythonFile(body, mode='r'),
+        read_options=pa_csv.ReadOptions(column_names=schema.names, skip_rows=1, block_size=CSV_BLOCK_SIZE),
+        convert_options=pa_csv.ConvertOptions(
+            column_types={field.name: field.type for field in schema},
+            strings_can_be_null=True,
+            quoted_strings_can_be_null=False   # Athena writes NULL unquoted, '' quoted
+        )
+    )
+    for batch in reader:
+        yield batch
+
+def paged_result_batches(athena_client, query_execution_id, schema):
+    """Fallback when the result file cannot be read: page through GetQueryResults"""
+    paginator = athena_client.get_paginator('get_query_results')
+    first_page = True
+    for page in paginator.paginate(QueryExecutionId=query_execution_id, PaginationConfig={'PageSize': 1000}):
+        rows = page['ResultSet']['Rows'][1:] if first_page else page['ResultSet']['Rows']
+        first_page = False
+        if not rows:
+            continue
+        columns = list(zip(*[[field.get('VarCharValue') for field in row['Data']] for row in rows]))
+        arrays = [pa.array(values, pa.string()) for values in columns]
+        yield pa.RecordBatch.from_arrays(arrays, names=schema.names).cast(schema)
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True   # exists, owned by another user
+    return True
+
+def remove_orphaned_directories(directory):
+    """Delete the result directories of processes that are no longer running (never those of live ones)"""
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return
+    for name in names:
+        pid = name.split('-', 1)[0]
+        if pid.isdigit() and not process_alive(int(pid)):
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+class ResultStore:
+    """Process-wide store of query results as Arrow IPC files, shared by all sessions"""
+
+    def __init__(self, directory=RESULT_STORE_DIR, max_bytes=RESULT_STORE_MAX_BYTES, max_entries=RESULT_STORE_MAX_ENTRIES):
+        # Each process gets its own subdirectory: other app processes may share the base directory
+        self.directory = os.path.join(directory, f"{os.getpid()}-{uuid.uuid4().hex[:8]}")
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.entries = OrderedDict()   # result_id -> handle, least recently used first
+        self.fingerprints = {}         # query fingerprint -> result_id of its latest result
+        self.lock = threading.Lock()
+
+        remove_orphaned_directories(directory)
+        os.makedirs(self.directory, exist_ok=True)
+        atexit.register(shutil.rmtree, self.directory, True)
+
+    def path_for(self, result_id):
+        return os.path.join(self.directory, f"{result_id}.arrow")
+
+    def put_batches(self, result_id, schema, batches, fingerprint=None):
+        """Write record batches to disk without holding the whole result in memory"""
+        path = self.path_for(result_id)
+        temp_path = path + '.tmp'
+        num_rows = 0
+        with pa.OSFile(temp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, schema) as writer:
+                for batch in batches:
+                    writer.write_batch(batch)
+                    num_rows += batch.num_rows
+        os.replace(temp_path, path)
+
+        handle = {
+            'result_id': result_id,
+            'path': path,
+            'num_rows': num_rows,
+            'num_bytes': os.path.getsize(path),
+            'columns': schema.names,
+            'created_at': time.time(),
+            'fingerprint': fingerprint
+        }
+        with self.lock:
+            self.entries[result_id] = handle
+            self.entries.move_to_end(result_id)
+            if fingerprint:
+                self.fingerprints[fingerprint] = result_id
+            self.evict()
+        return handle
+
+    def put_table(self, result_id, table):
+        """Store an in-memory Arrow table"""
+        return self.put_batches(result_id, table.schema, table.to_batches())
+
+    def evict(self):
+        """Drop least recently used results until under the entry and byte budgets (lock held)"""
+        total_bytes = sum(entry['num_bytes'] for entry in self.entries.values())
+        while self.entries and (total_bytes > self.max_bytes or len(self.entries) > self.max_entries):
+            _, oldest = self.entries.popitem(last=False)
+            total_bytes -= oldest['num_bytes']
+            try:
+                os.remove(oldest['path'])
+            except OSError:
+                pass
+
+    def lookup(self, fingerprint, max_age_seconds=RESULT_CACHE_TTL_SECONDS):
+        """Handle of a recent stored result for the same query fingerprint, or None"""
+        with self.lock:
+            handle = self.entries.get(self.fingerprints.get(fingerprint))
+            if handle is None:
+                self.fingerprints.pop(fingerprint, None)
+                return None
+            if time.time() - handle['created_at'] > max_age_seconds:
+                return None
+            self.entries.move_to_end(handle['result_id'])
+            return handle
+
+    def open(self, handle):
+        """Memory-mapped Arrow table for a handle, or None if it was evicted"""
+        if not handle:
+            return None
+        with self.lock:
+            if handle['result_id'] not in self.entries:
+                return None
+            self.entries.move_to_end(handle['result_id'])
+        try:
+            # Zero-copy: pages are read from disk only when a slice touches them
+            return pa.ipc.open_file(pa.memory_map(handle['path'], 'r')).read_all()
+        except (OSError, pa.ArrowInvalid):
+            return None
+
+    def page(self, handle, offset=0, limit=DEFAULT_PAGE_ROWS):
+        """Rows [offset, offset + limit) as a pandas DataFrame, or None if evicted"""
+        table = self.open(handle)
+        if table is None:
+            return None
+        return table.slice(offset, limit).to_pandas()
+
+    def discard(self, handle):
+        """Remove a result before it would be evicted"""
+        with self.lock:
+            entry = self.entries.pop(handle['result_id'], None)
+        if entry:
+            try:
+                os.remove(entry['path'])
+            except OSError:
+                pass
+
+    def stats(self):
+        """Number of stored results and bytes used"""
+        with self.lock:
+            return {
+                'results': len(self.entries),
+                'bytes': sum(entry['num_bytes'] for entry in self.entries.values()),
+                'max_bytes': self.max_bytes
+            }
+
+_result_store = None
+_result_store_lock = threading.Lock()
+
+def get_result_store():
+    """The process-wide result store"""
+    global _result_store
+    with _result_store_lock:
+        if _result_store is None:
+            _result_store = ResultStore()
+        return _result_store
+
+def fetch_query_result(athena_client, s3_client, query_execution_id, fingerprint=None):
+    """Spill an Athena query result to the store and return its handle (indexed by fingerprint for reuse)"""
+    store = get_result_store()
+    metadata = athena_client.get_query_results(QueryExecutionId=query_execution_id, MaxResults=1)
+    schema = result_schema(metadata['ResultSet']['ResultSetMetadata']['ColumnInfo'])
+
+    execution = athena_client.get_query_execution(QueryExecutionId=query_execution_id)['QueryExecution']
+    output_location = execution.get('ResultConfiguration', {}).get('OutputLocation', '')
+    if s3_client and output_location.endswith('.csv'):
+        try:
+            return store.put_batches(query_execution_id, schema, csv_result_batches(s3_client, output_location, schema), fingerprint)
+        except Exception:
+            pass  # e.g. no s3:GetObject on the results bucket; fall back to the API
+    return store.put_batches(query_execution_id, schema, paged_result_batches(athena_client, query_execution_id, schema), fingerprint)
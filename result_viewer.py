@@ -0,0 +1,191 @@
+"""
+Result Viewer
+Renders stored query results one page at a time. Sorting and filtering run server-side
+on the memory-mapped Arrow table, so reruns only send the visible rows to the browser
+"""
+
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import streamlit as st
+
+from result_store import get_result_store, DEFAULT_PAGE_ROWS
+from result_profiler import cached_profile
+
+PAGE_SIZES = [50, 100, 250, 500]
+FILTER_OPERATORS = ['contains', '=', '!=', '>', '>=', '<', '<=', 'is null', 'is not null']
+COMPARISONS = {
+    '=': pc.equal, '!=': pc.not_equal, '>': pc.greater, '>=': pc.greater_equal,
+    '<': pc.less, '<=': pc.less_equal
+}
+
+# Row order of recent (result, sort, filter) views, so paging does not re-sort
+VIEW_CACHE_ENTRIES = 16
+_view_cache = OrderedDict()
+_view_cache_lock = threading.Lock()
+
+def filter_mask(table, column, operator, value):
+    """Boolean mask for one filter condition (nulls never match)"""
+    array = table[column]
+    if operator == 'is null':
+        return pc.is_null(array)
+    if operator == 'is not null':
+        return pc.is_valid(array)
+    if operator == 'contains':
+        mask = pc.match_substring(pc.cast(array, pa.string()), value, ignore_case=True)
+    else:
+        # Cast the typed-in value to the column type so numbers and dates compare correctly
+        mask = COMPARISONS[operator](array, pa.scalar(value).cast(array.type))
+    return pc.fill_null(mask, False)
+
+def search_mask(table, text):
+    """Rows where any text column contains the search text"""
+    mask = None
+    for field in table.schema:
+        if pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+            column_mask = pc.fill_null(pc.match_substring(table[field.name], text, ignore_case=True), False)
+            mask = column_mask if mask is None else pc.or_(mask, column_mask)
+    return mask if mask is not None else pa.array([False] * table.num_rows)
+
+def view_indices(table, sort_column=None, descending=False, filters=(), search=''):
+    """Row indices of the filtered, sorted view of a table"""
+    mask = None
+    for column, operator, value in filters:
+        condition = filter_mask(table, column, operator, value)
+        mask = condition if mask is None else pc.and_(mask, condition)
+    if search:
+        condition = search_mask(table, search)
+        mask = condition if mask is None else pc.and_(mask, condition)
+
+    indices = pc.indices_nonzero(mask) if mask is not None else pa.array(np.arange(table.num_rows, dtype=np.uint64))
+    if sort_column:
+        order = pc.array_sort_indices(
+            table[sort_column].take(indices),
+            order='descending' if descending else 'ascending',
+            null_placement='at_end'
+        )
+        indices = indices.take(order)
+    return indices
+
+def cached_view_indices(handle, table, sort_column, descending, filters, search):
+    """view_indices, cached per result and view settings"""
+    cache_key = (handle['result_id'], sort_column, descending, tuple(filters), search)
+    with _view_cache_lock:
+        if cache_key in _view_cache:
+            _view_cache.move_to_end(cache_key)
+            return _view_cache[cache_key]
+
+    indices = view_indices(table, sort_column, descending, filters, search)
+    with _view_cache_lock:
+        _view_cache[cache_key] = indices
+        while len(_view_cache) > VIEW_CACHE_ENTRIES:
+            _view_cache.popitem(last=False)
+    return indices
+
+def render_view_controls(handle, key):
+    """Sort/filter widgets; returns (sort_column, descending, filters, search)"""
+    with st.expander("🔎 Sort & Filter"):
+        col1, col2, col3 = st.columns([2, 1, 2])
+        with col1:
+            sort_column = st.selectbox("Sort by:", ['(none)'] + handle['columns'], key=f"{key}_sort")
+        with col2:
+            descending = st.checkbox("Descending", key=f"{key}_desc")
+        with col3:
+            search = st.text_input("Search text columns:", key=f"{key}_search").strip()
+
+        col1, col2, col3 = st.columns([2, 1, 2])
+        with col1:
+            filter_column = st.selectbox("Filter column:", ['(none)'] + handle['columns'], key=f"{key}_filter_col")
+        with col2:
+            operator = st.selectbox("Operator:", FILTER_OPERATORS, key=f"{key}_filter_op")
+        with col3:
+            value = st.text_input("Value:", key=f"{key}_filter_value")
+
+    filters = []
+    if filter_column != '(none)' and (value or operator in ('is null', 'is not null')):
+        filters.append((filter_column, operator, value))
+    return (None if sort_column == '(none)' else sort_column), descending, filters, search
+
+def render_result_pages(handle, key="results"):
+    """Show one page of a stored result with sort/filter/page controls; returns the page DataFrame (None if evicted)"""
+    store = get_result_store()
+    table = store.open(handle)
+    if table is None:
+        st.warning("⚠️ These results were evicted from the result cache to free memory. Run the query again to reload them.")
+        return None
+
+    sort_column, descending, filters, search = render_view_controls(handle, key)
+    try:
+        indices = cached_view_indices(handle, table, sort_column, descending, filters, search)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError, ValueError) as e:
+        st.warning(f"⚠️ Filter ignored: {str(e)}")
+        indices = cached_view_indices(handle, table, sort_column, descending, [], search)
+    num_view_rows = len(indices)
+
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        page_rows = st.selectbox("Rows per page:", PAGE_SIZES, index=PAGE_SIZES.index(DEFAULT_PAGE_ROWS), key=f"{key}_page_rows")
+    num_pages = max(math.ceil(num_view_rows / page_rows), 1)
+    if st.session_state.get(f"{key}_page", 1) > num_pages:
+        st.session_state[f"{key}_page"] = 1  # view shrank (new filter, bigger pages)
+    with col2:
+        page_number = st.number_input(f"Page (of {num_pages:,}):", min_value=1, max_value=num_pages, key=f"{key}_page")
+
+    offset = (page_number - 1) * page_rows
+    page = table.take(indices[offset:offset + page_rows]).to_pandas()
+
+    st.dataframe(page, use_container_width=True, height=min(400, 38 + 35 * max(len(page), 1)))
+    if num_view_rows:
+        label = f"Rows {offset + 1:,}–{offset + len(page):,} of {num_view_rows:,}"
+        if num_view_rows != handle['num_rows']:
+            label += f" (filtered from {handle['num_rows']:,})"
+        st.caption(label)
+    else:
+        st.caption(f"No rows match (of {handle['num_rows']:,})")
+    return page
+
+def display_value(value):
+    """Compact text for a profile value (dates, decimals, long strings)"""
+    if value is None:
+        return ''
+    if isinstance(value, float):
+        return f"{value:,.2f}"
+    text = str(value)
+    return text if len(text) <= 40 else text[:37] + '...'
+
+def render_result_profile(handle):
+    """Column profile of a stored result: nulls, distinct counts, ranges, quantiles and top values"""
+    table = get_result_store().open(handle)
+    if table is None or table.num_rows == 0:
+        return
+
+    with st.spinner("📈 Profiling results..."):
+        profile = cached_profile(handle, table)
+
+    st.dataframe([
+        {
+            'Column': column['column'],
+            'Type': column['type'],
+            'Nulls': f"{column['nulls']:,} ({column['null_pct']:.0%})",
+            'Distinct': f"{column['distinct']:,}" if column['distinct_exact'] else f"≈{column['distinct']:,}",
+            'Min': display_value(column['min']),
+            'Max': display_value(column['max']),
+            'Mean': display_value(column['mean']),
+            'P5 / P50 / P95': ' / '.join(display_value(column['quantiles'][q]) for q in (0.05, 0.5, 0.95)) if column['quantiles'] else ''
+        }
+        for column in profile['columns']
+    ], use_container_width=True)
+
+    top_columns = [column for column in profile['columns'] if column['top_values']]
+    if top_columns:
+        st.markdown("**Top Values:**")
+        layout = st.columns(min(len(top_columns), 3))
+        for i, column in enumerate(top_columns):
+            with layout[i % len(layout)]:
+                st.markdown(f"*{column['column']}*")
+                for value, count in column['top_values']:
+                    st.write(f"• {display_value(value)}: {count:,} ({count / profile['num_rows']:.0%})")
@@ -0,0 +1,101 @@
+"""
+Schema Context
+Compact schema for model prompts: the tables most relevant to a question (ranked by the
+table index), their most relevant columns, written as short deterministic DDL within a
+token budget, and cached per (question intent, catalog version)
+"""
+
+import threading
+from collections import OrderedDict
+
+from table_index import get_table_index, rank_tables, tokenize
+
+MAX_CONTEXT_TABLES = 8
+MAX_CONTEXT_TOKENS = 1500
+MIN_TABLE_COLUMNS = 4
+MAX_TABLE_COLUMNS = 20
+MIN_RELATIVE_SCORE = 0.3        # tables scoring below this share of the best one are left out
+MAX_COMMENT_CHARS = 60
+CHARS_PER_TOKEN = 4             # rough size of a token for SQL-ish text
+SCHEMA_CONTEXT_ENTRIES = 128
+
+_schema_contexts = OrderedDict()
+_schema_context_lock = threading.Lock()
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def question_intent(index, question):
+    """Question terms the catalog knows about; questions sharing them share a context"""
+    return frozenset(token for token in tokenize(question) if token in index['idf'])
+
+def column_score(column, intent):
+    """Relevance of a column: terms shared with the question, then join keys"""
+    tokens = set(tokenize(column['name'])) | set(tokenize(column.get('comment', '')))
+    score = len(tokens & intent) * 2
+    name = column['name'].lower()
+    if name == 'id' or name.endswith('_id') or name.endswith('_key'):
+        score += 1
+    return score
+
+def column_ddl(column):
+    text = f"{column['name']} {column['type'] or 'string'}"
+    comment = (column.get('comment') or '').strip()
+    if comment:
+        text += f" COMMENT '{comment[:MAX_COMMENT_CHARS]}'"
+    return text
+
+def table_ddl(database, info, columns, omitted):
+    """One-line DDL of a table with the chosen columns (in catalog order) and its partition keys"""
+    text = f'TABLE "{database}".{info["name"]} ({", ".join(column_ddl(column) for column in columns)}'
+    text += f", ... {omitted} more)" if omitted else ")"
+    if info['partition_keys']:
+        text += f" PARTITIONED BY ({', '.join(column_ddl(key) for key in info['partition_keys'])})"
+    if info.get('description'):
+        text += f" -- {info['description'][:MAX_COMMENT_CHARS]}"
+    return text
+
+def fit_table(database, info, intent, token_budget):
+    """DDL for a table with as many of its most relevant columns as fit in the budget (None if even the minimum does not)"""
+    ranked = sorted(range(len(info['columns'])), key=lambda i: (-column_score(info['columns'][i], intent), i))
+    count = min(len(ranked), MAX_TABLE_COLUMNS)
+    while count >= min(MIN_TABLE_COLUMNS, len(ranked)):
+        chosen = sorted(ranked[:count])
+        text = table_ddl(database, info, [info['columns'][i] for i in chosen], len(ranked) - count)
+        if estimate_tokens(text) <= token_budget:
+            return text
+        # Shrink towards the budget in one step rather than column by column
+        count = min(count - 1, int(count * token_budget / estimate_tokens(text)))
+    return None
+
+def build_schema_context(catalog, question, names=None, max_tables=MAX_CONTEXT_TABLES, max_tokens=MAX_CONTEXT_TOKENS):
+    """Deterministic DDL summary of the tables and columns relevant to the question, within max_tokens"""
+    names = list(names if names is not None else catalog['table_names'])
+    index = get_table_index(catalog, names)
+    intent = question_intent(index, question)
+    key = (catalog['database'], catalog['version'], hash(tuple(names)), intent, max_tables, max_tokens)
+    with _schema_context_lock:
+        if key in _schema_contexts:
+            _schema_contexts.move_to_end(key)
+            return _schema_contexts[key]
+
+    scored = rank_tables(index, question, limit=max_tables)
+    ranked = [name for name, score in scored if score >= MIN_RELATIVE_SCORE * scored[0][1]]
+    # Nothing matched: fall back to the catalog order so the model still sees some tables
+    candidates = ranked or names[:max_tables]
+
+    lines = []
+    remaining = max_tokens
+    for name in candidates:
+        text = fit_table(catalog['database'], catalog['tables'][name], intent, remaining)
+        if text is None:
+            break
+        lines.append(text)
+        remaining -= estimate_tokens(text) + 1
+    context = '\n'.join(lines)
+
+    with _schema_context_lock:
+        _schema_contexts[key] = context
+        while len(_schema_contexts) > SCHEMA_CONTEXT_ENTRIES:
+            _schema_contexts.popitem(last=False)
+    return context
@@ -0,0 +1,117 @@
+"""
+Shared Services
+Process-level state shared by every session of the server: pooled AWS clients, the Glue
+catalog per account and database (loaded once, however many sessions ask for it), plus
+memory accounting across these, the result store and the in-flight execution registry.
+Session state keeps only per-user choices and small handles
+"""
+
+import json
+import threading
+from collections import OrderedDict
+
+import boto3
+import streamlit as st
+
+from cost_estimator import format_bytes
+from glue_catalog import fetch_catalog, empty_catalog, is_catalog_stale
+from query_coalescer import flight_stats
+from result_store import get_result_store
+
+SHARED_CATALOG_MAX_ENTRIES = 32
+SHARED_CATALOG_MAX_BYTES = 256 * 1024 ** 2
+MAX_POOLED_CLIENTS = 64
+
+_clients = OrderedDict()
+_client_lock = threading.Lock()
+
+_catalogs = OrderedDict()      # "account:database" -> (catalog, approximate bytes)
+_catalog_loads = {}            # "account:database" -> lock held while that catalog is fetched
+_catalog_lock = threading.Lock()
+
+def get_client(service, region_name=None, profile_name=None, **credentials):
+    """Pooled boto3 client (clients are thread-safe; sessions are not, so they are only used here under the lock)"""
+    key = (service, region_name, profile_name, tuple(sorted(credentials.items())))
+    with _client_lock:
+        client = _clients.get(key)
+        if client is None:
+            if profile_name:
+                client = boto3.Session(profile_name=profile_name).client(service, region_name=region_name, **credentials)
+            else:
+                client = boto3.client(service, region_name=region_name, **credentials)
+            _clients[key] = client
+            while len(_clients) > MAX_POOLED_CLIENTS:
+                _clients.popitem(last=False)
+        else:
+            _clients.move_to_end(key)
+        return client
+
+def catalog_bytes(catalog):
+    """Approximate memory held by a catalog (its serialized size)"""
+    return len(json.dumps(catalog, default=str))
+
+def cached_catalog(key):
+    with _catalog_lock:
+        entry = _catalogs.get(key)
+        if entry:
+            _catalogs.move_to_end(key)
+            return entry[0]
+    return None
+
+def store_catalog(key, catalog):
+    """Keep a catalog, evicting the least recently used ones beyond the entry and byte budgets"""
+    size = catalog_bytes(catalog)
+    with _catalog_lock:
+        _catalogs[key] = (catalog, size)
+        _catalogs.move_to_end(key)
+        total_bytes = sum(entry[1] for entry in _catalogs.values())
+        while len(_catalogs) > 1 and (len(_catalogs) > SHARED_CATALOG_MAX_ENTRIES or total_bytes > SHARED_CATALOG_MAX_BYTES):
+            _, (_, evicted) = _catalogs.popitem(last=False)
+            total_bytes -= evicted
+    return catalog
+
+def get_shared_catalog(account_id, database, glue_client_factory, max_age_seconds, force_refresh=False, allow_stale=False):
+    """Glue catalog of a database, fetched by one session at a time and shared with all others.
+    glue_client_factory() is only called when a fetch is needed"""
+    key = f"{account_id}:{database}"
+    catalog = cached_catalog(key)
+    if not (force_refresh or (is_catalog_stale(catalog, max_age_seconds) and not (allow_stale and catalog))):
+        return catalog
+
+    with _catalog_lock:
+        load_lock = _catalog_loads.setdefault(key, threading.Lock())
+    with load_lock:
+        # Another session may have refreshed it while this one waited
+        latest = cached_catalog(key)
+        if latest is not catalog and latest is not None and not is_catalog_stale(latest, max_age_seconds):
+            return latest
+        try:
+            return store_catalog(key, fetch_catalog(glue_client_factory(), database))
+        except Exception:
+            # Keep serving the last good catalog; cache the placeholder only when there is none
+            return latest or store_catalog(key, empty_catalog(database))
+
+def service_stats():
+    """Memory and entry counts of the shared services"""
+    with _catalog_lock:
+        catalogs = len(_catalogs)
+        catalog_total = sum(entry[1] for entry in _catalogs.values())
+    with _client_lock:
+        clients = len(_clients)
+    return {
+        'catalogs': catalogs,
+        'catalog_bytes': catalog_total,
+        'clients': clients,
+        'results': get_result_store().stats(),
+        'flights': flight_stats()
+    }
+
+def render_service_stats():
+    """Sidebar summary of what the server holds for all sessions"""
+    with st.sidebar.expander("🖥️ Shared Server Resources"):
+        stats = service_stats()
+        results = stats['results']
+        st.caption(f"**Catalogs:** {stats['catalogs']} · {format_bytes(stats['catalog_bytes'])}")
+        st.caption(f"**Stored results:** {results['results']} · {format_bytes(results['bytes'])} of {format_bytes(results['max_bytes'])}")
+        st.caption(f"**AWS clients:** {stats['clients']}")
+        st.caption(f"**Running queries:** {stats['flights']['running']} · {stats['flights']['followers']} sessions sharing them")
@@ -0,0 +1,92 @@
+"""
+Data Source Prediction
+Incremental "Auto:" data-source hint for the question box. The view/table split and the
+table search index are built once per catalog version, predictions are memoized by the
+question's routing keywords and the catalog version, and a catalog refresh waits until
+the question stops changing
+"""
+
+import threading
+from collections import OrderedDict
+
+import streamlit as st
+
+from glue_catalog import is_view_name
+from materialized_views import is_materialized_table
+from table_index import get_table_index, rank_tables
+
+SOURCE_INDEX_ENTRIES = 8
+PREDICTION_CACHE_ENTRIES = 256
+
+_source_indexes = OrderedDict()
+_predictions = OrderedDict()
+_prediction_lock = threading.Lock()
+
+def cache_get(cache, key):
+    with _prediction_lock:
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+    return None
+
+def cache_put(cache, key, value, max_entries):
+    with _prediction_lock:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > max_entries:
+            cache.popitem(last=False)
+    return value
+
+def source_index(catalog):
+    """Selectable views and base tables of a catalog (same naming split as SQL generation), built once per version"""
+    key = (catalog['database'], catalog['version'])
+    index = cache_get(_source_indexes, key)
+    if index is not None:
+        return index
+
+    names = [name for name in catalog['table_names'] if not is_materialized_table(name)]
+    views = [name for name in names if is_view_name(name)]
+    tables = [name for name in names if not is_view_name(name)]
+    return cache_put(_source_indexes, key, {
+        'key': key,
+        'names': names,
+        'views': views,
+        'tables': tables,
+        'view_set': frozenset(views),
+        'table_set': frozenset(tables),
+        'search': get_table_index(catalog, names)
+    }, SOURCE_INDEX_ENTRIES)
+
+def question_keywords(question, keywords):
+    """The routing keywords (substrings) present in a question"""
+    question = question.lower()
+    return frozenset(keyword for keyword in keywords if keyword in question)
+
+def best_match(index, question, candidates):
+    """Highest-ranked table for the question among candidates, or None when no table shares a term"""
+    ranked = rank_tables(index['search'], question, limit=1, candidates=candidates)
+    return ranked[0][0] if ranked else None
+
+def predict_source(rules, keywords, question, index):
+    """rules(present_keywords, index) memoized by (rules, keywords present, catalog version).
+    Rules return None when no keyword route applies; the table index then ranks by the full question"""
+    if not question:
+        return "No question entered"
+    present = question_keywords(question, keywords)
+    key = (rules.__module__, rules.__name__, present, index['key'])
+    prediction = cache_get(_predictions, key)
+    if prediction is None:
+        prediction = cache_put(_predictions, key, rules(present, index) or '', PREDICTION_CACHE_ENTRIES)
+    if prediction:
+        return prediction
+    return (
+        best_match(index, question, index['table_set']) or best_match(index, question, index['view_set'])
+        or (index['tables'] or index['views'] or ["No tables available"])[0]
+    )
+
+def question_changed(question, key='question_input'):
+    """True on the rerun that edited the question; callers defer catalog refreshes until it settles"""
+    state_key = f"{key}_previous"
+    changed = st.session_state.get(state_key) not in (None, question)
+    st.session_state[state_key] = question
+    return changed
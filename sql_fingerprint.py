@@ -0,0 +1,83 @@
+"""
+SQL Fingerprints
+Canonical SQL text and stable fingerprints, so a query is recognized however it was
+generated or edited: comments and "-- Generated from:" headers, whitespace, keyword and
+identifier case, quoting. The shape fingerprint also ignores literal values
+"""
+
+import re
+import hashlib
+
+from query_optimizer import strip_comments
+
+FINGERPRINT_LENGTH = 16
+
+TOKEN_PATTERN = re.compile(r"""
+    (?P<string>'(?:[^']|'')*')
+  | (?P<quoted>"(?:[^"]|"")*")
+  | (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<word>[A-Za-z_][\w$]*)
+  | (?P<operator><>|!=|<=|>=|\|\||=>|->|\S)
+""", re.VERBOSE)
+
+# Typed literals (DATE '2024-01-01', INTERVAL '7' DAY) become one placeholder in shapes
+TYPED_LITERAL_PREFIXES = {'date', 'timestamp', 'time', 'interval', 'decimal'}
+
+def tokens(sql):
+    """Canonical tokens of a statement (comments dropped, identifiers unquoted and lower-cased)"""
+    result = []
+    for match in TOKEN_PATTERN.finditer(strip_comments(sql)):
+        kind = match.lastgroup
+        text = match.group()
+        if kind == 'quoted' and re.fullmatch(r'"[A-Za-z_]\w*"', text):
+            # Athena identifiers are case-insensitive, so "Department" is department
+            kind, text = 'word', text[1:-1]
+        if kind == 'word':
+            text = text.lower()
+        elif kind == 'number':
+            text = canonical_number(text)
+        result.append((kind, text))
+    while result and result[-1] == ('operator', ';'):
+        result.pop()
+    return result
+
+def canonical_number(text):
+    """Same spelling for equal numeric literals of the same type (007 -> 7, 1.50 -> 1.5)"""
+    if re.fullmatch(r'\d+', text):
+        return str(int(text))
+    if re.fullmatch(r'\d*\.\d*', text):
+        whole, _, fraction = text.partition('.')
+        return f"{int(whole or 0)}.{fraction.rstrip('0') or '0'}"
+    return text.lower()
+
+def normalize_sql(sql, parameterize=False):
+    """Canonical single-line SQL; with parameterize, literals become ? and IN lists collapse"""
+    parts = []
+    for kind, text in tokens(sql):
+        if parameterize and kind in ('string', 'number'):
+            if parts and parts[-1] in TYPED_LITERAL_PREFIXES:
+                parts.pop()
+            if len(parts) >= 2 and parts[-1] == ',' and parts[-2] == '?':
+                parts.pop()   # IN ('a', 'b', 'c') and IN ('a') share a shape
+                continue
+            text = '?'
+        parts.append(text)
+    return ' '.join(parts)
+
+def fingerprint(sql, *context):
+    """Stable ID of a statement (same text modulo formatting), optionally scoped by context such as the database"""
+    text = '\x1f'.join([normalize_sql(sql)] + [str(item) for item in context])
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:FINGERPRINT_LENGTH]
+
+def shape_fingerprint(sql):
+    """Stable ID of a statement's shape: the same query with different literal values"""
+    return hashlib.sha1(normalize_sql(sql, parameterize=True).encode('utf-8')).hexdigest()[:FINGERPRINT_LENGTH]
+
+def dedupe_by_fingerprint(items, sql_key='sql'):
+    """Keep the last item per fingerprint, in order of each fingerprint's last appearance"""
+    latest = {}
+    for item in items:
+        key = fingerprint(item.get(sql_key, ''))
+        latest.pop(key, None)
+        latest[key] = item
+    return list(latest.values())
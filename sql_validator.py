@@ -0,0 +1,157 @@
+"""
+SQL Pre-flight Validation
+Checks generated or edited SQL against the cached Glue catalog (and optionally with
+Athena EXPLAIN) before it is submitted, so bad queries fail in milliseconds
+"""
+
+import re
+import time
+import difflib
+
+from glue_catalog import get_table_info
+from query_optimizer import strip_comments, find_table_references, top_level_positions, filter_clauses
+from cost_estimator import strip_literals, cte_names
+
+STATEMENT_KEYWORDS = (
+    'SELECT', 'WITH', 'CREATE', 'DROP', 'ALTER', 'SHOW', 'DESCRIBE', 'EXPLAIN',
+    'MSCK', 'UNLOAD', 'INSERT', 'VALUES', 'PREPARE', 'EXECUTE', 'DEALLOCATE'
+)
+
+# Words that can appear in a WHERE clause without being column names
+RESERVED_WORDS = {
+    'and', 'or', 'not', 'in', 'is', 'null', 'like', 'between', 'exists', 'true', 'false',
+    'case', 'when', 'then', 'else', 'end', 'as', 'cast', 'try_cast', 'date', 'timestamp',
+    'interval', 'current_date', 'current_timestamp', 'localtimestamp', 'day', 'days', 'month',
+    'months', 'year', 'years', 'week', 'hour', 'minute', 'second', 'escape', 'distinct',
+    'select', 'from', 'where', 'varchar', 'integer', 'bigint', 'double', 'decimal', 'boolean',
+    'real', 'any', 'all', 'some', 'similar', 'to', 'at', 'time', 'zone', 'asc', 'desc'
+}
+
+EXPLAIN_POLL_SECONDS = 0.5
+EXPLAIN_TIMEOUT_SECONDS = 20
+
+def statement_type(sql):
+    """First keyword of the statement (SELECT, WITH, CREATE, ...)"""
+    match = re.match(r'\s*(\w+)', strip_comments(sql))
+    return match.group(1).upper() if match else ''
+
+def check_syntax(sql):
+    """Cheap structural checks: one statement, balanced quotes and parentheses"""
+    errors = []
+    code = strip_comments(sql).strip()
+    if not code:
+        return ["Query is empty"]
+
+    if code.count("'") % 2:
+        errors.append("Unterminated string literal (odd number of single quotes)")
+    if code.count('"') % 2:
+        errors.append('Unterminated quoted identifier (odd number of double quotes)')
+
+    depth = 0
+    for ch in strip_literals(code):
+        depth += {'(': 1, ')': -1}.get(ch, 0)
+        if depth < 0:
+            break
+    if depth:
+        errors.append("Unbalanced parentheses")
+
+    if top_level_positions(code.rstrip(';'), r';'):
+        errors.append("Only one statement can be run at a time")
+
+    keyword = statement_type(code)
+    if keyword not in STATEMENT_KEYWORDS:
+        errors.append(f"Unrecognized statement starting with '{keyword or code[:20]}'")
+    elif keyword in ('SELECT', 'WITH') and re.search(r'\bSELECT\s+(?:FROM|WHERE)\b', code, re.IGNORECASE):
+        errors.append("SELECT has no column list")
+    return errors
+
+def suggest(name, candidates):
+    """' (did you mean x?)' hint for a misspelled table or column"""
+    matches = difflib.get_close_matches(name.lower(), [c.lower() for c in candidates], n=1)
+    if not matches:
+        return ''
+    original = next(c for c in candidates if c.lower() == matches[0])
+    return f" (did you mean {original}?)"
+
+def table_columns(table_info):
+    """Column and partition key names of a catalog table"""
+    return [c['name'] for c in table_info['columns'] + table_info['partition_keys']]
+
+def check_catalog_references(sql, catalog):
+    """Errors for tables missing from the catalog and qualified/filter columns missing from their table"""
+    errors = []
+    warnings = []
+    code = strip_literals(strip_comments(sql))
+    local_names = cte_names(sql)
+
+    tables_by_alias = {}
+    for ref in find_table_references(sql):
+        if ref['name'].lower() in local_names:
+            continue
+        if ref['database'] and ref['database'].lower() != catalog['database'].lower():
+            warnings.append(f"{ref['database']}.{ref['name']} is in another database and was not checked")
+            continue
+        table_info = get_table_info(catalog, ref['name'])
+        if not table_info:
+            errors.append(f"Table not found in {catalog['database']}: {ref['name']}{suggest(ref['name'], catalog['table_names'])}")
+            continue
+        tables_by_alias[ref['name'].lower()] = table_info
+        if ref['alias']:
+            tables_by_alias[ref['alias'].lower()] = table_info
+
+    # alias.column references
+    for qualifier, column in re.findall(r'\b(\w+)\.("[^"]+"|\w+)\b(?!\s*\()', code):
+        table_info = tables_by_alias.get(qualifier.lower())
+        column = column.strip('"')
+        if table_info and column != '*' and column.lower() not in [c.lower() for c in table_columns(table_info)]:
+            errors.append(f"Column {qualifier}.{column} not found in {table_info['name']}{suggest(column, table_columns(table_info))}")
+
+    # Unqualified identifiers in WHERE of a single-table query (no SELECT aliases allowed there)
+    tables = {info['name'] for info in tables_by_alias.values()}
+    if len(tables) == 1 and not local_names and len(re.findall(r'\bSELECT\b', code, re.IGNORECASE)) == 1:
+        table_info = next(iter(tables_by_alias.values()))
+        known = {c.lower() for c in table_columns(table_info)} | set(tables_by_alias)
+        where = strip_literals(filter_clauses(sql))
+        for identifier in re.findall(r'(?<![\w.])([A-Za-z_]\w*)\b(?!\s*[.(])', where):
+            if identifier.lower() not in known and identifier.lower() not in RESERVED_WORDS:
+                errors.append(f"Column {identifier} not found in {table_info['name']}{suggest(identifier, table_columns(table_info))}")
+
+    return sorted(set(errors), key=errors.index), warnings
+
+def validate_sql(sql, catalog=None):
+    """Validate SQL locally; returns {'valid', 'errors', 'warnings'}"""
+    errors = check_syntax(sql)
+    warnings = []
+
+    if not errors and catalog and catalog['table_names'] and statement_type(sql) in ('SELECT', 'WITH'):
+        catalog_errors, warnings = check_catalog_references(sql, catalog)
+        errors.extend(catalog_errors)
+    elif catalog is not None and not catalog['table_names']:
+        warnings.append("Glue catalog unavailable; table and column names were not checked")
+
+    return {'valid': not errors, 'errors': errors, 'warnings': warnings}
+
+def explain_query(athena_client, sql, database, workgroup, output_location):
+    """Run EXPLAIN in Athena (plans the query without reading data); returns (ok, message)"""
+    if statement_type(sql) not in ('SELECT', 'WITH'):
+        return True, "EXPLAIN skipped for non-SELECT statement"
+
+    response = athena_client.start_query_execution(
+        QueryString=f"EXPLAIN {strip_comments(sql).strip().rstrip(';')}",
+        QueryExecutionContext={'Database': database},
+        WorkGroup=workgroup,
+        ResultConfiguration={'OutputLocation': output_location}
+    )
+    query_execution_id = response['QueryExecutionId']
+
+    deadline = time.time() + EXPLAIN_TIMEOUT_SECONDS
+    while time.time() < deadline:
+        status = athena_client.get_query_execution(QueryExecutionId=query_execution_id)['QueryExecution']['Status']
+        if status['State'] == 'SUCCEEDED':
+            return True, "EXPLAIN succeeded"
+        if status['State'] in ('FAILED', 'CANCELLED'):
+            return False, status.get('StateChangeReason', 'EXPLAIN failed')
+        time.sleep(EXPLAIN_POLL_SECONDS)
+
+    athena_client.stop_query_execution(QueryExecutionId=query_execution_id)
+    return True, "EXPLAIN timed out; submitting without plan check"
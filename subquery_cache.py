@@ -0,0 +1,305 @@
+"""
+Subquery Cache
+Finds expensive subqueries and CTEs that keep reappearing in the query history (the
+contract_master / contract_compliance / contract_ownership join, for example),
+materializes each with CTAS into a scratch database for a limited time, and rewrites
+new queries to read the materialization while it is still valid
+"""
+
+import os
+import re
+import json
+import time
+from datetime import datetime, timedelta
+
+from cost_guard import check_background_budget
+from glue_catalog import get_table_info
+from materialized_views import delete_location, run_statement, table_signature
+from query_history import record_execution
+from query_optimizer import add_header_notes, find_table_references, split_header, strip_comments
+from sql_fingerprint import fingerprint, normalize_sql
+from sql_validator import statement_type
+
+SUBQUERY_CACHE_FILE = 'subquery_cache.json'
+SCRATCH_DATABASE = os.getenv('ATHENA_SCRATCH_DATABASE', 'athena_query_scratch')
+SCRATCH_PREFIX = 'scratch'
+CACHE_MARKER = "-- Cached subquery:"
+CACHE_TTL_SECONDS = 6 * 3600
+
+# A subexpression is worth materializing when it recurs this often within the window
+# and the queries containing it were expensive on average
+MIN_OCCURRENCES = 3
+HISTORY_WINDOW_DAYS = 7
+MIN_SCANNED_BYTES = 100 * 1024 ** 2
+MIN_ENGINE_MS = 3000
+MAX_BUILDS_PER_RUN = 2
+
+# Results that depend on when they run cannot be reused
+NON_DETERMINISTIC = r'\b(current_date|current_timestamp|current_time|localtimestamp|now|rand|random|uuid)\b'
+
+def load_subquery_cache(path=SUBQUERY_CACHE_FILE):
+    """Load cached subquery materializations from file"""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'entries': {}}
+    except Exception:
+        return {'entries': {}}
+
+def save_subquery_cache(cache, path=SUBQUERY_CACHE_FILE):
+    """Save cached subquery materializations to file"""
+    try:
+        with open(path, 'w') as f:
+            json.dump(cache, f, indent=2)
+        return True
+    except Exception:
+        return False
+
+def closing_paren(sql, open_index):
+    """Index of the parenthesis closing the one at open_index (strings skipped), or -1"""
+    depth = 0
+    in_string = False
+    for i in range(open_index, len(sql)):
+        ch = sql[i]
+        if in_string:
+            in_string = ch != "'"
+        elif ch == "'":
+            in_string = True
+        elif ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth -= 1
+            if depth == 0:
+                return i
+    return -1
+
+def find_subexpressions(sql):
+    """CTE bodies and FROM/JOIN subqueries as dicts with name, text and the text's span"""
+    code = strip_comments(sql)
+    found = []
+    pattern = r'(?:\bWITH\s+|,\s*)(\w+)\s+AS\s*(\()|\b(?:FROM|JOIN)\s*(\()\s*(?=SELECT\b)'
+    for match in re.finditer(pattern, code, re.IGNORECASE):
+        open_index = match.start(2) if match.group(2) else match.start(3)
+        close_index = closing_paren(code, open_index)
+        if close_index == -1:
+            continue
+        text = code[open_index + 1:close_index]
+        if not re.match(r'\s*SELECT\b', text, re.IGNORECASE):
+            continue
+        found.append({
+            'name': match.group(1) or 'subquery',
+            'text': text,
+            'start': open_index + 1,
+            'end': close_index
+        })
+    return found
+
+def is_cacheable(text, cte_names_in_query):
+    """Self-contained, deterministic and expensive in shape (joins or aggregation)"""
+    references = find_table_references(text)
+    if not references or any(ref['name'].lower() in cte_names_in_query for ref in references):
+        return False
+    if re.search(NON_DETERMINISTIC, text, re.IGNORECASE):
+        return False
+    return bool(re.search(r'\b(JOIN|GROUP\s+BY)\b', text, re.IGNORECASE))
+
+def cacheable_subexpressions(sql):
+    """find_subexpressions, limited to the ones that can be materialized"""
+    subexpressions = find_subexpressions(sql)
+    ctes = {sub['name'].lower() for sub in subexpressions if sub['name'] != 'subquery'}
+    return [sub for sub in subexpressions if is_cacheable(sub['text'], ctes)]
+
+def cache_key(text, account_id, database):
+    """Cache entry key of a subexpression: the same SQL in another account or database reads other data"""
+    return fingerprint(text, account_id, database)
+
+def history_candidates(history, account_id, database, min_occurrences=MIN_OCCURRENCES, now=None):
+    """Subexpressions executed often and expensively in the account and database's recent history, most frequent first"""
+    since = ((now or datetime.now()) - timedelta(days=HISTORY_WINDOW_DAYS)).strftime('%Y-%m-%d %H:%M:%S')
+    stats = {}
+    for entry in history:
+        if entry.get('state') != 'SUCCEEDED' or entry.get('timestamp', '') < since:
+            continue
+        if entry.get('account_id', '') != account_id or entry.get('database', '') != database:
+            continue
+        if statement_type(entry.get('sql', '')) not in ('SELECT', 'WITH'):
+            continue   # e.g. the CTAS builds of this cache, recorded for budget accounting
+        for sub in cacheable_subexpressions(entry.get('sql', '')):
+            key = cache_key(sub['text'], account_id, database)
+            stat = stats.setdefault(key, {'key': key, 'text': sub['text'].strip(), 'count': 0, 'bytes': 0, 'engine_ms': 0})
+            stat['count'] += 1
+            stat['bytes'] += entry.get('data_scanned_bytes') or 0
+            stat['engine_ms'] += entry.get('engine_ms') or 0
+
+    candidates = []
+    for stat in stats.values():
+        if stat['count'] < min_occurrences:
+            continue
+        stat['avg_bytes'] = stat['bytes'] / stat['count']
+        stat['avg_engine_ms'] = stat['engine_ms'] / stat['count']
+        if stat['avg_bytes'] >= MIN_SCANNED_BYTES or stat['avg_engine_ms'] >= MIN_ENGINE_MS:
+            candidates.append(stat)
+    return sorted(candidates, key=lambda stat: stat['count'] * stat['avg_bytes'], reverse=True)
+
+def is_valid(entry, catalog, now=None):
+    """Ready, within its TTL, and built from tables whose Glue metadata has not changed since"""
+    if not entry or entry['status'] != 'ready':
+        return False
+    if (now or time.time()) >= entry['expires_at']:
+        return False
+    return table_signature(catalog, entry['tables']) == entry['signature']
+
+def ensure_scratch_database(glue_client, database=SCRATCH_DATABASE):
+    try:
+        glue_client.create_database(DatabaseInput={
+            'Name': database,
+            'Description': 'Short-lived CTAS materializations of repeated subqueries'
+        })
+    except glue_client.exceptions.AlreadyExistsException:
+        pass
+
+def start_materialization(athena_client, glue_client, catalog, candidate, workgroup, results_bucket, cache,
+                          estimate=None, account_id='', user=''):
+    """Submit the CTAS for a candidate without waiting; update_cache promotes (and records) it once it finishes"""
+    ensure_scratch_database(glue_client)
+    version = datetime.now().strftime('%Y%m%d_%H%M%S')
+    table_name = f"sq_{candidate['key']}_{version}"
+    location = f"s3://{results_bucket}/{SCRATCH_PREFIX}/{candidate['key']}/{version}/"
+    sql = (
+        f'CREATE TABLE "{SCRATCH_DATABASE}"."{table_name}"\n'
+        f"WITH (format = 'PARQUET', write_compression = 'SNAPPY', external_location = '{location}')\n"
+        f"AS {candidate['text']}"
+    )
+    response = athena_client.start_query_execution(
+        QueryString=sql,
+        QueryExecutionContext={'Database': catalog['database']},
+        WorkGroup=workgroup,
+        ResultConfiguration={'OutputLocation': f"s3://{results_bucket}/"}
+    )
+    tables = sorted({ref['name'].lower() for ref in find_table_references(candidate['text'])})
+    cache['entries'][candidate['key']] = {
+        'table': table_name,
+        'location': location,
+        'normalized_sql': normalize_sql(candidate['text']),
+        'tables': tables,
+        'signature': table_signature(catalog, tables),
+        'status': 'building',
+        'execution_id': response['QueryExecutionId'],
+        'created_at': time.time(),
+        'expires_at': time.time() + CACHE_TTL_SECONDS,
+        'occurrences': candidate['count'],
+        'sql': sql,
+        'estimated_bytes': estimate['bytes'] if estimate else None,
+        'estimated_raw_bytes': estimate.get('raw_bytes') if estimate else None,
+        'account_id': account_id,
+        'database': catalog['database'],
+        'user': user
+    }
+
+def drop_entry(athena_client, s3_client, entry, workgroup, results_bucket):
+    """Drop an expired materialization's table and data"""
+    try:
+        if entry['status'] == 'ready':
+            run_statement(
+                athena_client, f"DROP TABLE IF EXISTS `{SCRATCH_DATABASE}`.`{entry['table']}`",
+                SCRATCH_DATABASE, workgroup, f"s3://{results_bucket}/"
+            )
+        delete_location(s3_client, entry['location'])
+    except Exception:
+        pass
+
+def record_build(athena_client, entry):
+    """Add a finished CTAS build to the query history, so its scan counts towards the budgets"""
+    try:
+        estimate = None
+        if entry.get('estimated_bytes') is not None:
+            estimate = {'bytes': entry['estimated_bytes'], 'raw_bytes': entry.get('estimated_raw_bytes')}
+        record_execution(
+            athena_client, entry['execution_id'], entry.get('sql', ''), entry.get('account_id', ''), estimate, entry.get('user', ''),
+            database=entry.get('database', '')
+        )
+    except Exception:
+        pass
+
+def update_cache(athena_client, s3_client, catalog, history, workgroup, results_bucket, glue_client=None, path=SUBQUERY_CACHE_FILE,
+                 budget=None, account_id='', user=''):
+    """Promote finished builds, drop expired entries and start CTAS for new hot subexpressions that fit the budget.
+    Only the entries of this account and database are touched: the clients and catalog belong to them"""
+    cache = load_subquery_cache(path)
+    now = time.time()
+    database = catalog['database']
+
+    for key, entry in list(cache['entries'].items()):
+        if entry.get('account_id', '') != account_id or entry.get('database') != database:
+            continue
+        if entry['status'] == 'building':
+            status = athena_client.get_query_execution(QueryExecutionId=entry['execution_id'])['QueryExecution']['Status']
+            if status['State'] == 'SUCCEEDED':
+                entry['status'] = 'ready'
+                entry['expires_at'] = now + CACHE_TTL_SECONDS
+            elif status['State'] in ('FAILED', 'CANCELLED'):
+                # e.g. unnamed or duplicate columns; keep the failure so it is not retried until expiry
+                entry['status'] = 'failed'
+                entry['error'] = status.get('StateChangeReason', '')
+            if entry['status'] != 'building':
+                record_build(athena_client, entry)
+        if entry['status'] != 'building' and (now >= entry['expires_at'] or (entry['status'] == 'ready' and not is_valid(entry, catalog, now))):
+            drop_entry(athena_client, s3_client, entry, workgroup, results_bucket)
+            del cache['entries'][key]
+
+    started = 0
+    if glue_client:
+        for candidate in history_candidates(history, account_id, database):
+            if started >= MAX_BUILDS_PER_RUN:
+                break
+            if candidate['key'] in cache['entries']:
+                continue
+            if not all(get_table_info(catalog, ref['name']) for ref in find_table_references(candidate['text'])):
+                continue
+            try:
+                estimate = None
+                if budget:
+                    allowed, estimate = check_background_budget(
+                        candidate['text'], catalog, history, budget, account_id, user, glue_client, s3_client
+                    )
+                    if not allowed:
+                        continue
+                start_materialization(
+                    athena_client, glue_client, catalog, candidate, workgroup, results_bucket, cache, estimate, account_id, user
+                )
+                started += 1
+            except Exception:
+                pass
+
+    save_subquery_cache(cache, path)
+    return cache
+
+def rewrite_with_cache(sql, cache, catalog, account_id, now=None):
+    """Replace subexpressions that have a valid materialization with a read of it"""
+    entries = cache.get('entries', {})
+    if not entries:
+        return sql
+
+    # Inline comments are dropped from the body (spans refer to comment-free text); the header stays
+    header, body = split_header(sql)
+    code = strip_comments(body)
+    notes = []
+    # Outermost first: a cached subexpression inside one that is replaced goes away with it
+    replaced = []
+    for sub in sorted(cacheable_subexpressions(code), key=lambda sub: (sub['start'], -sub['end'])):
+        if replaced and sub['start'] < replaced[-1][0]['end']:
+            continue
+        entry = entries.get(cache_key(sub['text'], account_id, catalog['database']))
+        if is_valid(entry, catalog, now):
+            replaced.append((sub, entry))
+
+    # Right to left, so earlier spans stay valid while later ones are replaced
+    for sub, entry in reversed(replaced):
+        code = code[:sub['start']] + f'\n    SELECT * FROM "{SCRATCH_DATABASE}"."{entry["table"]}"\n' + code[sub['end']:]
+        expires = datetime.fromtimestamp(entry['expires_at']).strftime('%H:%M')
+        notes.append(f"{CACHE_MARKER} {sub['name']} -> {SCRATCH_DATABASE}.{entry['table']} (valid until {expires})")
+
+    if not notes:
+        return sql
+    return add_header_notes('\n'.join(header) + ('\n' if header else '') + code.strip(), list(reversed(notes)))
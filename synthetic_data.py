@@ -0,0 +1,245 @@
+"""
+Synthetic Data Generator for Load and Scan Benchmarks
+Vectorized NumPy generation of the sales and contract schemas, streamed to chunked files
+"""
+
+import os
+import argparse
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+DEFAULT_CHUNK_ROWS = 500_000
+DEFAULT_SEED = 42
+
+REGIONS = ['North', 'South', 'East', 'West']
+RISK_LEVELS = ['High', 'Medium', 'Low']
+COMPLIANCE_STATUSES = ['Compliant', 'Non-Compliant', 'Pending Review']
+CONTRACT_STATUSES = ['Active', 'Expired', 'Pending', 'Terminated']
+CONTRACT_TYPES = ['Services', 'Software', 'Hardware', 'Consulting', 'Maintenance', 'Licensing']
+DEPARTMENTS = ['IT', 'Finance', 'Operations', 'HR', 'Legal', 'Marketing', 'Procurement', 'Sales']
+VENDOR_POOL_SIZE = 2_000
+OWNER_POOL_SIZE = 500
+CUSTOMER_POOL_SIZE = 100_000
+PRODUCT_POOL_SIZE = 500
+
+# Arrow schemas double as the Glue column definitions (see glue_columns)
+SCHEMAS = {
+    'sales_transactions': pa.schema([
+        ('transaction_id', pa.string()),
+        ('customer_id', pa.string()),
+        ('product_id', pa.string()),
+        ('sales_amount', pa.decimal128(10, 2)),
+        ('transaction_date', pa.date32()),
+        ('region', pa.string())
+    ]),
+    'contract_master': pa.schema([
+        ('contract_id', pa.string()),
+        ('contract_name', pa.string()),
+        ('vendor', pa.string()),
+        ('contract_type', pa.string()),
+        ('value', pa.int64()),
+        ('status', pa.string()),
+        ('start_date', pa.date32()),
+        ('end_date', pa.date32()),
+        ('auto_renewal', pa.string()),
+        ('outstanding_balance', pa.int64())
+    ]),
+    'contract_compliance': pa.schema([
+        ('contract_id', pa.string()),
+        ('risk_level', pa.string()),
+        ('compliance_status', pa.string()),
+        ('performance_score', pa.int32()),
+        ('sla_score', pa.int32()),
+        ('kpi_met', pa.string())
+    ]),
+    'contract_ownership': pa.schema([
+        ('contract_id', pa.string()),
+        ('department', pa.string()),
+        ('contract_owner', pa.string()),
+        ('business_unit', pa.string())
+    ])
+}
+
+GLUE_TYPES = {
+    pa.string(): 'string',
+    pa.int32(): 'int',
+    pa.int64(): 'bigint',
+    pa.date32(): 'date',
+    pa.float64(): 'double'
+}
+
+def glue_columns(table_name, exclude=()):
+    """Glue column definitions for a synthetic table"""
+    columns = []
+    for field in SCHEMAS[table_name]:
+        if field.name in exclude:
+            continue
+        if pa.types.is_decimal(field.type):
+            glue_type = f"decimal({field.type.precision},{field.type.scale})"
+        else:
+            glue_type = GLUE_TYPES[field.type]
+        columns.append({'Name': field.name, 'Type': glue_type})
+    return columns
+
+def chunk_rng(table_name, start, seed):
+    """Independent, reproducible random stream per (table, chunk)"""
+    table_index = list(SCHEMAS).index(table_name)
+    return np.random.default_rng([seed, table_index, start])
+
+def zipf_index(rng, num_rows, pool_size, skew=1.3):
+    """Zipf-distributed indexes into a pool: a few hot keys, a long tail"""
+    return (rng.zipf(skew, num_rows) - 1) % pool_size
+
+def format_ids(prefix, numbers, width):
+    """Build zero-padded string IDs (e.g. CT0000042) without a Python loop"""
+    padded = pc.utf8_lpad(pa.array(numbers).cast(pa.string()), width=width, padding='0')
+    return pc.binary_join_element_wise(prefix, padded, '')
+
+def pick(values, indexes):
+    """Vectorized lookup of category labels"""
+    return pa.array(values).take(pa.array(indexes))
+
+def day_offsets_to_dates(base, offsets):
+    """Convert day offsets from a base date into an Arrow date32 array"""
+    return pa.array(np.datetime64(base, 'D') + offsets.astype('int64'), type=pa.date32())
+
+def contract_ids(start, num_rows):
+    """Contract IDs shared by all contract tables so they join on row position"""
+    return format_ids('CT', np.arange(start + 1, start + num_rows + 1), 7)
+
+def sales_transactions_columns(rng, start, num_rows):
+    """Columns for sales_transactions"""
+    row_ids = np.arange(start + 1, start + num_rows + 1)
+    # Sales cluster towards recent months and the two largest regions
+    day_offsets = (730 * rng.beta(2.0, 1.2, num_rows)).astype('int64')
+    return {
+        'transaction_id': format_ids('TXN', row_ids, 9),
+        'customer_id': format_ids('CUST', zipf_index(rng, num_rows, CUSTOMER_POOL_SIZE, 1.2) + 1, 6),
+        'product_id': format_ids('PROD', zipf_index(rng, num_rows, PRODUCT_POOL_SIZE, 1.5) + 1, 3),
+        'sales_amount': pa.array(np.round(rng.lognormal(6.5, 0.9, num_rows), 2)).cast(pa.decimal128(10, 2)),
+        'transaction_date': day_offsets_to_dates('2024-01-01', day_offsets),
+        'region': pick(REGIONS, rng.choice(len(REGIONS), num_rows, p=[0.4, 0.25, 0.2, 0.15]))
+    }
+
+def contract_master_columns(rng, start, num_rows):
+    """Columns for contract_master"""
+    vendor_idx = zipf_index(rng, num_rows, VENDOR_POOL_SIZE)
+    type_idx = rng.choice(len(CONTRACT_TYPES), num_rows, p=[0.3, 0.25, 0.15, 0.15, 0.1, 0.05])
+    vendor_names = [f"Vendor {i:04d}" for i in range(VENDOR_POOL_SIZE)]
+    vendors = pick(vendor_names, vendor_idx)
+    types = pick(CONTRACT_TYPES, type_idx)
+
+    # Contract values are heavy-tailed: most are small, a few dominate total spend
+    values = np.round(rng.lognormal(11.5, 1.2, num_rows)).astype('int64')
+    paid_fraction = rng.beta(5, 2, num_rows)
+    start_offsets = rng.integers(0, 1460, num_rows)
+    durations = rng.choice([365, 730, 1095, 1825], num_rows, p=[0.4, 0.3, 0.2, 0.1])
+
+    return {
+        'contract_id': contract_ids(start, num_rows),
+        'contract_name': pc.binary_join_element_wise(vendors, types, 'Agreement', ' '),
+        'vendor': vendors,
+        'contract_type': types,
+        'value': pa.array(values),
+        'status': pick(CONTRACT_STATUSES, rng.choice(len(CONTRACT_STATUSES), num_rows, p=[0.65, 0.2, 0.1, 0.05])),
+        'start_date': day_offsets_to_dates('2022-01-01', start_offsets),
+        'end_date': day_offsets_to_dates('2022-01-01', start_offsets + durations),
+        'auto_renewal': pa.array(np.where(rng.random(num_rows) < 0.4, 'Yes', 'No')),
+        'outstanding_balance': pa.array(np.round(values * (1 - paid_fraction)).astype('int64'))
+    }
+
+def contract_compliance_columns(rng, start, num_rows):
+    """Columns for contract_compliance"""
+    risk_idx = rng.choice(len(RISK_LEVELS), num_rows, p=[0.15, 0.5, 0.35])
+    # High-risk contracts score lower and are more often non-compliant
+    score_shift = np.array([-15, 0, 8])[risk_idx]
+    non_compliant_p = np.array([0.45, 0.15, 0.05])[risk_idx]
+    draw = rng.random(num_rows)
+    status_idx = np.where(draw < non_compliant_p, 1, np.where(draw < non_compliant_p + 0.1, 2, 0))
+
+    return {
+        'contract_id': contract_ids(start, num_rows),
+        'risk_level': pick(RISK_LEVELS, risk_idx),
+        'compliance_status': pick(COMPLIANCE_STATUSES, status_idx),
+        'performance_score': pa.array(np.clip(rng.normal(80, 10, num_rows) + score_shift, 0, 100).astype('int32')),
+        'sla_score': pa.array(np.clip(rng.normal(84, 9, num_rows) + score_shift / 2, 0, 100).astype('int32')),
+        'kpi_met': pa.array(np.where(rng.random(num_rows) < 0.65, 'Yes', 'No'))
+    }
+
+def contract_ownership_columns(rng, start, num_rows):
+    """Columns for contract_ownership"""
+    dept_idx = rng.choice(len(DEPARTMENTS), num_rows, p=[0.25, 0.15, 0.2, 0.05, 0.05, 0.1, 0.15, 0.05])
+    owner_names = [f"Owner {i:03d}" for i in range(OWNER_POOL_SIZE)]
+    return {
+        'contract_id': contract_ids(start, num_rows),
+        'department': pick(DEPARTMENTS, dept_idx),
+        'contract_owner': pick(owner_names, zipf_index(rng, num_rows, OWNER_POOL_SIZE, 1.1)),
+        'business_unit': pick(['Corporate', 'Regional', 'Global'], rng.choice(3, num_rows, p=[0.5, 0.35, 0.15]))
+    }
+
+GENERATORS = {
+    'sales_transactions': sales_transactions_columns,
+    'contract_master': contract_master_columns,
+    'contract_compliance': contract_compliance_columns,
+    'contract_ownership': contract_ownership_columns
+}
+
+def generate_chunk(table_name, start, num_rows, seed=DEFAULT_SEED):
+    """Generate rows [start, start + num_rows) of a synthetic table as an Arrow table"""
+    if table_name not in GENERATORS:
+        raise ValueError(f"Unknown synthetic table: {table_name}")
+
+    rng = chunk_rng(table_name, start, seed)
+    columns = GENERATORS[table_name](rng, start, num_rows)
+    return pa.table(columns, schema=SCHEMAS[table_name])
+
+def generate_dataframe(table_name, num_rows, start=0, seed=DEFAULT_SEED):
+    """Generate a synthetic table as a pandas DataFrame (for small samples)"""
+    return generate_chunk(table_name, start, num_rows, seed).to_pandas()
+
+def iter_chunks(table_name, total_rows, chunk_rows=DEFAULT_CHUNK_ROWS, seed=DEFAULT_SEED):
+    """Yield a synthetic table chunk by chunk so the full dataset is never in memory"""
+    for start in range(0, total_rows, chunk_rows):
+        yield generate_chunk(table_name, start, min(chunk_rows, total_rows - start), seed)
+
+def write_dataset(table_name, total_rows, output_dir, file_format='parquet',
+                  chunk_rows=DEFAULT_CHUNK_ROWS, seed=DEFAULT_SEED):
+    """Stream a synthetic table to chunked Parquet or CSV files, one file per chunk"""
+    table_dir = os.path.join(output_dir, table_name)
+    os.makedirs(table_dir, exist_ok=True)
+
+    files = []
+    for part, chunk in enumerate(iter_chunks(table_name, total_rows, chunk_rows, seed)):
+        if file_format == 'parquet':
+            path = os.path.join(table_dir, f"part-{part:05d}.parquet")
+            pq.write_table(chunk, path, compression='snappy', write_statistics=True, row_group_size=128_000)
+        elif file_format == 'csv':
+            path = os.path.join(table_dir, f"part-{part:05d}.csv")
+            pa_csv.write_csv(chunk, path)
+        else:
+            raise ValueError(f"Unsupported file format: {file_format}")
+        files.append(path)
+
+    return files
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic benchmark data")
+    parser.add_argument('table', choices=list(SCHEMAS) + ['all'])
+    parser.add_argument('rows', type=int, help="Number of rows per table")
+    parser.add_argument('output_dir')
+    parser.add_argument('--format', dest='file_format', choices=['parquet', 'csv'], default='parquet')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    args = parser.parse_args()
+
+    tables = list(SCHEMAS) if args.table == 'all' else [args.table]
+    for table_name in tables:
+        files = write_dataset(table_name, args.rows, args.output_dir, args.file_format, args.chunk_rows, args.seed)
+        print(f"✅ {table_name}: {args.rows:,} rows in {len(files)} files")
+
+if __name__ == "__main__":
+    # Usage: python synthetic_data.py all 10000000 ./benchmark_data --format parquet
+    main()
@@ -0,0 +1,98 @@
+"""
+Table Index
+BM25 index over the Glue catalog (table names, column names, comments and descriptions),
+built once per catalog version, ranking candidate tables for a question by relevance
+instead of taking the first substring hit
+"""
+
+import heapq
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+
+# BM25 parameters (standard values) and how much more a name token counts than a column token
+BM25_K1 = 1.2
+BM25_B = 0.75
+NAME_WEIGHT = 3
+TABLE_INDEX_ENTRIES = 8
+
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'by', 'for', 'from', 'give', 'how', 'in', 'is', 'it', 'list',
+    'me', 'many', 'much', 'of', 'on', 'or', 'show', 'that', 'the', 'their', 'there', 'to', 'what',
+    'which', 'who', 'with', 'display', 'find', 'get', 'all', 'data', 'id'
+}
+
+_table_indexes = OrderedDict()
+_table_index_lock = threading.Lock()
+
+def stem(token):
+    """Light plural folding, so contracts/contract and categories/category match"""
+    if len(token) > 4 and token.endswith('ies'):
+        return token[:-3] + 'y'
+    if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+        return token[:-1]
+    return token
+
+def tokenize(text):
+    """Lower-cased, stemmed word tokens; snake_case and camelCase are split"""
+    text = re.sub(r'([a-z0-9])([A-Z])', r'\1 \2', text or '')
+    return [stem(token) for token in re.findall(r'[a-z0-9]+', text.lower()) if len(token) > 1 and token not in STOPWORDS]
+
+def table_tokens(info):
+    """Weighted token list of one table"""
+    tokens = tokenize(info['name']) * NAME_WEIGHT
+    tokens += tokenize(info.get('description', ''))
+    for column in info['columns'] + info['partition_keys']:
+        tokens += tokenize(column['name'])
+        tokens += tokenize(column.get('comment', ''))
+    return tokens
+
+def build_table_index(catalog, names=None):
+    """Inverted index with precomputed IDF over the catalog's tables (or just the given names)"""
+    names = list(names if names is not None else catalog['table_names'])
+    postings = {}
+    lengths = []
+    for doc, name in enumerate(names):
+        counts = Counter(table_tokens(catalog['tables'][name]))
+        lengths.append(sum(counts.values()))
+        for token, count in counts.items():
+            postings.setdefault(token, []).append((doc, count))
+
+    total = len(names)
+    average_length = (sum(lengths) / total) if total else 0
+    idf = {token: math.log(1 + (total - len(docs) + 0.5) / (len(docs) + 0.5)) for token, docs in postings.items()}
+    # Length normalization per document, folded in once instead of per query
+    norms = [BM25_K1 * (1 - BM25_B + BM25_B * length / average_length) if average_length else BM25_K1 for length in lengths]
+    return {'names': names, 'postings': postings, 'idf': idf, 'norms': norms}
+
+def get_table_index(catalog, names=None):
+    """build_table_index, cached per (database, catalog version, name set)"""
+    key = (catalog['database'], catalog['version'], tuple(names) if names is not None else None)
+    with _table_index_lock:
+        if key in _table_indexes:
+            _table_indexes.move_to_end(key)
+            return _table_indexes[key]
+
+    index = build_table_index(catalog, names)
+    with _table_index_lock:
+        _table_indexes[key] = index
+        while len(_table_indexes) > TABLE_INDEX_ENTRIES:
+            _table_indexes.popitem(last=False)
+    return index
+
+def rank_tables(index, question, limit=5, candidates=None):
+    """(table, score) pairs for the question, best first; only tables sharing a term are returned"""
+    scores = {}
+    for token in set(tokenize(question)):
+        idf = index['idf'].get(token)
+        if idf is None:
+            continue
+        for doc, count in index['postings'][token]:
+            scores[doc] = scores.get(doc, 0.0) + idf * count * (BM25_K1 + 1) / (count + index['norms'][doc])
+
+    names = index['names']
+    if candidates is not None:
+        scores = {doc: score for doc, score in scores.items() if names[doc] in candidates}
+    best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+    return [(names[doc], score) for doc, score in best]
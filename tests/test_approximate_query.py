@@ -0,0 +1,43 @@
+from approximate_query import approximate_query, scale_aggregates
+
+
+def test_counts_and_sums_with_nested_parentheses_are_scaled():
+    body = "SELECT region, COUNT(contract_id) AS n, SUM(CAST(sales_amount AS DOUBLE)) AS total, SUM(COALESCE(x, 0)) AS xs FROM sales GROUP BY region"
+    assert scale_aggregates(body, 10) == (
+        "SELECT region, (COUNT(contract_id) * 10) AS n, (SUM(CAST(sales_amount AS DOUBLE)) * 10) AS total, "
+        "(SUM(COALESCE(x, 0)) * 10) AS xs FROM sales GROUP BY region"
+    )
+
+
+def test_count_star_filter_and_distinct():
+    body = "SELECT COUNT(*) FILTER (WHERE status = 'open') AS open_n, COUNT(DISTINCT customer_id) AS customers FROM sales"
+    assert scale_aggregates(body, 5) == (
+        "SELECT (COUNT(*) FILTER (WHERE status = 'open') * 5) AS open_n, approx_distinct(customer_id) AS customers FROM sales"
+    )
+
+
+def test_window_total_of_scaled_counts_is_not_scaled_again():
+    body = "SELECT region, COUNT(*) * 1.0 / SUM(COUNT(*)) OVER () AS share FROM sales GROUP BY region"
+    assert scale_aggregates(body, 10) == \
+        "SELECT region, (COUNT(*) * 10) * 1.0 / SUM((COUNT(*) * 10)) OVER () AS share FROM sales GROUP BY region"
+
+
+def test_literals_and_comments_are_left_alone():
+    body = "SELECT 'SUM(x)' AS label, SUM(amount) AS total -- COUNT(*) here\nFROM sales"
+    assert scale_aggregates(body, 10) == "SELECT 'SUM(x)' AS label, (SUM(amount) * 10) AS total -- COUNT(*) here\nFROM sales"
+
+
+def test_unscalable_aggregates_refuse_the_rewrite():
+    assert scale_aggregates("SELECT SUM(DISTINCT amount) FROM sales", 10) is None
+    assert scale_aggregates("SELECT region, SUM(amount) OVER (PARTITION BY region) FROM sales", 10) is None
+    nested = "WITH t AS (SELECT region, COUNT(*) AS c FROM sales GROUP BY region) SELECT SUM(c) FROM t"
+    assert scale_aggregates(nested, 10) is None
+    assert approximate_query(nested, '', 10) is None
+
+
+def test_approximate_query_samples_and_labels():
+    sql = "SELECT region, SUM(CAST(sales_amount AS DOUBLE)) AS total FROM sales_transactions GROUP BY region"
+    approximate = approximate_query(sql, '', 10)
+    assert "sales_transactions TABLESAMPLE BERNOULLI (10)" in approximate
+    assert "(SUM(CAST(sales_amount AS DOUBLE)) * 10) AS total" in approximate
+    assert "counts and sums scaled x10" in approximate
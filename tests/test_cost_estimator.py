@@ -0,0 +1,22 @@
+from cost_estimator import calibrate
+
+
+def test_bytes_factor_does_not_feed_back_on_itself():
+    # Every query really scans twice the uncorrected estimate; record runs as the apps do
+    history = []
+    for run in range(40):
+        factor = calibrate(history)['bytes_factor']
+        raw = 1000 + run
+        history.append({
+            'state': 'SUCCEEDED',
+            'engine_ms': 100 + run,
+            'data_scanned_bytes': 2 * raw,
+            'estimated_bytes': int(raw * factor),
+            'estimated_raw_bytes': raw
+        })
+    assert calibrate(history)['bytes_factor'] == 2.0
+
+
+def test_entries_without_raw_estimates_are_not_used_for_the_factor():
+    history = [{'state': 'SUCCEEDED', 'engine_ms': 10, 'data_scanned_bytes': 4000, 'estimated_bytes': 1000}] * 10
+    assert calibrate(history)['bytes_factor'] == 1.0
@@ -0,0 +1,57 @@
+from cost_guard import DEFAULT_BUDGET, allowed_bytes, check_budget, daily_usage, is_budget_admin, resolve_budget
+
+GB = 1024 ** 3
+
+
+def test_resolve_budget_takes_the_tightest_per_query_cutoff():
+    budgets = {
+        'defaults': dict(DEFAULT_BUDGET),
+        'accounts': {'111': {'per_query_bytes': 5 * GB, 'daily_bytes': 50 * GB}},
+        'users': {'ana@example.com': {'per_query_bytes': 2 * GB, 'daily_bytes': 20 * GB, 'action': 'refuse'}}
+    }
+    budget = resolve_budget(budgets, '111', 'ana@example.com')
+    assert budget['per_query_bytes'] == 2 * GB
+    assert budget['account_daily_bytes'] == 50 * GB
+    assert budget['user_daily_bytes'] == 20 * GB
+    assert budget['action'] == 'refuse'
+    assert resolve_budget(budgets, '222')['per_query_bytes'] == DEFAULT_BUDGET['per_query_bytes']
+
+
+def test_daily_usage_counts_only_todays_account_and_user():
+    history = [
+        {'timestamp': '2024-05-01T10:00:00', 'account_id': '111', 'user': 'ana', 'data_scanned_bytes': 3},
+        {'timestamp': '2024-05-01T11:00:00', 'account_id': '111', 'user': 'bo', 'data_scanned_bytes': 5},
+        {'timestamp': '2024-05-01T12:00:00', 'account_id': '222', 'user': 'ana', 'data_scanned_bytes': 7},
+        {'timestamp': '2024-04-30T12:00:00', 'account_id': '111', 'user': 'ana', 'data_scanned_bytes': 11}
+    ]
+    assert daily_usage(history, '111', 'ana', day='2024-05-01') == {'account_bytes': 8, 'user_bytes': 3}
+
+
+def test_check_budget_allows_downgrades_and_refuses():
+    budget = {'per_query_bytes': 10, 'account_daily_bytes': 100, 'user_daily_bytes': None,
+              'action': 'downgrade', 'max_rows_on_downgrade': 1000}
+    usage = {'account_bytes': 95, 'user_bytes': 0}
+    assert allowed_bytes(budget, usage) == 5
+    assert check_budget({'bytes': 5}, budget, usage)['decision'] == 'allow'
+    assert check_budget({'bytes': 6}, budget, usage)['decision'] == 'downgrade'
+    assert check_budget({'bytes': 6}, {**budget, 'action': 'refuse'}, usage)['decision'] == 'refuse'
+    spent = check_budget({'bytes': 1}, budget, {'account_bytes': 100, 'user_bytes': 0})
+    assert spent['decision'] == 'refuse' and spent['allowed_bytes'] == 0
+
+
+def test_check_budget_refuses_estimates_with_unknown_table_sizes():
+    budget = {'per_query_bytes': 10, 'account_daily_bytes': 100, 'user_daily_bytes': None,
+              'action': 'downgrade', 'max_rows_on_downgrade': 1000}
+    usage = {'account_bytes': 0, 'user_bytes': 0}
+    unsized = check_budget({'bytes': 0, 'unresolved': [], 'missing_sizes': ['orders']}, budget, usage)
+    assert unsized['decision'] == 'refuse' and 'orders' in unsized['reason']
+    unresolved = check_budget({'bytes': 0, 'unresolved': ['mystery'], 'missing_sizes': []}, budget, usage)
+    assert unresolved['decision'] == 'refuse'
+
+
+def test_only_listed_signed_in_users_are_budget_admins():
+    budgets = {'admins': ['ops@example.com']}
+    assert is_budget_admin(budgets, 'ops@example.com')
+    assert not is_budget_admin(budgets, 'ana@example.com')
+    assert not is_budget_admin(budgets, '')
+    assert not is_budget_admin({}, 'ops@example.com')
@@ -0,0 +1,74 @@
+import pyarrow as pa
+import pytest
+
+import result_store
+from fan_out import common_type, fan_out, merged_schema, store_fan_out_result
+
+
+class FakeAthena:
+    """One finished execution whose result has a region column and an n column of the given Athena type"""
+
+    def __init__(self, rows, athena_type, precision=0, scale=0):
+        self.rows = rows
+        self.column = {'Label': 'n', 'Type': athena_type, 'Precision': precision, 'Scale': scale}
+
+    def start_query_execution(self, **request):
+        return {'QueryExecutionId': 'exec'}
+
+    def get_query_execution(self, QueryExecutionId):
+        return {'QueryExecution': {
+            'Status': {'State': 'SUCCEEDED'},
+            'Statistics': {'DataScannedInBytes': 10, 'EngineExecutionTimeInMillis': 5},
+            'ResultConfiguration': {'OutputLocation': 's3://results/exec.csv'}
+        }}
+
+    def get_query_results(self, **request):
+        return {'ResultSet': {'ResultSetMetadata': {'ColumnInfo': [{'Label': 'region', 'Type': 'varchar'}, self.column]}}}
+
+    def get_paginator(self, name):
+        rows = self.rows
+
+        class Paginator:
+            def paginate(self, **request):
+                header = {'Data': [{'VarCharValue': 'region'}, {'VarCharValue': 'n'}]}
+                data = [{'Data': [{'VarCharValue': region}, {'VarCharValue': value}]} for region, value in rows]
+                return [{'ResultSet': {'Rows': [header] + data}}]
+        return Paginator()
+
+
+class DeniedS3:
+    def get_object(self, **request):
+        raise PermissionError('AccessDenied')
+
+
+@pytest.fixture(autouse=True)
+def isolated_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(result_store, '_result_store', result_store.ResultStore(directory=str(tmp_path)))
+
+
+def config(account_id):
+    return {'aws_account_id': account_id, 'athena_workgroup': 'primary', 'glue_database': 'db', 's3_results_bucket': 'results'}
+
+
+def test_decimals_and_integers_widen_to_a_decimal():
+    assert common_type({pa.decimal128(10, 2), pa.decimal128(18, 4)}) == pa.decimal128(18, 4)
+    assert common_type({pa.int64(), pa.decimal128(10, 2)}) == pa.decimal128(21, 2)
+    assert common_type({pa.int32(), pa.float64()}) == pa.float64()
+    assert common_type({pa.int32(), pa.string()}) == pa.string()
+
+
+def test_accounts_are_merged_into_one_typed_stored_result():
+    targets = [
+        ('B', config('2'), {'athena': FakeAthena([('north', '3.25')], 'decimal', 10, 2), 's3': DeniedS3()}),
+        ('A', config('1'), {'athena': FakeAthena([('east', '1'), ('west', '2')], 'bigint')})
+    ]
+    outcomes = list(fan_out(targets, {'A': 'SELECT 1', 'B': 'SELECT 1'}))
+
+    handle = store_fan_out_result('SELECT 1', outcomes)
+    table = result_store.get_result_store().open(handle)
+
+    assert table.schema == merged_schema([outcome['schema'] for outcome in outcomes])
+    assert table.schema.field('n').type == pa.decimal128(21, 2)
+    assert table.column('account').to_pylist() == ['A', 'A', 'B']
+    assert [str(value) for value in table.column('n').to_pylist()] == ['1.00', '2.00', '3.25']
+    assert {outcome['account']: outcome['rows'] for outcome in outcomes} == {'A': 2, 'B': 1}
@@ -0,0 +1,78 @@
+import json
+import time
+
+from materialized_views import (
+    check_freshness, load_materialized_state, route_to_materialized, scope_views, unknown_materialized_tables,
+    update_materialized_state
+)
+
+
+def catalog_with(names, loaded_at, database='db'):
+    return {'database': database, 'tables': {name: {'name': name, 'view_sql': '', 'updated_at': '', 'location': ''} for name in names}, 'table_names': list(names), 'loaded_at': loaded_at}
+
+
+def state_with(table, built_at, account_id='111', database='db'):
+    return {'scopes': {f"{account_id}:{database}": {'checked_at': 0, 'views': {'executive_dashboard_detailed': {
+        'table': table, 'built_at': built_at, 'source_signature': 'sig', 'stale': False
+    }}}}}
+
+
+SQL = 'SELECT * FROM executive_dashboard_detailed'
+
+
+def test_routes_to_a_copy_the_catalog_knows():
+    now = time.time()
+    catalog = catalog_with(['executive_dashboard_detailed', 'mv_executive_dashboard_1'], now)
+    routed = route_to_materialized(SQL, state_with('mv_executive_dashboard_1', now), catalog, '111')
+    assert 'FROM mv_executive_dashboard_1' in routed
+
+
+def test_copy_missing_from_the_catalog_is_not_routed_to():
+    now = time.time()
+    catalog = catalog_with(['executive_dashboard_detailed'], now - 60)
+    state = state_with('mv_executive_dashboard_2', now)
+
+    assert route_to_materialized(SQL, state, catalog, '111') == SQL
+    assert unknown_materialized_tables(state, catalog, '111') == ['mv_executive_dashboard_2']
+
+
+def test_catalog_loaded_after_the_build_is_not_reloaded_again():
+    now = time.time()
+    catalog = catalog_with(['executive_dashboard_detailed'], now)
+    assert unknown_materialized_tables(state_with('mv_executive_dashboard_2', now - 60), catalog, '111') == []
+
+
+def test_other_accounts_copies_are_neither_routed_to_nor_reloaded_for():
+    now = time.time()
+    state = state_with('mv_executive_dashboard_1', now, account_id='111')
+    catalog = catalog_with(['executive_dashboard_detailed', 'mv_executive_dashboard_1'], now - 60)
+
+    assert route_to_materialized(SQL, state, catalog, '222') == SQL
+    assert unknown_materialized_tables(state, catalog_with(['executive_dashboard_detailed'], now - 60), '222') == []
+    assert route_to_materialized(SQL, state, catalog_with(catalog['table_names'], now, database='other'), '111') == SQL
+
+
+def test_freshness_check_leaves_other_accounts_copies_alone():
+    now = time.time()
+    state = state_with('mv_executive_dashboard_1', now, account_id='111')
+    stale = check_freshness(state, catalog_with(['executive_dashboard_detailed'], now), '222', now=now)
+
+    assert stale == ['executive_dashboard_detailed']
+    assert not scope_views(state, '111', 'db')['executive_dashboard_detailed']['stale']
+    assert scope_views(state, '222', 'db') == {}
+
+
+def test_update_keeps_other_scopes_and_leaves_unreadable_files(tmp_path):
+    path = tmp_path / 'state.json'
+    path.write_text(json.dumps(state_with('mv_a', 1.0, account_id='111')))
+
+    update_materialized_state(lambda state: check_freshness(state, catalog_with([], 0), '222', now=5.0), str(path))
+
+    state = load_materialized_state(str(path))
+    assert scope_views(state, '111', 'db')['executive_dashboard_detailed']['table'] == 'mv_a'
+    assert state['scopes']['222:db']['checked_at'] == 5.0
+    assert [p.name for p in tmp_path.iterdir()] == ['state.json']
+
+    path.write_text('{"scopes": ')
+    assert update_materialized_state(lambda state: 'ran', str(path)) is None
+    assert path.read_text() == '{"scopes": '
@@ -0,0 +1,44 @@
+import json
+import threading
+
+import query_history
+
+
+class FakeAthena:
+    def get_query_execution(self, QueryExecutionId):
+        return {'QueryExecution': {
+            'Status': {'State': 'SUCCEEDED'},
+            'WorkGroup': 'primary',
+            'Statistics': {'DataScannedInBytes': 100, 'EngineExecutionTimeInMillis': 10}
+        }}
+
+
+def test_concurrent_records_are_all_kept(tmp_path):
+    path = str(tmp_path / 'history.json')
+    threads = [
+        threading.Thread(target=query_history.record_execution, args=(FakeAthena(), f"q{i}", 'SELECT 1'), kwargs={'path': path})
+        for i in range(20)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    history = query_history.load_query_history(path)
+    assert sorted(entry['execution_id'] for entry in history) == sorted(f"q{i}" for i in range(20))
+
+
+def test_unreadable_history_is_not_overwritten(tmp_path):
+    path = tmp_path / 'history.json'
+    path.write_text('[{"execution_id": "old"')
+
+    query_history.record_execution(FakeAthena(), 'new', 'SELECT 1', path=str(path))
+
+    assert path.read_text() == '[{"execution_id": "old"'
+
+
+def test_save_leaves_no_temp_files(tmp_path):
+    path = tmp_path / 'history.json'
+    assert query_history.save_query_history([{'sql': 'SELECT 1'}], str(path))
+    assert json.loads(path.read_text()) == [{'sql': 'SELECT 1'}]
+    assert [p.name for p in tmp_path.iterdir()] == ['history.json']
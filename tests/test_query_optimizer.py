@@ -0,0 +1,15 @@
+from query_optimizer import add_table_sample
+
+
+def test_sample_leaves_tables_sharing_a_name_prefix_alone():
+    sql = 'SELECT * FROM sales_transactions_big WHERE x=1'
+    assert add_table_sample(sql, 'sales_transactions', 12.5) == sql
+
+
+def test_sample_added_to_plain_qualified_and_aliased_references():
+    assert add_table_sample('SELECT * FROM sales_transactions WHERE x=1', 'sales_transactions', 12.5) == \
+        'SELECT * FROM sales_transactions TABLESAMPLE SYSTEM (12.5) WHERE x=1'
+    assert add_table_sample('SELECT * FROM "db"."sales_transactions" s', 'sales_transactions', 10) == \
+        'SELECT * FROM "db"."sales_transactions" s TABLESAMPLE SYSTEM (10)'
+    assert add_table_sample('SELECT * FROM a JOIN sales_transactions AS s ON a.id = s.id', 'sales_transactions', 5) == \
+        'SELECT * FROM a JOIN sales_transactions AS s TABLESAMPLE SYSTEM (5) ON a.id = s.id'
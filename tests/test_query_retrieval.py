@@ -0,0 +1,20 @@
+from query_retrieval import build_retrieval_index, find_similar_question
+
+
+def index_of(*questions):
+    return build_retrieval_index([(question, f"-- {question}\nSELECT 1", 'query history', '') for question in questions])
+
+
+def test_opposite_meanings_are_not_reused():
+    assert find_similar_question(index_of("list contracts that are compliant"), "list contracts that are not compliant") is None
+    assert find_similar_question(index_of("total sales for the west"), "total sales for the east") is None
+
+
+def test_different_numbers_are_not_reused():
+    assert find_similar_question(index_of("top 10 customers by revenue"), "top 20 customers by revenue") is None
+
+
+def test_same_question_in_other_case_and_punctuation_is_reused():
+    match = find_similar_question(index_of("list contracts that are not compliant"), "List contracts that are NOT compliant?")
+    assert match is not None
+    assert match['question'] == "list contracts that are not compliant"
@@ -0,0 +1,29 @@
+from query_templates import execution_parameters, make_template, render_sql
+
+
+def test_negative_day_window_becomes_a_parameter():
+    sql = "SELECT * FROM contracts WHERE start_date >= date_add('day', -30, current_date)"
+    template = make_template(sql)
+    assert template['statement'] == "SELECT * FROM contracts WHERE start_date >= date_add('day', ?, current_date)"
+    assert template['parameters'] == [{'name': 'days', 'type': 'integer', 'default': -30}]
+    assert render_sql(template) == sql
+    assert execution_parameters(template, {'days': -7}) == ['-7']
+
+
+def test_subtraction_is_not_taken_for_a_sign():
+    template = make_template("SELECT * FROM contracts WHERE score - 3 > 1")
+    assert template['statement'] == "SELECT * FROM contracts WHERE score - 3 > ?"
+
+
+def test_timestamp_and_date_literals_become_typed_parameters():
+    sql = "SELECT * FROM contracts WHERE created_at >= TIMESTAMP '2024-01-31 12:00:00' AND signed = DATE '2024-01-01'"
+    template = make_template(sql)
+    assert template['statement'] == "SELECT * FROM contracts WHERE created_at >= ? AND signed = ?"
+    assert [p['type'] for p in template['parameters']] == ['timestamp', 'date']
+    assert render_sql(template) == sql
+    assert execution_parameters(template, {'created_at': '2024-02-01T08:30:00'})[0] == "TIMESTAMP '2024-02-01 08:30:00'"
+
+
+def test_literals_outside_filters_stay_in_the_statement():
+    template = make_template("SELECT CASE WHEN x > 1 THEN 'high' END AS band FROM contracts WHERE region = 'west' LIMIT 10")
+    assert template['statement'] == "SELECT CASE WHEN x > 1 THEN 'high' END AS band FROM contracts WHERE region = ? LIMIT 10"
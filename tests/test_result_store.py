@@ -0,0 +1,26 @@
+import os
+
+import pyarrow as pa
+
+from result_store import ResultStore
+
+
+def test_stores_in_the_same_base_directory_do_not_delete_each_other(tmp_path):
+    first = ResultStore(directory=str(tmp_path))
+    handle = first.put_table('q1', pa.table({'n': [1, 2, 3]}))
+
+    second = ResultStore(directory=str(tmp_path))
+
+    assert first.directory != second.directory
+    assert os.path.exists(handle['path'])
+    assert first.page(handle)['n'].tolist() == [1, 2, 3]
+
+
+def test_directories_of_dead_processes_are_removed(tmp_path):
+    orphan = tmp_path / '999999999-deadbeef'
+    orphan.mkdir()
+    (orphan / 'old.arrow').write_bytes(b'x')
+
+    ResultStore(directory=str(tmp_path))
+
+    assert not orphan.exists()
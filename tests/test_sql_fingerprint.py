@@ -0,0 +1,23 @@
+from sql_fingerprint import dedupe_by_fingerprint, fingerprint, normalize_sql, shape_fingerprint
+
+
+def test_formatting_comments_and_case_do_not_change_the_fingerprint():
+    a = "-- Generated from: contracts\nSELECT Region, COUNT(*) FROM \"contracts\" WHERE x = 007;"
+    b = "select region,\n  count(*)\nfrom contracts where x = 7"
+    assert normalize_sql(a) == normalize_sql(b)
+    assert fingerprint(a) == fingerprint(b)
+
+
+def test_context_scopes_the_fingerprint():
+    assert fingerprint("SELECT 1", 'account-1') != fingerprint("SELECT 1", 'account-2')
+
+
+def test_shape_ignores_literal_values_and_in_list_length():
+    assert shape_fingerprint("SELECT * FROM t WHERE r IN ('a', 'b') AND d > DATE '2024-01-01'") == \
+        shape_fingerprint("SELECT * FROM t WHERE r IN ('c') AND d > DATE '2025-06-30'")
+    assert fingerprint("SELECT * FROM t WHERE r = 'a'") != fingerprint("SELECT * FROM t WHERE r = 'b'")
+
+
+def test_dedupe_keeps_the_latest_of_each_query():
+    items = [{'sql': 'SELECT 1', 'n': 1}, {'sql': 'SELECT 2', 'n': 2}, {'sql': 'select  1', 'n': 3}]
+    assert [item['n'] for item in dedupe_by_fingerprint(items)] == [2, 3]
@@ -0,0 +1,86 @@
+import json
+import time
+
+from subquery_cache import cache_key, cacheable_subexpressions, history_candidates, rewrite_with_cache, update_cache
+
+INNER = "SELECT c.region, COUNT(*) AS n FROM contracts c JOIN owners o ON c.id = o.contract_id GROUP BY c.region"
+OUTER = f"SELECT t.region, SUM(t.n) AS total FROM ({INNER}) t JOIN regions r ON t.region = r.name GROUP BY t.region"
+SQL = f"SELECT * FROM ({OUTER}) x"
+
+CATALOG = {'database': 'db', 'tables': {
+    name: {'name': name, 'updated_at': '2026-01-01', 'location': ''} for name in ('contracts', 'owners', 'regions')
+}}
+
+
+def ready_entry(table, tables):
+    return {
+        'table': table, 'status': 'ready', 'expires_at': time.time() + 3600, 'tables': tables,
+        'signature': {name: '2026-01-01|' for name in tables}
+    }
+
+
+def cache_for(*texts_and_tables):
+    return {'entries': {
+        cache_key(sub['text'], '111', 'db'): ready_entry(table, ['contracts', 'owners', 'regions'] if table == 'sq_outer' else ['contracts', 'owners'])
+        for sub in cacheable_subexpressions(SQL)
+        for text, table in texts_and_tables if sub['text'].strip() == text
+    }}
+
+
+def test_nested_cached_subqueries_replace_only_the_outer_one():
+    rewritten = rewrite_with_cache(SQL, cache_for((OUTER, 'sq_outer'), (INNER, 'sq_inner')), CATALOG, '111')
+    body = '\n'.join(line for line in rewritten.splitlines() if not line.startswith('--'))
+    assert '"athena_query_scratch"."sq_outer"' in rewritten
+    assert 'sq_inner' not in body
+    assert body.rstrip().endswith(') x')
+    assert body.count('(') == body.count(')')
+
+
+def test_inner_subquery_replaced_when_the_outer_one_is_not_cached():
+    rewritten = rewrite_with_cache(SQL, cache_for((INNER, 'sq_inner')), CATALOG, '111')
+    assert '"athena_query_scratch"."sq_inner"' in rewritten
+    assert 'JOIN regions r' in rewritten
+    assert rewritten.rstrip().endswith(') x')
+
+
+def test_cache_builds_in_history_are_not_candidates():
+    history = [
+        {'state': 'SUCCEEDED', 'timestamp': '2999-01-01 00:00:00', 'sql': f"CREATE TABLE s.t AS {OUTER}", 'data_scanned_bytes': 10 ** 12,
+         'account_id': '111', 'database': 'db'}
+        for _ in range(5)
+    ]
+    assert history_candidates(history, '111', 'db') == []
+
+
+def test_candidates_count_only_the_account_and_databases_runs():
+    def run(account_id, database):
+        return {'state': 'SUCCEEDED', 'timestamp': '2999-01-01 00:00:00', 'sql': SQL, 'data_scanned_bytes': 10 ** 12,
+                'account_id': account_id, 'database': database}
+    history = [run('111', 'db'), run('111', 'db'), run('222', 'db'), run('111', 'other')]
+    assert history_candidates(history, '111', 'db') == []
+    candidates = history_candidates(history + [run('111', 'db')], '111', 'db')
+    assert candidates and all(candidate['count'] == 3 for candidate in candidates)
+    assert all(candidate['key'] == cache_key(candidate['text'], '111', 'db') for candidate in candidates)
+
+
+def test_cache_entries_are_scoped_by_account_and_database():
+    key = cache_key(INNER, '111', 'db')
+    assert key != cache_key(INNER, '222', 'db') and key != cache_key(INNER, '111', 'other')
+    cache = cache_for((INNER, 'sq_inner'))
+    assert rewrite_with_cache(SQL, cache, CATALOG, '222') == SQL
+
+
+class UnusedClient:
+    def __getattr__(self, name):
+        raise AssertionError(f"another account's entry was touched through {name}")
+
+
+def test_update_cache_leaves_other_accounts_entries_alone(tmp_path):
+    path = tmp_path / 'cache.json'
+    # Invalid against this catalog (different signature): would be dropped if it belonged here
+    entry = dict(ready_entry('sq_a', ['contracts']), signature={'contracts': 'changed'}, account_id='111', database='db')
+    path.write_text(json.dumps({'entries': {'a': entry}}))
+
+    cache = update_cache(UnusedClient(), UnusedClient(), CATALOG, [], 'wg', 'bucket', path=str(path), account_id='222')
+
+    assert cache['entries'] == {'a': entry}
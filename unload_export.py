@@ -0,0 +1,140 @@
+"""
+UNLOAD Export
+Writes large query results straight to S3 as Parquet with Athena UNLOAD, so exports
+never pass through get_query_results or a DataFrame in the Streamlit process
+"""
+
+import re
+import uuid
+import struct
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from query_optimizer import strip_comments
+
+UNLOAD_PREFIX = 'unload'
+DOWNLOAD_URL_EXPIRY_SECONDS = 3600
+
+GLUE_TYPES = {
+    pa.string(): 'string',
+    pa.large_string(): 'string',
+    pa.bool_(): 'boolean',
+    pa.int8(): 'tinyint',
+    pa.int16(): 'smallint',
+    pa.int32(): 'int',
+    pa.int64(): 'bigint',
+    pa.float32(): 'float',
+    pa.float64(): 'double',
+    pa.date32(): 'date'
+}
+
+QUICKSIGHT_TYPES = {
+    'string': 'STRING', 'boolean': 'BIT', 'tinyint': 'INTEGER', 'smallint': 'INTEGER',
+    'int': 'INTEGER', 'bigint': 'INTEGER', 'float': 'DECIMAL', 'double': 'DECIMAL',
+    'date': 'DATETIME', 'timestamp': 'DATETIME'
+}
+
+def export_location(results_bucket):
+    """Fresh s3:// prefix for one export (UNLOAD requires an empty target)"""
+    run_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+    return f"s3://{results_bucket}/{UNLOAD_PREFIX}/{run_id}/"
+
+def build_unload_sql(sql, target, compression='SNAPPY'):
+    """Wrap a SELECT in UNLOAD ... TO target WITH (format = 'PARQUET')"""
+    body = strip_comments(sql).strip().rstrip(';').strip()
+    if not re.match(r'(SELECT|WITH)\b', body, re.IGNORECASE):
+        raise ValueError("Only SELECT queries can be exported with UNLOAD")
+    return f"UNLOAD (\n{body}\n)\nTO '{target}'\nWITH (format = 'PARQUET', compression = '{compression}')"
+
+def split_s3_uri(uri):
+    """('bucket', 'key/prefix') from an s3:// URI"""
+    bucket, _, key = uri.replace('s3://', '', 1).partition('/')
+    return bucket, key
+
+def read_parquet_footer(s3_client, bucket, key):
+    """Parquet metadata of an S3 object, fetched with two small ranged GETs"""
+    tail = s3_client.get_object(Bucket=bucket, Key=key, Range='bytes=-8')['Body'].read()
+    footer_length = struct.unpack('<I', tail[:4])[0]
+    footer = s3_client.get_object(Bucket=bucket, Key=key, Range=f"bytes=-{footer_length + 8}")['Body'].read()
+    # The footer alone (behind a magic header) is enough to decode schema and row counts
+    return pq.read_metadata(pa.BufferReader(b'PAR1' + footer))
+
+def list_part_files(s3_client, target):
+    """Part files UNLOAD wrote under the target prefix, with size and row count"""
+    bucket, prefix = split_s3_uri(target)
+    parts = []
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get('Contents', []):
+            if obj['Size'] == 0:
+                continue
+            try:
+                rows = read_parquet_footer(s3_client, bucket, obj['Key']).num_rows
+            except Exception:
+                rows = None
+            parts.append({'bucket': bucket, 'key': obj['Key'], 'size': obj['Size'], 'rows': rows})
+    return parts
+
+def download_url(s3_client, part, expires=DOWNLOAD_URL_EXPIRY_SECONDS):
+    """Presigned URL so the browser downloads a part file directly from S3"""
+    return s3_client.generate_presigned_url(
+        'get_object',
+        Params={'Bucket': part['bucket'], 'Key': part['key']},
+        ExpiresIn=expires
+    )
+
+def glue_type(arrow_type):
+    """Glue/Hive type name for an Arrow type"""
+    if pa.types.is_decimal(arrow_type):
+        return f"decimal({arrow_type.precision},{arrow_type.scale})"
+    if pa.types.is_timestamp(arrow_type):
+        return 'timestamp'
+    return GLUE_TYPES.get(arrow_type, 'string')
+
+def export_columns(s3_client, parts):
+    """Glue column definitions of the exported files, read from the first part's footer"""
+    metadata = read_parquet_footer(s3_client, parts[0]['bucket'], parts[0]['key'])
+    return [{'Name': field.name, 'Type': glue_type(field.type)} for field in metadata.schema.to_arrow_schema()]
+
+def register_export_table(glue_client, database, table_name, target, columns, parts):
+    """Register the exported Parquet files as a Glue table (replacing an earlier export of the same name)"""
+    table_input = {
+        'Name': table_name,
+        'Description': f"UNLOAD export created {datetime.now().strftime('%Y-%m-%d %H:%M')}",
+        'TableType': 'EXTERNAL_TABLE',
+        'StorageDescriptor': {
+            'Columns': columns,
+            'Location': target,
+            'InputFormat': 'org.apache.hadoop.hive.ql.io.parquet.MapredParquetInputFormat',
+            'OutputFormat': 'org.apache.hadoop.hive.ql.io.parquet.MapredParquetOutputFormat',
+            'SerdeInfo': {
+                'SerializationLibrary': 'org.apache.hadoop.hive.ql.io.parquet.serde.ParquetHiveSerDe'
+            }
+        },
+        'Parameters': {
+            'classification': 'parquet',
+            'parquet.compression': 'SNAPPY',
+            'numFiles': str(len(parts)),
+            'totalSize': str(sum(part['size'] for part in parts)),
+            'recordCount': str(sum(part['rows'] or 0 for part in parts))
+        }
+    }
+    try:
+        glue_client.create_table(DatabaseName=database, TableInput=table_input)
+    except glue_client.exceptions.AlreadyExistsException:
+        glue_client.update_table(DatabaseName=database, TableInput=table_input)
+    return table_name
+
+def export_table_name(question):
+    """Glue-safe table name for an export, from the question and a timestamp"""
+    words = re.sub(r'[^a-z0-9]+', '_', (question or 'query').lower()).strip('_')[:40] or 'query'
+    return f"export_{words}_{datetime.now().strftime('%Y%m%d_%H%M')}"
+
+def quicksight_columns(columns):
+    """QuickSight InputColumns for Glue column definitions"""
+    return [
+        {'Name': col['Name'], 'Type': 'DECIMAL' if col['Type'].startswith('decimal') else QUICKSIGHT_TYPES.get(col['Type'], 'STRING')}
+        for col in columns
+    ]